@@ -0,0 +1,39 @@
+# apps/api/migrations/env.py
+"""
+Ambiente do Alembic: usa o engine e o metadata de infra/db/models (mesma
+DATABASE_URL e connect_args do app), para migrar exatamente o banco que o app usa.
+
+init_db() continua criando as tabelas que faltam; as migrações cuidam do que
+create_all não faz em tabelas existentes (índices, colunas).
+"""
+from logging.config import fileConfig
+
+from alembic import context
+
+from apps.api.src.infra.db.models import Base, engine
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def run_migrations_offline() -> None:
+    """Gera o SQL sem conectar (`alembic upgrade head --sql`)."""
+    context.configure(url=engine.url.render_as_string(hide_password=False), target_metadata=target_metadata,
+                      literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    with engine.connect() as connection:
+        # SQLite não tem ALTER TABLE completo: o Alembic recria a tabela em modo batch.
+        context.configure(connection=connection, target_metadata=target_metadata,
+                          render_as_batch=connection.dialect.name == "sqlite")
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,57 @@
+"""Índices das consultas quentes de snapshot, relações, mural e galeria
+
+Bancos criados antes destes índices existirem no models.py não os ganham com
+init_db() (create_all não mexe em tabela existente). if_not_exists torna a
+migração inofensiva em bancos novos, onde create_all já os criou.
+
+Formato das consultas que cada índice atende:
+  relations        src_id IN (...) OR dst_id IN (...)        snapshot_get, fingerprint de caminho
+                   type = 'parentChild' AND dst_id IN (...)  pais no pathfinder_logic
+  snapshot_edges   os mesmos dois formatos (snapshot_id já tem o único)
+  snapshots        family_id = ? ORDER BY created_at         raiz da família, fecho transitivo
+  posts, media     family_id = ? ORDER BY created_at DESC    mural e galeria
+  comments, media  post_id = ?                               comentários/fotos de um post
+  memberships      family_id = ?                             membros da família (a PK começa por user_fs_id)
+  user_paths       user_fs_id = ? AND family_id = ?          caminho de parentesco do usuário
+  invites          family_id = ? ORDER BY created_at DESC    convites da família
+
+No PostgreSQL os índices são criados com CONCURRENTLY (sem bloquear escritas).
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16
+"""
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_relations_src", "relations", ["src_id", "type", "dst_id"]),
+    ("ix_relations_dst", "relations", ["dst_id", "type", "src_id"]),
+    ("ix_snapshot_edges_src", "snapshot_edges", ["src_id", "type", "dst_id"]),
+    ("ix_snapshot_edges_dst", "snapshot_edges", ["dst_id", "type", "src_id"]),
+    ("ix_snapshots_family_created", "snapshots", ["family_id", "created_at"]),
+    ("ix_posts_family_created", "posts", ["family_id", "created_at"]),
+    ("ix_comments_post", "comments", ["post_id"]),
+    ("ix_media_family_created", "media", ["family_id", "created_at"]),
+    ("ix_media_post", "media", ["post_id"]),
+    ("ix_memberships_family", "memberships", ["family_id"]),
+    ("ix_user_paths_user_family", "user_paths", ["user_fs_id", "family_id"]),
+    ("ix_invites_family_created", "invites", ["family_id", "created_at"]),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY não roda dentro de transação.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,34 @@
+"""Tabela snapshot_payloads (elements do GET /snapshot/<slug> materializados)
+
+init_db() já cria a tabela; a migração existe para o histórico do Alembic
+acompanhar o models.py (e para bancos migrados sem passar pelo app).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "snapshot_payloads",
+        sa.Column("snapshot_id", sa.Integer, sa.ForeignKey("snapshots.id"), primary_key=True),
+        sa.Column("version", sa.String(32), nullable=False),
+        sa.Column("elements_deflate", sa.LargeBinary, nullable=False),
+        sa.Column("elements_crc32", sa.BigInteger, nullable=False),
+        sa.Column("elements_size", sa.BigInteger, nullable=False),
+        sa.Column("node_ids", sa.Text, nullable=False),
+        sa.Column("created_at", sa.DateTime),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("snapshot_payloads", if_exists=True)
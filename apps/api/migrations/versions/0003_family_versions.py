@@ -0,0 +1,29 @@
+"""Tabela family_versions (versão por família para ETag/304)
+
+Como a 0002: init_db() já cria a tabela; a migração mantém o histórico do Alembic.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "family_versions",
+        sa.Column("family_id", sa.Integer, sa.ForeignKey("families.id"), primary_key=True),
+        sa.Column("version", sa.BigInteger, nullable=False),
+        sa.Column("updated_at", sa.DateTime),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("family_versions", if_exists=True)
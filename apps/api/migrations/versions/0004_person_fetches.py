@@ -0,0 +1,31 @@
+"""Tabela person_fetches (refresh incremental de snapshots)
+
+Como a 0002: init_db() já cria a tabela; a migração mantém o histórico do Alembic.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "person_fetches",
+        sa.Column("person_id", sa.String(32), primary_key=True),
+        sa.Column("fetched_at", sa.DateTime, nullable=False),
+        sa.Column("living", sa.Boolean, nullable=False),
+        sa.Column("complete", sa.Boolean, nullable=False),
+        sa.Column("relatives_json", sa.Text, nullable=False),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("person_fetches", if_exists=True)
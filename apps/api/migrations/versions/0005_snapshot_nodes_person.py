@@ -0,0 +1,27 @@
+"""Índice de snapshot_nodes por pessoa (invalidação dos snapshots que mostram quem mudou)
+
+Clone, expand e convite que alteram pessoas ou gravam relações novas procuram os
+snapshots que contêm essas pessoas: person_id IN (...). O único (snapshot_id,
+person_id) não serve para isso. Como a 0001: if_not_exists e CONCURRENTLY no PostgreSQL.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index("ix_snapshot_nodes_person", "snapshot_nodes", ["person_id", "snapshot_id"],
+                        if_not_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_snapshot_nodes_person", table_name="snapshot_nodes", if_exists=True, postgresql_concurrently=True)
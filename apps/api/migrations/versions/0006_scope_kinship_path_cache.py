@@ -0,0 +1,25 @@
+"""Esvazia kinship_path_cache: as entradas antigas não guardavam o escopo do token
+
+Caminhos achados com o token de um usuário (BFS autenticado, busca de parentesco)
+podem passar por pessoas vivas ou privadas. Agora start_id leva "pid@escopo" para
+esses caminhos; as linhas gravadas antes não têm como ser atribuídas a um token e
+seriam servidas a qualquer um. É só cache: as próximas buscas regravam.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("DELETE FROM kinship_path_cache")
+
+
+def downgrade() -> None:
+    pass
@@ -1,57 +1,67 @@
 # apps/api/src/api/pathfinder_logic.py
 from __future__ import annotations
+import hashlib
+import json
 import os
 import time
 import requests
-from collections import deque, OrderedDict
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
 from typing import Any, Dict, List, Tuple, Optional
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-import urllib3 # <<< Importa urllib3
-
-# Tenta importar a URL base da sua infraestrutura
-try:
-    from ..infra.familysearch.fs_routes import FS_BASE as API_BASE_URL
-except (ModuleNotFoundError, ImportError):
-    API_BASE_URL = "https://apibeta.familysearch.org"
-    
-try:
-    requests.packages.urllib3.util.ssl_.DEFAULT_CIPHERS = 'ALL:@SECLEVEL=1'
-except AttributeError:
-    pass
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from sqlalchemy import or_
+
+from ..infra.cache.person_cache import get_person_cache
+from ..infra.db.models import SessionLocal, KinshipPathCache, Relation, SnapshotEdge
+from ..infra.cache.singleflight import get_singleflight
+from ..infra.familysearch.fs_http import FS_BASE as API_BASE_URL, FS_HTTP_POOL_SIZE, get_session
+from ..infra.familysearch.fs_persons import cached_person_with_relatives, token_scope
+from ..services.path_links import PathLink
 
 # --- Configuração de HTTP e Cache (adaptado do pathfinder.py) ---
+# Pool keep-alive, retries e patch de SSL vêm do cliente compartilhado (fs_http).
 
-session_http = requests.Session()
-retries = Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
-adapter = HTTPAdapter(pool_connections=50, pool_maxsize=50, max_retries=retries)
-session_http.mount("https://", adapter)
 DEFAULT_TIMEOUT = 10
 
-class TTLCache:
-    def __init__(self, ttl=900, max_items=2000):
-        self.ttl = ttl
-        self.max = max_items
-        self.data = OrderedDict()
-
-    def get(self, key):
-        if key in self.data:
-            ts, val = self.data[key]
-            if time.time() - ts < self.ttl:
-                self.data.move_to_end(key)
-                return val
-            else:
-                del self.data[key]
-        return None
+# Buscas simultâneas por fronteira da BFS (limitado ao pool keep-alive do fs_http).
+PF_BFS_MAX_WORKERS = min(int(os.getenv("PF_BFS_MAX_WORKERS", "8")), FS_HTTP_POOL_SIZE)
+# Depois do 1º encontro, quanto ainda esperar por respostas do mesmo nível (pode haver caminho igual ou menor).
+PF_BFS_STRAGGLER_GRACE = float(os.getenv("PF_BFS_STRAGGLER_GRACE", "0.25"))
+
+# Cache compartilhado entre workers/restarts (backend em PERSON_CACHE_BACKEND).
+# Pais de pessoas falecidas ficam sob o PID; de pessoas vivas, sob PID@token (só quem as vê).
+_person_cache = get_person_cache("pf-parents", ttl=900)
+_inflight = get_singleflight("pf-parents")
+
+# Cache negativo: falhas classificadas pelo status, cada classe com seu TTL.
+#  - not_found (404/410): o perfil não existe/foi mesclado; vale para qualquer token. TTL curto:
+#    perfis mesclados ou restaurados voltam a existir, e a entrada bloqueia todos os usuários.
+#  - forbidden (401/403): privado/vivo para ESTE token; a chave inclui o token.
+#  - transitório (429, 5xx, timeout, conexão): nunca cacheado, a próxima busca tenta de novo.
+NEGATIVE_TTL_NOT_FOUND = int(os.getenv("PF_NEGATIVE_TTL_NOT_FOUND", "300"))
+NEGATIVE_TTL_FORBIDDEN = int(os.getenv("PF_NEGATIVE_TTL_FORBIDDEN", "600"))
+_negative_cache = get_person_cache("pf-negative", ttl=NEGATIVE_TTL_FORBIDDEN)
+
+def _classify_failure(status: int) -> Optional[str]:
+    if status in (404, 410): return "not_found"
+    if status in (401, 403): return "forbidden"
+    return None
 
-    def set(self, key, value):
-        self.data[key] = (time.time(), value)
-        self.data.move_to_end(key)
-        if len(self.data) > self.max:
-            self.data.popitem(last=False)
+def _remember_failure(token: str, person_id: str, status: int):
+    kind = _classify_failure(status)
+    if kind == "not_found":
+        _negative_cache.set(person_id, {"kind": kind, "status": status}, ttl=NEGATIVE_TTL_NOT_FOUND)
+    elif kind == "forbidden":
+        _negative_cache.set(_scoped(token, person_id), {"kind": kind, "status": status}, ttl=NEGATIVE_TTL_FORBIDDEN)
 
-_person_cache = TTLCache()
+def _known_dead_end(token: str, person_id: str) -> Optional[Dict[str, Any]]:
+    return _negative_cache.get(person_id, _scoped(token, person_id))
+
+def _scoped(token: str, person_id: str) -> str:
+    return f"{person_id}@{token_scope(token)}"
+
+def _cached_parents(token: str, person_id: str):
+    return _person_cache.get(person_id, _scoped(token, person_id))
 
 def _get_headers(token: str) -> Dict[str, str]:
     return {
@@ -67,18 +77,34 @@ def _get_person_with_parents(token: str, person_id: str) -> Tuple[List[str], boo
     Versão simplificada que busca apenas os pais de uma pessoa.
     Retorna (lista_de_pais, sucesso).
     """
-    cached = _person_cache.get(person_id)
+    cached = _cached_parents(token, person_id)
     if cached is not None:
-        return cached
+        return tuple(cached)
+    # Se o crawler de snapshot já trouxe a pessoa completa, os pais vêm de lá.
+    full = cached_person_with_relatives(token, person_id)
+    if full is not None:
+        return list(full[1]), True
+    if _known_dead_end(token, person_id) is not None:
+        return [], False
+    # Várias buscas (ou níveis da BFS) pedindo o mesmo PID ao mesmo tempo: uma requisição só.
+    result, leader = _inflight.do(person_id, lambda: _fetch_parents(token, person_id))
+    if not leader and _person_cache.get(person_id) is None and _negative_cache.get(person_id) is None:
+        # Só vale para todos o que ficou sob o PID (falecido, ou 404). Falha ou pessoa viva
+        # vistas pelo token de quem liderou: busca com o próprio token.
+        result = _fetch_parents(token, person_id)
+    return result
 
+def _fetch_parents(token: str, person_id: str) -> Tuple[List[str], bool]:
     url = f"{API_BASE_URL}/platform/tree/persons/{person_id}"
     try:
-        r = session_http.get(url, headers=_get_headers(token), timeout=DEFAULT_TIMEOUT, verify=False)
+        r = get_session().get(url, headers=_get_headers(token), timeout=DEFAULT_TIMEOUT, verify=False)
         if r.status_code != 200:
-            # <<< LINHA REMOVIDA >>> _person_cache.set(person_id, ([], False))
+            _remember_failure(token, person_id, r.status_code)
             return [], False
         
-        data = r.json()
+        data = r.json(); living = False
+        for person in data.get("persons") or []:
+            if person.get("id") == person_id: living = bool(person.get("living"))
         parents = set()
         for rel in data.get("childAndParentsRelationships", []):
             child_ref = (rel.get("child") or {}).get("resourceId")
@@ -87,70 +113,155 @@ def _get_person_with_parents(token: str, person_id: str) -> Tuple[List[str], boo
                 if p2 := (rel.get("parent2") or {}).get("resourceId"): parents.add(p2)
         
         result = (list(parents), True)
-        _person_cache.set(person_id, result) # <- Salva APENAS o sucesso
+        _person_cache.set(_scoped(token, person_id) if living else person_id, list(result)) # <- Salva APENAS o sucesso
         return result
     except requests.RequestException:
-        # <<< LINHA REMOVIDA >>> _person_cache.set(person_id, ([], False))
-        return [], False
+        return [], False  # transitório: não vai para o cache negativo
+
+# --- Grafo local (relations + snapshot_edges) -----------------------------
+
+def _local_parents(person_ids: List[str]) -> Dict[str, set]:
+    """
+    Pais já conhecidos no banco, numa consulta por tabela para o nível inteiro.
+    parentChild é gravado como src=pai, dst=filho nas duas tabelas.
+    """
+    found: Dict[str, set] = {pid: set() for pid in person_ids}
+    if not person_ids:
+        return found
+    db = SessionLocal()
+    try:
+        rel_rows = db.query(Relation.src_id, Relation.dst_id).filter(Relation.rel_type == "parentChild", Relation.dst_id.in_(person_ids)).all()
+        snap_rows = db.query(SnapshotEdge.src_id, SnapshotEdge.dst_id).filter(SnapshotEdge.type == "parentChild", SnapshotEdge.dst_id.in_(person_ids)).distinct().all()
+        for parent_id, child_id in list(rel_rows) + list(snap_rows):
+            found[child_id].add(parent_id)
+    except Exception as e:  # banco indisponível: cai para a busca remota
+        print(f"AVISO: grafo local indisponível para a busca de parentesco: {e}")
+    finally:
+        db.close()
+    return found
+
+def _expand_side(pool: ThreadPoolExecutor, token: str, level: List[Tuple[str, PathLink]], visited: Dict[str, PathLink],
+                 visited_other: Dict[str, PathLink], queue: deque, forward: bool, stats: Dict[str, Any], local_edges: set) -> List[List[str]]:
+    """
+    Expande um nível de um dos lados da BFS. Quem já tem os dois pais no grafo local é
+    respondido sem rede; as lacunas (0 ou 1 pai local) vão ao FamilySearch em paralelo,
+    e cada resposta é processada assim que chega. Achado um encontro, as buscas ainda
+    pendentes ganham só PF_BFS_STRAGGLER_GRACE segundos e depois são abandonadas.
+    """
+    paths_found: List[List[str]] = []
+    person_ids = [pid for pid, _ in level]; path_of = dict(level)
+    local = _local_parents(person_ids) if stats.get("use_local", True) else {pid: set() for pid in person_ids}
+
+    def absorb(curr_id: str, parent_ids, ok: bool):
+        if not ok: return
+        path = path_of[curr_id]
+        for parent_id in parent_ids:
+            if parent_id in visited: continue
+            new_path = path.extend(parent_id)
+            visited[parent_id] = new_path
+            if parent_id in visited_other: # Encontro! (só aqui os caminhos viram listas)
+                mine, other = new_path.to_list(), visited_other[parent_id].to_list()
+                paths_found.append(mine + other[::-1][1:] if forward else other + mine[::-1][1:])
+            queue.append((parent_id, new_path))
+
+    remote_ids = []
+    for pid in person_ids:
+        known = local.get(pid) or set()
+        for parent_id in known:
+            local_edges.add((pid, parent_id))
+        if len(known) >= 2:
+            stats["local_lookups"] += 1
+            absorb(pid, known, True)
+        else:
+            remote_ids.append(pid)
+    if paths_found or not remote_ids:
+        return paths_found  # encontro só com o grafo local: nem vai à rede
+
+    stats["remote_lookups"] += len(remote_ids)
+    futures = {pool.submit(_get_person_with_parents, token, pid): pid for pid in remote_ids}
+    pending, deadline = set(futures), None
+    while pending:
+        timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            break  # carência esgotada: não espera os retardatários
+        for fut in done:
+            pid = futures[fut]; known = local.get(pid) or set()
+            try: remote, ok = fut.result()
+            except Exception: remote, ok = [], False
+            absorb(pid, known | set(remote), ok or bool(known))
+        if paths_found and deadline is None:
+            deadline = time.perf_counter() + PF_BFS_STRAGGLER_GRACE
+    for fut in pending:
+        fut.cancel()
+    stats["stragglers_dropped"] = stats.get("stragglers_dropped", 0) + len(pending)
+    return paths_found
 
-def _find_paths_bfs(start_pid: str, end_pid: str, token: str, max_depth: int = 20) -> List[List[str]]:
+def _find_paths_bfs(start_pid: str, end_pid: str, token: str, max_depth: int = 20,
+                    stats: Optional[Dict[str, Any]] = None, max_workers: Optional[int] = None) -> List[List[str]]:
     """
-    Lógica de busca bidirecional (BFS) adaptada do pathfinder.py.
+    Lógica de busca bidirecional (BFS) adaptada do pathfinder.py, subindo pelos
+    pais dos dois lados até um ancestral comum. Expande nível a nível, primeiro
+    no grafo local e só depois no FamilySearch, com as buscas remotas de cada
+    fronteira em paralelo (ver _expand_side).
     Retorna uma lista de caminhos encontrados.
     """
-    q1, q2 = deque([(start_pid, [start_pid])]), deque([(end_pid, [end_pid])])
-    visited1, visited2 = {start_pid: [start_pid]}, {end_pid: [end_pid]}
+    if stats is None:
+        stats = {}
+    stats.setdefault("local_lookups", 0); stats.setdefault("remote_lookups", 0)
+    local_edges = stats.setdefault("_local_edges", set())  # (filho, pai) vistos no banco
+
+    # Cada nó visitado guarda um PathLink (ponteiro para o prefixo compartilhado), não uma cópia do caminho.
+    start, end = PathLink(start_pid), PathLink(end_pid)
+    q1, q2 = deque([(start_pid, start)]), deque([(end_pid, end)])
+    visited1, visited2 = {start_pid: start}, {end_pid: end}
     
     paths_found = []
     depth = 0
+    pool = ThreadPoolExecutor(max_workers=max_workers or PF_BFS_MAX_WORKERS)
+    try:
+        while q1 and q2 and depth < max_depth and not paths_found:
+            depth += 1
 
-    while q1 and q2 and depth < max_depth and not paths_found:
-        depth += 1
-        
-        # Expande a partir do início (start_pid)
-        q_size = len(q1)
-        for _ in range(q_size):
-            curr_id, path = q1.popleft()
-            parent_ids, ok = _get_person_with_parents(token, curr_id)
-            if not ok: continue
-
-            for parent_id in parent_ids:
-                if parent_id in visited1: continue
-                new_path = path + [parent_id]
-                visited1[parent_id] = new_path
-                
-                if parent_id in visited2: # Encontro!
-                    path2 = visited2[parent_id]
-                    paths_found.append(new_path + path2[::-1][1:])
-                
-                q1.append((parent_id, new_path))
-        
-        if paths_found: break
-
-        # Expande a partir do fim (end_pid)
-        q_size = len(q2)
-        for _ in range(q_size):
-            curr_id, path = q2.popleft()
-            parent_ids, ok = _get_person_with_parents(token, curr_id)
-            if not ok: continue
-
-            for parent_id in parent_ids:
-                if parent_id in visited2: continue
-                new_path = path + [parent_id]
-                visited2[parent_id] = new_path
-
-                if parent_id in visited1: # Encontro!
-                    path1 = visited1[parent_id]
-                    paths_found.append(path1 + new_path[::-1][1:])
-                
-                q2.append((parent_id, new_path))
-        
-        if paths_found: break
+            # Expande a partir do início (start_pid)
+            level = list(q1); q1.clear()
+            paths_found = _expand_side(pool, token, level, visited1, visited2, q1, True, stats, local_edges)
+            if paths_found: break
+
+            # Expande a partir do fim (end_pid)
+            level = list(q2); q2.clear()
+            paths_found = _expand_side(pool, token, level, visited2, visited1, q2, False, stats, local_edges)
+    finally:
+        # Não bloqueia em requisições retardatárias: elas terminam em segundo plano (e alimentam o cache).
+        pool.shutdown(wait=False, cancel_futures=True)
         
     return paths_found
 
 # --- FUNÇÃO PRINCIPAL EXPOSTA PELO MÓDULO ---
 
+def find_kinship_path_with_stats(start_pid: str, end_pid: str, token: str, use_local: bool = True) -> Tuple[Optional[List[str]], Dict[str, Any]]:
+    """
+    Como find_kinship_path, mas devolve também (caminho, stats), com:
+      local_hops/remote_hops: arestas do caminho que já estavam no banco / vieram do FamilySearch
+      local_lookups/remote_lookups: pessoas expandidas sem rede / com rede
+    """
+    t0 = time.perf_counter()
+    stats: Dict[str, Any] = {"use_local": use_local}
+    path = [start_pid] if start_pid == end_pid else None
+    if path is None:
+        paths = _find_paths_bfs(start_pid, end_pid, token, stats=stats)
+        if paths:
+            # Ordena os caminhos encontrados pelo mais curto e retorna o primeiro
+            paths.sort(key=len)
+            path = paths[0]
+    local_edges = stats.pop("_local_edges", set())
+    hops = list(zip(path or [], (path or [])[1:]))
+    local_hops = sum(1 for a, b in hops if (a, b) in local_edges or (b, a) in local_edges)
+    stats.pop("use_local", None)
+    stats.setdefault("local_lookups", 0); stats.setdefault("remote_lookups", 0)
+    stats.update({"local_hops": local_hops, "remote_hops": len(hops) - local_hops, "seconds": round(time.perf_counter() - t0, 3)})
+    return path, stats
+
 def find_kinship_path(start_pid: str, end_pid: str, token: str) -> Optional[List[str]]:
     """
     Encontra o caminho de parentesco mais curto entre duas pessoas.
@@ -164,14 +275,75 @@ def find_kinship_path(start_pid: str, end_pid: str, token: str) -> Optional[List
         Uma lista de PIDs representando o caminho (incluindo início e fim),
         ou None se nenhum caminho for encontrado.
     """
-    if start_pid == end_pid:
-        return [start_pid]
-        
-    paths = _find_paths_bfs(start_pid, end_pid, token)
+    return find_kinship_path_with_stats(start_pid, end_pid, token)[0]
+
+# --- Cache persistente de caminhos (start, end) ------------------------------
 
-    if not paths:
+# Teto de idade: o FamilySearch pode mudar sem que nenhuma relação local mude.
+KINSHIP_PATH_CACHE_MAX_AGE = int(os.getenv("KINSHIP_PATH_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+
+def _path_fingerprint(db, path: Any) -> str:
+    """Hash das relações (relations + snapshot_edges) que tocam algum nó do caminho."""
+    nodes = set(path["ids"] if isinstance(path, dict) else path)
+    rows = set(db.query(Relation.rel_type, Relation.src_id, Relation.dst_id).filter(
+        or_(Relation.src_id.in_(nodes), Relation.dst_id.in_(nodes))).all())
+    rows |= set(db.query(SnapshotEdge.type, SnapshotEdge.src_id, SnapshotEdge.dst_id).filter(
+        or_(SnapshotEdge.src_id.in_(nodes), SnapshotEdge.dst_id.in_(nodes))).distinct().all())
+    return hashlib.sha256(json.dumps(sorted(tuple(r) for r in rows)).encode("utf-8")).hexdigest()
+
+def _path_key(kind: str, start_pid: str, end_pid: str, token: Optional[str]) -> Tuple[str, str, str]:
+    # Caminho achado com um token pode passar por pessoas vivas/privadas: fica só para esse token.
+    return kind, (_scoped(token, start_pid) if token else start_pid), end_pid
+
+def get_cached_path(start_pid: str, end_pid: str, kind: str = "kinship", token: Optional[str] = None) -> Any:
+    """
+    Caminho gravado, se as relações que o tocam não mudaram desde então (senão apaga).
+    "kinship" guarda a lista de PIDs; "path" guarda {"ids": [...], "common": pid|None}.
+    token=None lê só caminhos públicos (achados sem login); com token, os gravados com ele.
+    """
+    db = SessionLocal()
+    try:
+        row = db.get(KinshipPathCache, _path_key(kind, start_pid, end_pid, token))
+        if row is None:
+            return None
+        path = json.loads(row.path_json)
+        expired = row.created_at and (datetime.utcnow() - row.created_at).total_seconds() > KINSHIP_PATH_CACHE_MAX_AGE
+        if expired or row.fingerprint != _path_fingerprint(db, path):
+            db.delete(row); db.commit()
+            return None
+        return path
+    except Exception as e:
+        db.rollback(); print(f"AVISO: cache de caminhos indisponível: {e}")
         return None
+    finally:
+        db.close()
+
+def remember_path(start_pid: str, end_pid: str, path: Any, kind: str = "kinship", token: Optional[str] = None):
+    """
+    Grava o caminho com o fingerprint ATUAL das relações. Chame depois de persistir as
+    arestas do próprio caminho, senão a primeira leitura já o invalida. Passe o token
+    usado na busca; só caminhos achados sem login (token=None) valem para todos.
+    """
+    if not path:
+        return
+    db = SessionLocal()
+    try:
+        key = _path_key(kind, start_pid, end_pid, token)
+        row = db.get(KinshipPathCache, key) or KinshipPathCache(kind=key[0], start_id=key[1], end_id=key[2])
+        row.path_json = json.dumps(path); row.fingerprint = _path_fingerprint(db, path); row.created_at = datetime.utcnow()
+        db.merge(row); db.commit()
+    except Exception as e:
+        db.rollback(); print(f"AVISO: não foi possível gravar o caminho no cache: {e}")
+    finally:
+        db.close()
 
-    # Ordena os caminhos encontrados pelo mais curto e retorna o primeiro
-    paths.sort(key=len)
-    return paths[0]
\ No newline at end of file
+def find_kinship_path_cached(start_pid: str, end_pid: str, token: str) -> Tuple[Optional[List[str]], Dict[str, Any]]:
+    """find_kinship_path_with_stats lendo antes o cache persistente (stats["cache"] = hit|miss)."""
+    t0 = time.perf_counter()
+    path = get_cached_path(start_pid, end_pid, token=token)
+    if path is not None:
+        return path, {"cache": "hit", "local_lookups": 0, "remote_lookups": 0, "local_hops": len(path) - 1,
+                      "remote_hops": 0, "seconds": round(time.perf_counter() - t0, 3)}
+    path, stats = find_kinship_path_with_stats(start_pid, end_pid, token)
+    stats["cache"] = "miss"
+    return path, stats
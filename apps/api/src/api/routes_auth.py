@@ -1,6 +1,7 @@
 # apps/api/src/api/routes_auth.py - CÓDIGO INTEGRAL ATUALIZADO
 
-import time, requests, json, secrets, traceback
+import os, time, requests, json, secrets, traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from flask import Blueprint, jsonify, redirect, request, session, url_for, render_template
 from sqlalchemy.exc import IntegrityError
@@ -8,25 +9,11 @@ from typing import Any, Dict, List, Tuple, Optional
 from functools import wraps
 
 # Suas funções auxiliares (devem permanecer no arquivo)
-try: from ..infra.familysearch.fs_routes import FS_BASE as API_BASE_URL
-except Exception: API_BASE_URL = "https://apibeta.familysearch.org"
+from ..infra.familysearch.fs_persons import fetch_person_with_relatives
+from ..infra.familysearch.fs_http import FS_BASE as API_BASE_URL, FS_HTTP_POOL_SIZE, fs_get
+from ..infra.jobs import job_queue
 def _headers_json(token: str) -> Dict[str, str]: return {"Authorization": f"Bearer {token}", "Accept": "application/json"}
-def _fetch_person_with_relatives(token: str, pid: str) -> Tuple[Dict | None, List[str], List[str], List[str]]:
-    url = f"{API_BASE_URL}/platform/tree/persons/{pid}?personDetails=true&children=true"
-    try: r = requests.get(url, headers=_headers_json(token), timeout=20); r.raise_for_status(); data = r.json()
-    except requests.RequestException: return None, [], [], []
-    details = (data.get("persons") or [None])[0]; parents, spouses, children = set(), set(), set()
-    if not details: return None, [], [], []
-    for rel in data.get("childAndParentsRelationships", []):
-        p1 = (rel.get("parent1") or {}).get("resourceId"); p2 = (rel.get("parent2") or {}).get("resourceId"); child = (rel.get("child") or {}).get("resourceId")
-        if child == pid:
-            if p1: parents.add(p1)
-            if p2: parents.add(p2)
-        if (p1 == pid or p2 == pid) and child:
-            children.add(child)
-            if p1 == pid and p2: spouses.add(p2)
-            elif p2 == pid and p1: spouses.add(p1)
-    return details, list(parents), list(spouses), list(children)
+_fetch_person_with_relatives = fetch_person_with_relatives  # cacheado (infra/cache/person_cache)
 def _format_node(details: Dict) -> Dict:
     display = details.get("display") or {}; gender_type = (details.get("gender") or {}).get("type", "")
     gender = "Male" if "Male" in gender_type else "Female" if "Female" in gender_type else "Unknown"
@@ -54,9 +41,12 @@ def _ensure_edge(db, e_data: Dict):
         db.rollback()
         return False
 
-from .pathfinder_logic import find_kinship_path
+from .pathfinder_logic import find_kinship_path_cached, remember_path
 from ..infra.familysearch.fs_routes import build_authorize_url, exchange_code_for_token, FS_BASE
 from ..infra.db.models import SessionLocal, User, Invite, Membership, Snapshot, UserPath, Person, Relation
+from ..worker import dispatch
+from ..services import snapshot_payload
+from ..services.family_version import bump_family_version, bump_family_versions
 
 auth_bp = Blueprint("auth_bp", __name__)
 
@@ -89,7 +79,7 @@ def auth_status():
             if user: user_info["name"] = user.name
         finally:
             db.close()
-    return jsonify({"ok": ok, "user": user_info})
+    return jsonify({"ok": ok, "user": user_info, "lineage_job": session.get("lineage_job_id")})
 
 @auth_bp.route("/login")
 def login():
@@ -120,7 +110,7 @@ def callback():
     db = SessionLocal()
     try:
         headers = {"Authorization": f"Bearer {access_token}", "Accept": "application/json"}
-        r = requests.get(f"{FS_BASE}/platform/users/current", headers=headers, timeout=15); r.raise_for_status()
+        r = fs_get(f"{FS_BASE}/platform/users/current", headers=headers, timeout=15); r.raise_for_status()
         fs_user_data = r.json()
         user_info = (fs_user_data.get("users") or [{}])[0]
         fs_id = user_info.get("id"); person_id = user_info.get("personId"); contact_name = user_info.get("contactName")
@@ -128,7 +118,9 @@ def callback():
         if fs_id and contact_name:
             user = db.get(User, fs_id)
             if not user: user = User(fs_id=fs_id, name=contact_name); db.add(user)
-            else: user.name = contact_name
+            elif user.name != contact_name:
+                user.name = contact_name  # o nome aparece no mural, na galeria e na gestão das famílias do usuário
+                for m in user.memberships: bump_family_version(db, m.family_id)
             db.commit()
             session["user_fs_id"] = fs_id
             session["user_name"] = contact_name
@@ -159,86 +151,18 @@ def callback():
                             family_id=invite.family_id, 
                             role="member" # Papel padrão para convidados
                         )
-                        db.add(new_membership)
+                        db.add(new_membership); bump_family_version(db, invite.family_id)
                         print(f"--- [DEBUG auth.py] Usuário {fs_id} adicionado à família {invite.family_id} como 'member'")
                     else:
                         print(f"--- [DEBUG auth.py] Usuário {fs_id} já era membro da família {invite.family_id}.")
-
-                    # <<< INÍCIO DO BLOCO DE DEBUG (V3) - COMPLETO E CORRIGIDO >>>
-                    # 4. (Opcional, mas recomendado) Tenta salvar a linhagem da prima
-                    try:
-                        print(f"\n--- [DEBUG auth.py] Iniciando busca de linhagem para user_fs_id={fs_id} (person_id={person_id})")
-                        
-                        root_snapshot = db.query(Snapshot).filter_by(family_id=invite.family_id).order_by(Snapshot.created_at.asc()).first()
-                        
-                        if not root_snapshot or not (root_snapshot.root_husband_id or root_snapshot.root_wife_id):
-                             print(f"--- [DEBUG auth.py] FALHA: Snapshot raiz ou ID raiz não encontrado para family_id={invite.family_id}")
-                        
-                        else:
-                            ancestor_pid = root_snapshot.root_husband_id or root_snapshot.root_wife_id
-                            print(f"--- [DEBUG auth.py] Ancestral raiz encontrado: {ancestor_pid} (do snapshot slug: {root_snapshot.slug})")
-                            
-                            print(f"--- [DEBUG auth.py] BUSCANDO CAMINHO de {person_id} (prima) para {ancestor_pid} (ancestral)...")
-                            
-                            # 1. BUSCA O CAMINHO NO FAMILYSEARCH
-                            kinship_path = find_kinship_path(person_id, ancestor_pid, access_token)
-                            
-                            if kinship_path:
-                                print(f"--- [DEBUG auth.VITORIA] Caminho encontrado via API: {kinship_path}")
-
-                                # --- INÍCIO DA CORREÇÃO (Adicionada na última etapa) ---
-                                # Garante que as pessoas e arestas do caminho existam no DB
-                                print(f"--- [DEBUG auth.VITORIA] Garantindo que pessoas e arestas do caminho existam no DB...")
-                                for i in range(len(kinship_path)):
-                                    pid = kinship_path[i]
-                                    
-                                    # 1. Salva a pessoa
-                                    details, _, spouse_ids, _ = _fetch_person_with_relatives(access_token, pid)
-                                    if details:
-                                        _upsert_person(db, _format_node(details))
-                                        
-                                        # 1b. Salva os cônjuges
-                                        for spouse_id in spouse_ids:
-                                            s_details, _, _, _ = _fetch_person_with_relatives(access_token, spouse_id)
-                                            if s_details:
-                                                _upsert_person(db, _format_node(s_details))
-                                                _ensure_edge(db, {"type": "couple", "a": pid, "b": spouse_id})
-
-                                    # 2. Salva a aresta pai-filho
-                                    if i < len(kinship_path) - 1:
-                                        child_id = kinship_path[i]
-                                        parent_id = kinship_path[i+1]
-                                        edge_data = {"type": "parentChild", "from": parent_id, "to": child_id}
-                                        _ensure_edge(db, edge_data)
-                                print(f"--- [DEBUG auth.VITORIA] Pessoas e arestas do caminho salvas.")
-                                # --- FIM DA CORREÇÃO ---
-
-                                # 2. PROCURA UM REGISTRO ANTIGO
-                                path_record = db.query(UserPath).filter_by(user_fs_id=fs_id, family_id=invite.family_id).first()
-                                
-                                if not path_record:
-                                    # 3a. CRIA UM NOVO REGISTRO
-                                    print(f"--- [DEBUG auth.VITORIA] Criando novo registro UserPath...")
-                                    path_record = UserPath(user_fs_id=fs_id, family_id=invite.family_id)
-                                    db.add(path_record)
-                                else:
-                                    print(f"--- [DEBUG auth.VITORIA] Atualizando registro UserPath existente...")
-
-                                # 4. ATUALIZA O CAMINHO (NOVO OU ANTIGO)
-                                path_record.path_json = json.dumps(kinship_path)
-                                print(f"--- [DEBUG auth.VITORIA] Linhagem salva para {fs_id}.")
-
-                            else:
-                                # <<< O CÓDIGO QUE VOCÊ PERDEU ESTÁ AQUI >>>
-                                print(f"--- [DEBUG auth.FALHA] find_kinship_path retornou None. Nenhum caminho encontrado entre {person_id} e {ancestor_pid}.")
-
-                    except Exception as e:
-                        print(f"--- !!! ERRO GRAVE ao tentar salvar a linhagem do convidado: {e} !!!")
-                        traceback.print_exc()
-                    # <<< FIM DO BLOCO DE DEBUG (V3) >>>
-
-                    # 5. Finalmente, commita as mudanças
                     db.commit()
+
+                    # 4. A linhagem (caminho até o ancestral raiz) é resolvida em segundo plano;
+                    #    o app consulta o job (ver /auth/status -> lineage_job).
+                    job, created = job_queue.submit("invite_lineage", {"user_fs_id": fs_id, "person_id": person_id, "family_id": invite.family_id},
+                                                    owner=fs_id, token=access_token)
+                    session["lineage_job_id"] = job["id"]; dispatch(job)
+                    print(f"--- [DEBUG auth.py] Linhagem de {fs_id} no job {job['id']} ({'novo' if created else 'reaproveitado'})")
                 else:
                     print(f"--- [DEBUG auth.py] Token de convite inválido ou expirado: {invite_token}")
             # <<< FIM DA CORREÇÃO >>>
@@ -251,6 +175,68 @@ def callback():
     
     return redirect(url_for("app_main"))
 
+INVITE_LINEAGE_MAX_WORKERS = min(int(os.getenv("INVITE_LINEAGE_MAX_WORKERS", "8")), FS_HTTP_POOL_SIZE)
+
+def resolve_invite_lineage(token: str, fs_id: str, person_id: str, family_id: int) -> Tuple[Dict[str, Any], int]:
+    """
+    Linhagem de um convidado: caminho até o ancestral raiz da família, gravando as pessoas
+    do caminho (e seus cônjuges) e o UserPath. Roda no job "invite_lineage", fora do login.
+    As pessoas que faltam no banco são buscadas em paralelo, primeiro as do caminho, depois os cônjuges.
+    """
+    db = SessionLocal()
+    try:
+        root_snapshot = db.query(Snapshot).filter_by(family_id=family_id).order_by(Snapshot.created_at.asc()).first()
+        ancestor_pid = root_snapshot and (root_snapshot.root_husband_id or root_snapshot.root_wife_id)
+        if not ancestor_pid:
+            print(f"--- [invite_lineage] Snapshot raiz ou ID raiz não encontrado para family_id={family_id}")
+            return {"ok": False, "error": "Família sem snapshot raiz."}, 404
+
+        # Grafo local primeiro (relations/snapshot_edges); o FamilySearch só cobre as lacunas.
+        kinship_path, kinship_stats = find_kinship_path_cached(person_id, ancestor_pid, token)
+        print(f"--- [invite_lineage] {person_id} -> {ancestor_pid}: {kinship_stats}")
+        if not kinship_path:
+            return {"ok": False, "error": "Nenhum caminho encontrado.", "ancestor": ancestor_pid, "kinship_stats": kinship_stats}, 404
+
+        # Pessoas já gravadas (clones/convites anteriores) vieram com os cônjuges: não busca de novo.
+        stored_ids = {row[0] for row in db.query(Person.id).filter(Person.id.in_(kinship_path)).all()}
+        missing = [pid for pid in kinship_path if pid not in stored_ids]
+        fetches = 0
+        with ThreadPoolExecutor(max_workers=INVITE_LINEAGE_MAX_WORKERS) as pool:
+            fetch = lambda pid: _fetch_person_with_relatives(token, pid)
+            couples, touched = [], set()  # pessoas gravadas e pontas de relações novas
+            for pid, (details, _, spouse_ids, _) in zip(missing, pool.map(fetch, missing)):
+                if details:
+                    _upsert_person(db, _format_node(details)); touched.add(pid)
+                    couples.extend((pid, spouse_id) for spouse_id in spouse_ids)
+            spouses = list(dict.fromkeys(spouse_id for _, spouse_id in couples))
+            spouse_details = dict(zip(spouses, pool.map(fetch, spouses)))
+            fetches = len(missing) + len(spouses)
+        for pid, spouse_id in couples:
+            s_details = spouse_details[spouse_id][0]
+            if s_details:
+                _upsert_person(db, _format_node(s_details)); touched.add(spouse_id)
+                if _ensure_edge(db, {"type": "couple", "a": pid, "b": spouse_id}): touched.update((pid, spouse_id))
+        for child_id, parent_id in zip(kinship_path, kinship_path[1:]):
+            if _ensure_edge(db, {"type": "parentChild", "from": parent_id, "to": child_id}): touched.update((parent_id, child_id))
+
+        path_record = db.query(UserPath).filter_by(user_fs_id=fs_id, family_id=family_id).first()
+        if not path_record:
+            path_record = UserPath(user_fs_id=fs_id, family_id=family_id); db.add(path_record)
+        path_record.path_json = json.dumps(kinship_path)
+        # Pessoas e relações são globais: snapshots de outras famílias que mostram quem mudou também.
+        bump_family_versions(db, snapshot_payload.invalidate_touching(db, touched) | {family_id})
+        db.commit()
+        if kinship_stats.get("cache") == "miss":
+            remember_path(person_id, ancestor_pid, kinship_path, token=token)  # depois do commit: arestas do caminho já gravadas
+        print(f"--- [invite_lineage] Linhagem salva para {fs_id}: {len(kinship_path)} pessoas, {fetches} buscas no FS")
+        return {"ok": True, "family_id": family_id, "ancestor": ancestor_pid, "kinship_path": kinship_path,
+                "kinship_stats": kinship_stats, "fs_fetches": fetches}, 200
+    except Exception:
+        db.rollback(); traceback.print_exc()
+        raise
+    finally:
+        db.close()
+
 @auth_bp.route("/logout", methods=["POST", "GET"])
 def logout():
     session.clear()
@@ -1,6 +1,8 @@
 from flask import Blueprint, jsonify, session, current_app
 import os, requests
 
+from ..infra.familysearch.fs_http import fs_get
+
 auth_status_bp = Blueprint("auth_status", __name__)
 
 API_BASE_URL = os.getenv("FS_API_BASE_URL", "https://apibeta.familysearch.org")
@@ -11,7 +13,7 @@ def auth_status():
     if not token:
         return jsonify({"connected": False}), 200
     try:
-        r = requests.get(
+        r = fs_get(
             f"{API_BASE_URL}/platform/users/current",
             headers={"Authorization": f"Bearer {token}", "Accept": "application/json"},
             timeout=10,
@@ -1,6 +1,6 @@
 # apps/api/src/api/routes_family.py
 from __future__ import annotations
-from flask import Blueprint, jsonify, session
+from flask import Blueprint, jsonify, request, session
 from sqlalchemy.orm import joinedload
 
 import re
@@ -8,6 +8,8 @@ from .routes_auth import login_required
 
 # Importa os modelos do banco de dados
 from ..infra.db.models import SessionLocal, Family, Membership, Invite, User, Snapshot, SnapshotNode, Person
+from ..services.ancestor_closure import common_ancestors, ensure_family_closure
+from ..services.family_version import family_etag, family_version, not_modified, with_etag
 
 family_bp = Blueprint("family_bp", __name__)
 
@@ -66,6 +68,10 @@ def get_management_data(slug: str):
 
         if not membership:
             return jsonify({"ok": False, "error": "forbidden"}), 403
+
+        etag = family_etag("manage", membership.family_id, family_version(db, membership.family_id))
+        cached = not_modified(etag)
+        if cached: return cached
         
         # 2. Busca todos os membros da família
         all_members = db.query(Membership).filter(
@@ -98,13 +104,13 @@ def get_management_data(slug: str):
             })
 
         # 4. Retorna os dados compilados
-        return jsonify({
+        return with_etag(jsonify({
             "ok": True,
             "data": {
                 "members": members_data,
                 "pending_invites": invites_data
             }
-        })
+        }), etag)
 
     finally:
         db.close()
@@ -125,6 +131,10 @@ def get_family_events(slug: str):
         family = db.query(Family).filter(Family.slug == slug).first()
         if not family:
             return jsonify({"ok": False, "error": "family_not_found"}), 404
+
+        etag = family_etag("events", family.id, family_version(db, family.id))
+        cached = not_modified(etag)
+        if cached: return cached
         
         people_query = db.query(Person).join(
             SnapshotNode, SnapshotNode.person_id == Person.id
@@ -160,7 +170,35 @@ def get_family_events(slug: str):
                         "year": year
                     })
         
-        return jsonify({"ok": True, "events": events})
+        return with_etag(jsonify({"ok": True, "events": events}), etag)
 
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+@family_bp.route("/family/<string:slug>/kinship", methods=["GET"])
+@login_required
+def get_family_kinship(slug: str):
+    """
+    Ancestrais comuns e grau de parentesco entre duas pessoas da família (?p1=&p2=),
+    lidos da tabela ancestor_closure: sem caminhar no grafo nem chamar o FamilySearch.
+    """
+    user_fs_id = session.get("user_fs_id")
+    p1 = (request.args.get("p1") or "").strip(); p2 = (request.args.get("p2") or "").strip()
+    if not p1 or not p2:
+        return jsonify({"ok": False, "error": "p1_and_p2_required"}), 400
+
+    db = SessionLocal()
+    try:
+        membership = db.query(Membership).join(Family).filter(
+            Family.slug == slug,
+            Membership.user_fs_id == user_fs_id
+        ).first()
+        if not membership:
+            return jsonify({"ok": False, "error": "not_found_or_forbidden"}), 404
+
+        if ensure_family_closure(db, membership.family_id):
+            db.commit()  # família antiga: fecho construído agora, uma única vez
+
+        return jsonify({"ok": True, "p1": p1, "p2": p2, **common_ancestors(db, membership.family_id, p1, p2)})
+    finally:
+        db.close()
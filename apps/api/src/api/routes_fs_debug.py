@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify, session
-import requests
 from ..infra.familysearch.fs_client import API_BASE_URL
+from ..infra.familysearch.fs_http import fs_get
 
 fs_dbg_bp = Blueprint("fs_dbg", __name__)
 
@@ -19,7 +19,7 @@ def fs_raw():
         "Accept": "application/x-gedcomx-atom+json",
     }
     url = f"{API_BASE_URL}{path}"
-    r = requests.get(url, headers=headers, params=params, timeout=25)
+    r = fs_get(url, headers=headers, params=params, timeout=25)
 
     try:
         data = r.json()
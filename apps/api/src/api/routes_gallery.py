@@ -11,6 +11,7 @@ from sqlalchemy.orm import joinedload
 from .routes_auth import login_required
 # Importa os modelos do banco de dados
 from ..infra.db.models import SessionLocal, Family, Membership, Media, User
+from ..services.family_version import bump_family_version, family_etag, family_version, not_modified, with_etag
 
 gallery_bp = Blueprint("gallery_bp", __name__)
 
@@ -61,6 +62,7 @@ def upload_media(slug: str):
             media_type='image'
         )
         db.add(new_media)
+        bump_family_version(db, membership.family_id)
         db.commit()
 
         return jsonify({"ok": True, "message": "File uploaded successfully", "media_id": new_media.id}), 201
@@ -80,6 +82,11 @@ def get_gallery(slug: str):
 
         if not membership:
             return jsonify({"ok": False, "error": "forbidden"}), 403
+
+        # As URLs das fotos são absolutas: o host entra no ETag.
+        etag = family_etag("gallery", membership.family_id, family_version(db, membership.family_id), request.host_url)
+        cached = not_modified(etag)
+        if cached: return cached
         
         # <<< MUDANÇA: Faz join com User para obter informações do autor >>>
         media_items = db.query(Media).filter(
@@ -102,7 +109,7 @@ def get_gallery(slug: str):
                 }
             })
 
-        return jsonify({"ok": True, "data": result})
+        return with_etag(jsonify({"ok": True, "data": result}), etag)
     finally:
         db.close()
 
@@ -135,6 +142,7 @@ def delete_media(media_id: int):
             # Continua para excluir o registro do DB mesmo que o arquivo não seja encontrado
 
         db.delete(media_item)
+        bump_family_version(db, media_item.family_id)
         db.commit()
 
         return jsonify({"ok": True, "message": "Mídia excluída com sucesso."})
@@ -6,6 +6,7 @@ from flask import Blueprint, jsonify, redirect, request, session, url_for
 
 # Importa os modelos do banco de dados
 from ..infra.db.models import SessionLocal, User, Family, Membership, Invite
+from ..services.family_version import bump_family_version
 
 from .routes_auth import login_required
 
@@ -75,6 +76,7 @@ def create_invite(slug: str):
             expires_at=expires_at
         )
         db.add(new_invite)
+        bump_family_version(db, membership.family_id)
         db.commit()
 
         # 4. Retorna a URL completa do convite, que o admin pode compartilhar
@@ -114,6 +116,7 @@ def delete_invite(invite_id: int):
 
         # 3. Exclui o convite
         db.delete(invite)
+        bump_family_version(db, invite.family_id)
         db.commit()
 
         return jsonify({"ok": True, "message": "Convite excluído com sucesso."})
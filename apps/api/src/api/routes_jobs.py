@@ -0,0 +1,94 @@
+# apps/api/src/api/routes_jobs.py
+"""
+Jobs assíncronos: clonagens e buscas de caminho rodam no worker
+(`python -m apps.api.src.worker`; sem worker vivo, numa thread do app), não na requisição.
+
+    POST /jobs                {"kind": "...", "params": {...}}  -> 202 {"job": {...}, "deduplicated": bool}
+    GET  /jobs/<id>           status
+    GET  /jobs/<id>/result    resultado (202 enquanto não termina)
+    POST /jobs/<id>/cancel
+
+kind: snapshot_clone (mesmo corpo do /snapshot/clone), tree_clone, tree_load, path_search.
+"""
+from __future__ import annotations
+from typing import Any, Dict
+from flask import Blueprint, jsonify, request, session
+
+from .routes_auth import login_required
+from ..infra.jobs import job_queue
+from ..worker import dispatch
+
+jobs_bp = Blueprint("jobs", __name__)
+
+def _token() -> str | None:
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "): return auth.split(" ", 1)[1].strip()
+    return session.get("fs_token") or session.get("fs_access_token")
+
+def _params_for(kind: str, p: Dict[str, Any]) -> Dict[str, Any] | None:
+    """Parâmetros normalizados por tipo (a chave de deduplicação sai daqui); None se faltar o obrigatório."""
+    if kind == "snapshot_clone":
+        body = {k: p[k] for k in ("husband", "wife", "desc_depth", "slug", "concurrency", "mode", "force") if p.get(k) not in (None, "")}
+        if not (body.get("husband") or body.get("wife")) or not session.get("user_person_id"): return None
+        return {"user_fs_id": session.get("user_fs_id"), "user_person_id": session.get("user_person_id"), "body": body}
+    if kind == "tree_clone":
+        if not (p.get("husband") or p.get("wife")): return None
+        return {"husband": p.get("husband"), "wife": p.get("wife"), "depth_desc": int(p.get("desc", 3)), "depth_asc": int(p.get("asc", 1)),
+                "family_slug": p.get("family") or "default", "bulk": p.get("mode") == "bulk"}
+    if kind == "tree_load":
+        if not p.get("fsid"): return None
+        return {"fsid": p["fsid"], "depth": int(p.get("depth") or 4)}
+    if kind == "path_search":
+        p1, p2 = (p.get("person1_id") or "").strip().upper(), (p.get("person2_id") or "").strip().upper()
+        if not (p1 and p2): return None
+        return {"person1_id": p1, "person2_id": p2, "max_depth": int(p.get("max_depth") or 8),
+                "prefetch_generations": p.get("prefetch_generations")}
+    return None
+
+def _own_job(job_id: str):
+    """Job do usuário logado, ou a resposta de erro."""
+    job = job_queue.get(job_id)
+    if not job or job_queue.owner_of(job_id) != session.get("user_fs_id"):
+        return None, (jsonify({"ok": False, "error": "Job não encontrado."}), 404)
+    return job, None
+
+def enqueue(kind: str, raw_params: Dict[str, Any]):
+    """Enfileira um job do usuário logado e devolve a resposta 202 (usado também por /snapshot/clone com "async")."""
+    token, user_fs_id = _token(), session.get("user_fs_id")
+    if not token or not user_fs_id: return jsonify({"ok": False, "error": "Sessão inválida ou incompleta."}), 401
+    params = _params_for(kind, raw_params)
+    if params is None: return jsonify({"ok": False, "error": "Tipo de job ou parâmetros inválidos."}), 400
+    job, created = job_queue.submit(kind, params, owner=user_fs_id, token=token); dispatch(job)
+    print(f"[jobs] {kind} {job['id']} {'enfileirado' if created else 'reaproveitado'} por {user_fs_id}")
+    return jsonify({"ok": True, "job": job, "deduplicated": not created}), 202
+
+@jobs_bp.post("/jobs")
+@login_required
+def submit_job():
+    body = request.get_json(silent=True) or {}
+    return enqueue(body.get("kind"), body.get("params") or {})
+
+@jobs_bp.get("/jobs/<string:job_id>")
+@login_required
+def job_status(job_id: str):
+    job, err = _own_job(job_id)
+    if err: return err
+    return jsonify({"ok": True, "job": job}), 200
+
+@jobs_bp.get("/jobs/<string:job_id>/result")
+@login_required
+def job_result(job_id: str):
+    job, err = _own_job(job_id)
+    if err: return err
+    if job["status"] in ("queued", "running"): return jsonify({"ok": False, "job": job}), 202
+    payload, status = job_queue.result(job_id)
+    if payload is None:  # cancelado, ou o processo do job morreu sem resultado
+        return jsonify({"ok": False, "job": job, "error": job["error"] or job["status"]}), (409 if job["status"] == "cancelled" else 500)
+    return jsonify(payload), status
+
+@jobs_bp.post("/jobs/<string:job_id>/cancel")
+@login_required
+def job_cancel(job_id: str):
+    _, err = _own_job(job_id)
+    if err: return err
+    return jsonify({"ok": True, "job": job_queue.cancel(job_id)}), 200
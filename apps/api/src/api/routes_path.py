@@ -1,12 +1,22 @@
-from flask import Blueprint, request, jsonify
+import os
+import time
+from flask import Blueprint, request, jsonify, session
 from ..services.pathfinder import rf_path_unauth, build_path_details_from_ids
 from ..infra.familysearch.fs_client_helpers import auth_headers_from_session
 from ..infra.familysearch.fs_api import get_person_with_relatives
+from ..infra.familysearch.fs_http import FS_HTTP_POOL_SIZE
+from .pathfinder_logic import get_cached_path, remember_path
 
-from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 path_bp = Blueprint("path", __name__)
 
+# Orçamento do fallback autenticado: chamadas a /relationships e tempo de parede.
+PATH_BFS_MAX_DEPTH = int(os.getenv("PATH_BFS_MAX_DEPTH", "6"))
+PATH_BFS_MAX_CALLS = int(os.getenv("PATH_BFS_MAX_CALLS", "300"))
+PATH_BFS_MAX_SECONDS = float(os.getenv("PATH_BFS_MAX_SECONDS", "20"))
+PATH_BFS_MAX_WORKERS = min(int(os.getenv("PATH_BFS_MAX_WORKERS", "8")), FS_HTTP_POOL_SIZE)
+
 def _neighbors(person_id: str, headers: dict) -> set[str]:
     """
     Lê /platform/tree/persons/{id}/relationships e devolve um conjunto de vizinhos (pais, filhos, cônjuges).
@@ -29,8 +39,8 @@ def _neighbors(person_id: str, headers: dict) -> set[str]:
     caps = rel.get("childAndParentsRelationships") or []
     for r in caps:
         c = (r.get("child") or {}).get("resourceId")
-        f = (r.get("father") or {}).get("resourceId")
-        m = (r.get("mother") or {}).get("resourceId")
+        f = (r.get("father") or r.get("parent1") or {}).get("resourceId")
+        m = (r.get("mother") or r.get("parent2") or {}).get("resourceId")
         for pid in (c, f, m):
             if pid and pid != person_id:
                 nbrs.add(pid)
@@ -46,37 +56,66 @@ def _neighbors(person_id: str, headers: dict) -> set[str]:
 
     return nbrs
 
-def _bfs_path(src: str, dst: str, headers: dict, max_depth: int = 6) -> list[str] | None:
+def _bfs_path(src: str, dst: str, headers: dict, max_depth: int = PATH_BFS_MAX_DEPTH, max_calls: int = PATH_BFS_MAX_CALLS,
+              max_seconds: float = PATH_BFS_MAX_SECONDS, max_workers: int = PATH_BFS_MAX_WORKERS) -> tuple[list[str] | None, dict]:
     """
-    BFS simples sobre o grafo de relacionamentos do FS (pais/filhos/cônjuges).
-    Limite de profundidade para evitar explosão de chamadas.
+    BFS bidirecional sobre o grafo de relacionamentos do FS (pais/filhos/cônjuges).
+    Expande sempre a fronteira menor, um nível por vez, com os vizinhos do nível
+    buscados em paralelo. Devolve (caminho | None, stats); stats["reason"] é
+    found | no_path | no_path_within_depth | budget_exhausted (chamadas ou tempo).
     """
+    stats = {"calls": 0, "reason": "found", "max_depth": max_depth, "max_calls": max_calls}
     if src == dst:
-        return [src]
-
-    visited = {src}
-    parent = {}
-    q = deque()
-    q.append((src, 0))
-
-    while q:
-        u, d = q.popleft()
-        if d >= max_depth:
-            continue
-        for v in _neighbors(u, headers):
-            if v in visited:
-                continue
-            visited.add(v)
-            parent[v] = u
-            if v == dst:
-                # reconstrói caminho
-                path = [v]
-                while path[-1] != src:
-                    path.append(parent[path[-1]])
-                path.reverse()
-                return path
-            q.append((v, d + 1))
-    return None
+        return [src], stats
+
+    t0 = time.perf_counter(); deadline = t0 + max_seconds
+    sides = ({src: None}, {dst: None})  # por lado: nó -> vizinho pelo qual foi alcançado
+    frontiers, depths = [[src], [dst]], [0, 0]
+
+    def trace(prev: dict, node: str) -> list[str]:
+        out = []
+        while node is not None:
+            out.append(node); node = prev[node]
+        return out
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while frontiers[0] and frontiers[1]:
+            if depths[0] + depths[1] >= max_depth:
+                stats["reason"] = "no_path_within_depth"; return None, stats
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            mine, other = sides[side], sides[1 - side]
+            # Sem orçamento para o nível inteiro: gasta o que resta e, sem encontro, para aí.
+            room = max_calls - stats["calls"]
+            level, truncated = frontiers[side][:room], len(frontiers[side]) > room
+            if not level:
+                stats["reason"] = "budget_exhausted"; return None, stats
+            stats["calls"] += len(level)
+            futures = {pool.submit(_neighbors, u, headers): u for u in level}
+            pending, nxt = set(futures), []
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, deadline - time.perf_counter()), return_when=FIRST_COMPLETED)
+                if not done:
+                    stats["reason"] = "budget_exhausted"; return None, stats
+                for fut in done:
+                    u = futures[fut]
+                    for v in fut.result():
+                        if v in mine:
+                            continue
+                        mine[v] = u
+                        if v in other:  # encontro: metade de cada lado
+                            half, rest = trace(mine, v)[::-1], trace(other, v)[1:]
+                            return (half + rest if side == 0 else rest[::-1] + half[::-1]), stats
+                        nxt.append(v)
+            if truncated:
+                stats["reason"] = "budget_exhausted"; return None, stats
+            frontiers[side] = nxt; depths[side] += 1
+        stats["reason"] = "no_path"
+        return None, stats
+    finally:
+        stats["seconds"] = round(time.perf_counter() - t0, 3)
+        # Não espera retardatários: terminam em segundo plano.
+        pool.shutdown(wait=False, cancel_futures=True)
 
 @path_bp.get("/path")
 def path():
@@ -85,9 +124,18 @@ def path():
     if not p1 or not p2:
         return jsonify({"ok": False, "error":"from/to required"}), 400
 
+    # 0) caminho já calculado e ainda válido (relações dos nós não mudaram): os públicos
+    #    (Relationship Finder) servem a todos; os do BFS autenticado, só ao mesmo token.
+    token = session.get("fs_access_token")
+    cached = get_cached_path(p1, p2, kind="path") or (token and get_cached_path(p1, p2, kind="path", token=token))
+    if cached:
+        details = build_path_details_from_ids(cached["ids"], cached.get("common"), auth_headers_from_session())
+        return jsonify({"ok": True, "method": "cache", "path": details}), 200
+
     # 1) tenta Relationship Finder público (rápido)
     rf = rf_path_unauth(p1, p2)
     if rf.get("ok"):
+        remember_path(p1, p2, {"ids": rf["ids"], "common": rf["common"]}, kind="path")
         headers = auth_headers_from_session()
         details = build_path_details_from_ids(rf["ids"], rf["common"], headers)
         return jsonify({"ok": True, "method": "rf_public", "path": details}), 200
@@ -98,9 +146,11 @@ def path():
         # sem token, devolve o motivo do RF e pede login
         return jsonify({"ok": False, "method": "rf_public", "reason": rf.get("reason", "no_path"), "hint": "Faça login em /login para tentar o fallback BFS"}), 404
 
-    ids = _bfs_path(p1, p2, headers, max_depth=6)
+    ids, stats = _bfs_path(p1, p2, headers)
+    print(f"[path] bfs_auth {p1}->{p2}: {stats}")
     if ids:
+        remember_path(p1, p2, {"ids": ids, "common": None}, kind="path", token=token)
         details = build_path_details_from_ids(ids, common_id=None, headers=headers)
-        return jsonify({"ok": True, "method": "bfs_auth", "path": details}), 200
+        return jsonify({"ok": True, "method": "bfs_auth", "path": details, "stats": stats}), 200
 
-    return jsonify({"ok": False, "method": "bfs_auth", "reason": "no_path_within_depth", "max_depth": 6}), 404
+    return jsonify({"ok": False, "method": "bfs_auth", **stats}), 404
@@ -12,6 +12,7 @@ from .routes_auth import login_required
 
 # Importa os modelos do banco de dados
 from ..infra.db.models import SessionLocal, Family, Membership, Post, Comment, User
+from ..services.family_version import bump_family_version, family_etag, family_version, not_modified, with_etag
 
 posts_bp = Blueprint("posts_bp", __name__)
 
@@ -29,6 +30,10 @@ def get_posts(slug: str):
         if not membership:
             return jsonify({"ok": False, "error": "forbidden"}), 403
 
+        etag = family_etag("posts", membership.family_id, family_version(db, membership.family_id))
+        cached = not_modified(etag)
+        if cached: return cached
+
         posts_query = db.query(Post).filter(
             Post.family_id == membership.family_id
         ).options(
@@ -70,7 +75,7 @@ def get_posts(slug: str):
                 "comments": comments_data
             })
 
-        return jsonify({"ok": True, "data": result})
+        return with_etag(jsonify({"ok": True, "data": result}), etag)
 
     except Exception as e:
         print(f"!!! ERRO INESPERADO EM GET_POSTS: {e} !!!")
@@ -92,7 +97,7 @@ def create_post(slug: str):
         membership = db.query(Membership).join(Family).filter(Family.slug == slug, Membership.user_fs_id == user_fs_id).first()
         if not membership: return jsonify({"ok": False, "error": "forbidden"}), 403
         new_post = Post(family_id=membership.family_id, user_fs_id=user_fs_id, title=title, content=content)
-        db.add(new_post); db.commit()
+        db.add(new_post); bump_family_version(db, membership.family_id); db.commit()
         return jsonify({"ok": True, "message": "Post created successfully", "post_id": new_post.id}), 201
     finally:
         db.close()
@@ -112,7 +117,7 @@ def create_comment(post_id: int):
         membership = db.query(Membership).filter_by(family_id=post.family_id, user_fs_id=user_fs_id).first()
         if not membership: return jsonify({"ok": False, "error": "forbidden"}), 403
         new_comment = Comment(post_id=post_id, user_fs_id=user_fs_id, content=content)
-        db.add(new_comment); db.commit()
+        db.add(new_comment); bump_family_version(db, post.family_id); db.commit()
         return jsonify({"ok": True, "message": "Comment added successfully", "comment_id": new_comment.id}), 201
     finally:
         db.close()
@@ -133,6 +138,7 @@ def delete_post(post_id: int):
             return jsonify({"ok": False, "error": "Você não tem permissão para excluir esta publicação."}), 403
 
         db.delete(post)
+        bump_family_version(db, post.family_id)
         db.commit()
         return jsonify({"ok": True, "message": "Publicação excluída com sucesso."})
     except IntegrityError:
@@ -1,23 +1,34 @@
 # apps/api/src/api/routes_snapshot.py - CÓDIGO INTEGRAL ATUALIZADO
 
 from __future__ import annotations
-import os, time, traceback, json
-from typing import Any, Dict, List, Tuple
+import os, time, traceback, json, queue, threading
+from typing import Any, Callable, Dict, List, Tuple
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import requests
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, Response, jsonify, request, session
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import or_, and_, exists  
 from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from .routes_auth import login_required
-from .pathfinder_logic import find_kinship_path
+from .pathfinder_logic import find_kinship_path_cached, remember_path
+from .routes_jobs import enqueue
 
 from ..infra.db.models import (
     init_db, SessionLocal, Person, Relation,
     Snapshot, SnapshotNode, SnapshotEdge, User, Family, Membership, UserPath, Post, Media
 )
-try: from ..infra.familysearch.fs_routes import FS_BASE as API_BASE_URL
-except Exception: API_BASE_URL = "https://apibeta.familysearch.org"
+from ..infra.familysearch.fs_persons import fetch_person_with_relatives
+from ..infra.familysearch.fs_http import FS_BASE as API_BASE_URL, FS_HTTP_POOL_SIZE, fs_get
+from ..infra.familysearch.fs_tree import descendancy_relatives
+from ..services.ancestor_closure import add_parent_edge, add_persons, ensure_family_closure, rebuild_family_closure
+from ..services.relationship import label_relatives
+from ..services.snapshot_persist import edge_key, load_fresh_fetches, record_fetches, refresh_snapshot_graph, save_snapshot_graph
+from ..services import snapshot_payload
+from ..services.family_version import (
+    bump_family_version, bump_family_versions, family_etag, family_version, not_modified, with_etag
+)
+from ..infra.cache.person_cache import get_person_cache
 
 snapshot_bp = Blueprint("snapshot", __name__)
 
@@ -28,63 +39,197 @@ def _auth_token() -> str | None:
 
 def _headers_json(token: str) -> Dict[str, str]: return {"Authorization": f"Bearer {token}", "Accept": "application/json"}
 
-def _me(token: str) -> Dict[str, Any]: r = requests.get(f"{API_BASE_URL}/platform/users/current", headers=_headers_json(token), timeout=20); r.raise_for_status(); return r.json()
-
-def _fetch_person_with_relatives(token: str, pid: str) -> Tuple[Dict | None, List[str], List[str], List[str]]:
-    url = f"{API_BASE_URL}/platform/tree/persons/{pid}?personDetails=true&children=true"
-    try: r = requests.get(url, headers=_headers_json(token), timeout=20); r.raise_for_status(); data = r.json()
-    except requests.RequestException: return None, [], [], []
-    details = (data.get("persons") or [None])[0]; parents, spouses, children = set(), set(), set()
-    if not details: return None, [], [], []
-    for rel in data.get("childAndParentsRelationships", []):
-        p1 = (rel.get("parent1") or {}).get("resourceId"); p2 = (rel.get("parent2") or {}).get("resourceId"); child = (rel.get("child") or {}).get("resourceId")
-        if child == pid:
-            if p1: parents.add(p1)
-            if p2: parents.add(p2)
-        if (p1 == pid or p2 == pid) and child:
-            children.add(child)
-            if p1 == pid and p2: spouses.add(p2)
-            elif p2 == pid and p1: spouses.add(p1)
-    return details, list(parents), list(spouses), list(children)
+def _me(token: str) -> Dict[str, Any]: r = fs_get(f"{API_BASE_URL}/platform/users/current", headers=_headers_json(token), timeout=20); r.raise_for_status(); return r.json()
+
+_fetch_person_with_relatives = fetch_person_with_relatives  # cacheado (infra/cache/person_cache)
 
 def _format_node(details: Dict) -> Dict:
     display = details.get("display") or {}; gender_type = (details.get("gender") or {}).get("type", "")
     gender = "Male" if "Male" in gender_type else "Female" if "Female" in gender_type else "Unknown"
     return { "id": details.get("id"), "name": display.get("name"), "gender": gender, "birth": {"date": display.get("birthDate"), "place": display.get("birthPlace")}, "death": {"date": display.get("deathDate"), "place": display.get("deathPlace")}, "living": details.get("living", False) }
 
-def _build_tree_iteratively(token: str, roots: List[str], desc_depth: int) -> Tuple[List[Dict], List[Dict]]:
-    nodes, edges = {}, {}; processed_ids = set(); queue = deque([(pid, 0) for pid in roots])
+# Teto de concorrência do crawler de /snapshot/clone (por worker do gunicorn).
+# Limitado ao pool keep-alive do cliente compartilhado para que toda requisição reuse conexão.
+SNAPSHOT_CLONE_MAX_WORKERS = min(int(os.getenv("SNAPSHOT_CLONE_MAX_WORKERS", "8")), FS_HTTP_POOL_SIZE)
+
+# Re-clone de um slug existente (refresh): pessoas lidas no FamilySearch há menos que isto não são buscadas de novo.
+SNAPSHOT_REFRESH_FRESH_SECONDS = int(os.getenv("SNAPSHOT_REFRESH_FRESH_SECONDS", str(24 * 3600)))
+
+# Rótulos de parentesco por (snapshot, viewer) do GET /snapshot/<slug>?relationships=1
+_relationship_cache = get_person_cache("snapshot-relationships", ttl=3600)
+
+# /platform/tree/descendancy aceita no máximo 2 gerações por chamada.
+BULK_DESCENDANCY_GENERATIONS = 2
+
+# /snapshot/clone?stream=1: intervalo mínimo entre eventos de progresso (e keep-alive da resposta).
+CLONE_PROGRESS_EVERY = float(os.getenv("SNAPSHOT_CLONE_PROGRESS_EVERY", "1.0"))
+
+class CloneProgress:
+    """
+    Contadores do crawl de /snapshot/clone e eventos para o stream NDJSON: `emit` recebe
+    {"event": "progress", depth, persons, edges, fs_calls, errors, eta, ...} (no máximo um
+    a cada `every` s entre níveis) e {"event": "nodes", nodes, edges} a cada lote descoberto.
+    eta (s) extrapola o crescimento do último nível até desc_depth; é só uma estimativa.
+    """
+    def __init__(self, emit: Callable[[Dict], None], desc_depth: int, every: float = CLONE_PROGRESS_EVERY):
+        self.emit, self.desc_depth, self.every = emit, desc_depth, every
+        self.t0 = time.perf_counter(); self._last = 0.0; self._lock = threading.Lock()
+        self.phase, self.depth, self.persons, self.edges, self.fs_calls, self.errors = "kinship", 0, 0, 0, 0, 0
+        self.level_size, self._eta, self._eta_at, self._crawl_t0 = 0, None, self.t0, None
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.perf_counter()
+        eta = None if self._eta is None else round(max(0.0, self._eta - (now - self._eta_at)), 1)
+        return {"event": "progress", "phase": self.phase, "depth": self.depth, "desc_depth": self.desc_depth, "level_persons": self.level_size,
+                "persons": self.persons, "edges": self.edges, "fs_calls": self.fs_calls, "errors": self.errors,
+                "elapsed": round(now - self.t0, 1), "eta": eta}
+
+    def _maybe_emit(self, force: bool = False):
+        now = time.perf_counter()
+        with self._lock:
+            if not force and now - self._last < self.every: return
+            self._last = now
+        self.emit(self.snapshot())
+
+    def set_phase(self, phase: str):
+        self.phase = phase; self._maybe_emit(force=True)
+
+    def tick(self, n: int = 1):
+        """Uma requisição ao FS terminou (chamado das threads do pool)."""
+        with self._lock: self.fs_calls += n
+        self._maybe_emit()
+
+    def level(self, depth: int, size: int):
+        if self._crawl_t0 is None: self._crawl_t0 = time.perf_counter()
+        self.phase, self.depth, self.level_size = "crawl", depth, size; self._maybe_emit(force=True)
+
+    def found(self, nodes: List[Dict], edges: List[Dict], errors: int = 0, next_size: int | None = None):
+        self.persons += len(nodes); self.edges += len(edges); self.errors += errors
+        if nodes or edges: self.emit({"event": "nodes", "nodes": nodes, "edges": edges})
+        if next_size is not None and self._crawl_t0 is not None:
+            # Próximos níveis crescem na razão do último; custo por pessoa = tempo de crawl até aqui / pessoas.
+            growth = min(next_size / self.level_size, 10.0) if self.level_size else 0.0
+            # Faltam os níveis depth+1..desc_depth e o lote final (filhos do último nível, sem expandir).
+            remaining = sum(next_size * growth ** i for i in range(max(1, self.desc_depth - self.depth + 1))) if next_size else 0
+            per_person = (time.perf_counter() - self._crawl_t0) / max(1, self.persons)
+            self._eta, self._eta_at = remaining * per_person, time.perf_counter()
+        self._maybe_emit(force=True)
+
+def _fetch_many(pool: ThreadPoolExecutor, token: str, pids: List[str], tick: Callable[[], None] | None = None) -> List[Tuple[Dict | None, List[str], List[str], List[str]]]:
+    """Busca vários PIDs em paralelo no pool, preservando a ordem de entrada."""
+    def one(pid: str):
+        result = _fetch_person_with_relatives(token, pid)
+        if tick: tick()
+        return result
+    return list(pool.map(one, pids))
+
+def _fetch_descendancy(token: str, pid: str, generations: int) -> Dict[str, Dict]:
+    try: return descendancy_relatives(token, pid, generations=generations)
+    except (requests.RequestException, ValueError): return {}
+
+def _merge_known(known: Dict[str, Dict], batch: Dict[str, Dict]):
+    """Junta um lote de descendência ao mapa conhecido sem rebaixar entradas completas."""
+    for pid, entry in batch.items():
+        current = known.get(pid)
+        if current is None or (entry["complete"] and not current["complete"]): known[pid] = entry
+
+def _resolve_many(pool: ThreadPoolExecutor, token: str, pids: List[str], known: Dict[str, Dict],
+                  need_relatives: bool = True, tick: Callable[[], None] | None = None) -> Tuple[List[Tuple[Dict | None, List[str], List[str], List[str]]], int]:
+    """
+    Usa o que já veio em lote (`known`) e busca por pessoa só quem ficou de fora; o que foi
+    buscado entra em `known` (completo). Retorna (resultados na ordem de `pids`, número de requisições feitas).
+    """
+    def usable(pid: str) -> bool:
+        entry = known.get(pid)
+        return bool(entry) and (entry["complete"] or not need_relatives)
+    missing = [pid for pid in pids if not usable(pid)]
+    fetched = dict(zip(missing, _fetch_many(pool, token, missing, tick)))
+    for pid, (details, _, spouse_ids, child_ids) in fetched.items():
+        if details: known[pid] = {"details": details, "spouses": spouse_ids, "children": child_ids, "complete": True}
+    results = [fetched[pid] if pid in fetched else (known[pid]["details"], [], known[pid]["spouses"], known[pid]["children"]) for pid in pids]
+    return results, len(missing)
+
+def _build_tree_iteratively(token: str, roots: List[str], desc_depth: int, max_workers: int | None = None,
+                            level_stats: List[Dict] | None = None, bulk: bool = False, progress: CloneProgress | None = None,
+                            known: Dict[str, Dict] | None = None) -> Tuple[List[Dict], List[Dict]]:
+    """
+    BFS nível a nível: todas as pessoas de uma profundidade são buscadas em paralelo
+    (até `max_workers` requisições simultâneas), depois os cônjuges ainda desconhecidos.
+    Com `bulk=True`, as pessoas pedem /platform/tree/descendancy (2 gerações por chamada)
+    em níveis alternados, terminando em desc_depth-1, e a leitura por pessoa fica só para
+    quem os lotes não trouxeram.
+    Se `level_stats` for passado, recebe {depth, persons, requests, seconds} de cada nível.
+    `progress` recebe os contadores e as pessoas/arestas novas de cada nível (stream do clone).
+    `known` ({pid: {details, spouses, children, complete}}) pode vir pré-carregado (refresh: pessoas
+    ainda frescas, que não são buscadas de novo) e termina com tudo o que foi lido no crawl.
+    """
+    workers = max(1, min(max_workers or SNAPSHOT_CLONE_MAX_WORKERS, SNAPSHOT_CLONE_MAX_WORKERS))
+    nodes, edges = {}, {}; processed_ids = set(); known = {} if known is None else known
+    level, depth = list(dict.fromkeys(roots)), 0
     # Conjunto para rastrear filhos para os quais *devemos* buscar detalhes
-    children_to_fetch_details = set()
-    while queue:
-        pid, depth = queue.popleft()
-        if pid in processed_ids: continue
-        details, _, spouse_ids, child_ids = _fetch_person_with_relatives(token, pid); processed_ids.add(pid)
-        if not details: continue
-        nodes[pid] = _format_node(details)
-        for spouse_id in spouse_ids:
-            # <<< CORREÇÃO AQUI: Chave de aresta consistente >>>
-            edges[("couple", *tuple(sorted((pid, spouse_id))))] = {"type": "couple", "a": pid, "b": spouse_id}
-            if spouse_id not in nodes:
-                s_details, _, _, _ = _fetch_person_with_relatives(token, spouse_id)
-                if s_details: nodes[spouse_id] = _format_node(s_details)
-        if depth < desc_depth:
-            for child_id in child_ids:
-                if child_id not in processed_ids: queue.append((child_id, depth + 1))
-                # <<< CORREÇÃO AQUI: Chave de aresta consistente >>>
-                edges[("parentChild", pid, child_id)] = {"type": "parentChild", "from": pid, "to": child_id}
-        elif child_ids:
-            # Se estiver NO LIMITE da profundidade, não expande mais,
-            # mas *ainda* cria as arestas e marca os filhos para buscar seus dados.
-            for child_id in child_ids:
-                edges[("parentChild", pid, child_id)] = {"type": "parentChild", "from": pid, "to": child_id}
-                if child_id not in processed_ids:
-                    children_to_fetch_details.add(child_id)
-    for child_id in children_to_fetch_details:
-        if child_id not in nodes: # Garante que não buscamos quem já temos
-            c_details, _, _, _ = _fetch_person_with_relatives(token, child_id)
-            if c_details:
-                nodes[child_id] = _format_node(c_details)
+    children_to_fetch_details: Dict[str, None] = {}
+    tick = progress.tick if progress else None
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot-crawl") as pool:
+        while level:
+            t0 = time.perf_counter(); requests_count = 0; new_nodes, new_edges, errors = [], [], 0
+            if progress: progress.level(depth, len(level))
+            if bulk:
+                generations = max(1, min(BULK_DESCENDANCY_GENERATIONS, desc_depth - depth + 1))
+                # Lotes alinhados pelo fim: nos níveis desc_depth-1, desc_depth-3, ... pede também quem já
+                # está completo se algum filho não está, e o último lote traz a última geração e os filhos
+                # de borda; entre eles só quem ficou de fora. Os níveis crescem geometricamente: pagar um
+                # nível antes custa menos. Pessoas frescas de um refresh (em `known`) não são pedidas.
+                aligned = (desc_depth - depth) % BULK_DESCENDANCY_GENERATIONS == 1
+                complete = lambda pid: bool((known.get(pid) or {}).get("complete"))
+                pending = [pid for pid in level if not complete(pid) or (aligned and not all(map(complete, known[pid]["children"])))]
+                for batch in pool.map(lambda pid: _fetch_descendancy(token, pid, generations), pending):
+                    _merge_known(known, batch)
+                    if tick: tick()
+                requests_count += len(pending)
+            results, fetched = _resolve_many(pool, token, level, known, tick=tick); requests_count += fetched
+            processed_ids.update(level)
+            next_level: Dict[str, None] = {}; spouses_to_fetch: Dict[str, None] = {}
+            for pid, (details, _, spouse_ids, child_ids) in zip(level, results):
+                if not details: errors += 1; continue
+                nodes[pid] = _format_node(details); new_nodes.append(nodes[pid])
+                for spouse_id in spouse_ids:
+                    key = ("couple", *tuple(sorted((pid, spouse_id))))
+                    if key not in edges: new_edges.append({"type": "couple", "a": pid, "b": spouse_id})
+                    edges[key] = {"type": "couple", "a": pid, "b": spouse_id}
+                    spouses_to_fetch[spouse_id] = None
+                for child_id in child_ids:
+                    if ("parentChild", pid, child_id) not in edges: new_edges.append({"type": "parentChild", "from": pid, "to": child_id})
+                    edges[("parentChild", pid, child_id)] = {"type": "parentChild", "from": pid, "to": child_id}
+                    if child_id in processed_ids: continue
+                    if depth < desc_depth: next_level[child_id] = None
+                    # No LIMITE da profundidade não expande mais, mas marca os filhos para buscar seus dados.
+                    else: children_to_fetch_details[child_id] = None
+            # Cônjuges que não apareceram como pessoas deste nível (nem de anteriores)
+            spouse_ids = [sid for sid in spouses_to_fetch if sid not in nodes]
+            spouse_results, fetched = _resolve_many(pool, token, spouse_ids, known, need_relatives=False, tick=tick)
+            for spouse_id, (s_details, _, _, _) in zip(spouse_ids, spouse_results):
+                if s_details: nodes[spouse_id] = _format_node(s_details); new_nodes.append(nodes[spouse_id])
+                else: errors += 1
+            requests_count += fetched
+            if level_stats is not None:
+                level_stats.append({"depth": depth, "persons": len(level), "requests": requests_count,
+                                    "seconds": round(time.perf_counter() - t0, 3)})
+            if progress:
+                progress.found(new_nodes, new_edges, errors, next_size=len(next_level) or len([c for c in children_to_fetch_details if c not in nodes]))
+            level, depth = list(next_level), depth + 1
+        # Garante que não buscamos quem já temos
+        edge_children = [cid for cid in children_to_fetch_details if cid not in nodes]
+        if edge_children:
+            t0 = time.perf_counter(); new_nodes, errors = [], 0
+            if progress: progress.level(depth, len(edge_children))
+            child_results, fetched = _resolve_many(pool, token, edge_children, known, need_relatives=False, tick=tick)
+            for child_id, (c_details, _, _, _) in zip(edge_children, child_results):
+                if c_details: nodes[child_id] = _format_node(c_details); new_nodes.append(nodes[child_id])
+                else: errors += 1
+            if progress: progress.found(new_nodes, [], errors, next_size=0)
+            if level_stats is not None:
+                level_stats.append({"depth": depth, "persons": len(edge_children), "requests": fetched,
+                                    "seconds": round(time.perf_counter() - t0, 3)})
     return list(nodes.values()), list(edges.values())
 
 def _upsert_person(db, p_data: Dict):
@@ -95,14 +240,18 @@ def _upsert_person(db, p_data: Dict):
     p.birth, p.birth_place = birth.get("date"), birth.get("place")
     p.death, p.death_place = death.get("date"), death.get("place")
 
-def _ensure_edge(db, e_data: Dict):
+def _ensure_edge(db, e_data: Dict) -> bool:
+    """Grava a relação se ainda não existe; True se era nova."""
     typ = e_data.get("type"); src = e_data.get("from") or e_data.get("a"); dst = e_data.get("to") or e_data.get("b")
-    if not all([typ, src, dst]): return
+    if not all([typ, src, dst]): return False
     if typ == 'couple': src, dst = tuple(sorted((src, dst)))
     try:
         q = db.query(Relation).filter_by(rel_type=typ, src_id=src, dst_id=dst)
-        if q.first() is None: db.add(Relation(rel_type=typ, src_id=src, dst_id=dst)); db.flush()
+        if q.first() is None:
+            db.add(Relation(rel_type=typ, src_id=src, dst_id=dst)); db.flush()
+            return True
     except IntegrityError: db.rollback()
+    return False
 
 # --- Helpers de normalização / debug / UPSERT -------------------------------
 
@@ -120,9 +269,7 @@ def _normalize_edge(e: Dict) -> Tuple[Tuple[str, str, str], Dict]:
         return ("parentChild", src, dst), {"type": "parentChild", "from": src, "to": dst}
 
 def _debug_log_edges(descendant_edges: List[Dict], kinship_edges: List[Dict]):
-    """Imprime duplicatas em memória e de que lista vieram, se ?debug=1."""
-    if request.args.get("debug") != "1":
-        return
+    """Imprime duplicatas em memória e de que lista vieram (?debug=1)."""
     from collections import Counter
     all_edges = []
     for e in descendant_edges:
@@ -172,19 +319,95 @@ def _insert_snapshot_edge_idempotent(db, snap_id: int, etype: str, src: str, dst
 @snapshot_bp.post("/snapshot/clone")
 @login_required
 def snapshot_clone():
+    """
+    Clona na hora; com ?stream=1 responde NDJSON com o progresso do crawl (ver _clone_stream);
+    com {"async": true} no corpo, enfileira um job (ver /jobs) e devolve 202.
+    """
     token = _auth_token(); user_fs_id = session.get("user_fs_id"); user_person_id = session.get("user_person_id")
     if not all([token, user_fs_id, user_person_id]): return jsonify({"ok": False, "error": "Sessão inválida ou incompleta."}), 401
     
-    body = request.get_json(silent=True) or {}; husband, wife = (body.get("husband") or "").strip(), (body.get("wife") or "").strip()
+    body = request.get_json(silent=True) or {}
+    if body.get("async"): return enqueue("snapshot_clone", body)
+    debug = request.args.get("debug") == "1"
+    if request.args.get("stream") == "1": return _clone_stream(token, user_fs_id, user_person_id, body, debug)
+    payload, status = clone_snapshot(token, user_fs_id, user_person_id, body, debug=debug)
+    return jsonify(payload), status
+
+def _clone_stream(token: str, user_fs_id: str, user_person_id: str, body: Dict[str, Any], debug: bool) -> Response:
+    """
+    /snapshot/clone?stream=1: NDJSON (uma linha JSON por evento) enquanto o crawl roda numa thread.
+      {"event": "progress", "phase": "kinship|crawl|saving", "depth", "persons", "edges", "fs_calls", "errors", "eta", ...}
+      {"event": "nodes", "nodes": [...], "edges": [...]}   pessoas/arestas novas, para desenhar aos poucos
+      {"event": "done", "status": <http>, ...}             mesmo JSON da resposta síncrona
+      {"event": "error", "error": "..."}
+    NDJSON e não SSE porque o clone é um POST com corpo JSON (EventSource só faz GET).
+    Se o cliente desconectar, o clone termina e grava do mesmo jeito.
+    """
+    events: "queue.Queue[Dict | None]" = queue.Queue()
+    progress = CloneProgress(events.put, int(body.get("desc_depth") or 0))
+
+    def run():
+        try:
+            payload, status = clone_snapshot(token, user_fs_id, user_person_id, body, debug=debug, progress=progress)
+            events.put({"event": "done", "status": status, **payload})
+        except Exception as e:
+            traceback.print_exc(); events.put({"event": "error", "ok": False, "error": str(e)})
+        finally:
+            events.put(None)
+    threading.Thread(target=run, name="snapshot-clone-stream", daemon=True).start()
+
+    def generate():
+        while True:
+            try: event = events.get(timeout=CLONE_PROGRESS_EVERY * 5)
+            except queue.Empty: event = progress.snapshot()  # nível longo: mantém a conexão viva e o eta andando
+            if event is None: return
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _fresh_known(slug: str) -> Dict[str, Dict]:
+    """Pessoas do snapshot `slug` já gravado que ainda estão frescas, no formato do `known` do crawl ({} se o slug é novo)."""
+    init_db(); db = SessionLocal()
+    try:
+        snap = db.query(Snapshot).filter_by(slug=slug).first()
+        if not snap: return {}
+        person_ids = [pid for (pid,) in db.query(SnapshotNode.person_id).filter_by(snapshot_id=snap.id)]
+        return load_fresh_fetches(db, person_ids, SNAPSHOT_REFRESH_FRESH_SECONDS)
+    finally:
+        db.close()
+
+def clone_snapshot(token: str, user_fs_id: str, user_person_id: str, body: Dict[str, Any], debug: bool = False,
+                   progress: CloneProgress | None = None) -> Tuple[Dict[str, Any], int]:
+    """
+    Corpo do /snapshot/clone, sem depender da requisição (roda também no worker de jobs e no
+    stream ?stream=1, que passa `progress`). Devolve (json, status).
+    Slug já existente = refresh: mantém o id do snapshot, grava só a diferença (persist_stats
+    traz nodes/edges_added/removed) e não busca de novo quem foi lido há menos de
+    SNAPSHOT_REFRESH_FRESH_SECONDS ({"force": true} busca todos).
+    """
+    husband, wife = (body.get("husband") or "").strip(), (body.get("wife") or "").strip()
     desc_d = int(body.get("desc_depth") or 0); slug = (body.get("slug") or "default").strip()
     
     roots = [pid for pid in [husband, wife] if pid]
-    if not roots: return jsonify({"ok": False, "error": "ID raiz obrigatório."}), 400
+    if not roots: return {"ok": False, "error": "ID raiz obrigatório."}, 400
     
     ancestor_pid = roots[0]
+    try: concurrency = int(body.get("concurrency") or 0)
+    except (TypeError, ValueError): return {"ok": False, "error": "concurrency deve ser um número inteiro."}, 400
+    # 0/ausente = padrão; fora da faixa vai para 1..SNAPSHOT_CLONE_MAX_WORKERS.
+    concurrency = min(max(concurrency, 1), SNAPSHOT_CLONE_MAX_WORKERS) if concurrency else None
+    bulk = (body.get("mode") or "").strip().lower() == "bulk"
     
-    kinship_path = find_kinship_path(user_person_id, ancestor_pid, token) or []
-    descendant_nodes, descendant_edges_list = _build_tree_iteratively(token, roots, desc_d)
+    if progress: progress.set_phase("kinship")
+    kinship_path, kinship_stats = find_kinship_path_cached(user_person_id, ancestor_pid, token); kinship_path = kinship_path or []
+    print(f"--- [snapshot_clone] caminho de parentesco: {kinship_stats}")
+    known = {} if body.get("force") else _fresh_known(slug)
+    t_crawl = time.perf_counter(); crawl_levels: List[Dict] = []
+    descendant_nodes, descendant_edges_list = _build_tree_iteratively(token, roots, desc_d, max_workers=concurrency, level_stats=crawl_levels, bulk=bulk, progress=progress, known=known)
+    for lvl in crawl_levels:
+        print(f"--- [snapshot_clone] nível {lvl['depth']}: {lvl['persons']} pessoas, {lvl['requests']} requisições, {lvl['seconds']}s")
+    crawl_stats = {"mode": "bulk" if bulk else "person", "seconds": round(time.perf_counter() - t_crawl, 3), "requests": sum(l["requests"] for l in crawl_levels), "levels": crawl_levels,
+                   "fresh_reused": sum(1 for n in descendant_nodes if known.get(n["id"], {}).get("fresh"))}
     
     final_nodes = {node['id']: node for node in descendant_nodes}
     
@@ -210,21 +433,25 @@ def snapshot_clone():
                         s_details, _, _, _ = _fetch_person_with_relatives(token, spouse_id)
                         if s_details: final_nodes[spouse_id] = _format_node(s_details)
 
-    kinship_edges_for_debug = []
+    kinship_edges_for_debug = []; kinship_new_edges = []
     for i in range(len(kinship_path) - 1):
         child_id, parent_id = kinship_path[i], kinship_path[i+1]
         key = ('parentChild', parent_id, child_id)
         if key not in final_edges:
             e = {"type": "parentChild", "from": parent_id, "to": child_id}
             final_edges[key] = e
-            kinship_edges_for_debug.append(e)
+            kinship_edges_for_debug.append(e); kinship_new_edges.append(e)
         else:
             kinship_edges_for_debug.append({"type": "parentChild", "from": parent_id, "to": child_id})
+    if progress:
+        known_ids = {n["id"] for n in descendant_nodes}
+        progress.found([n for pid, n in final_nodes.items() if pid not in known_ids], kinship_new_edges)
+        progress.set_phase("saving")
 
     nodes = list(final_nodes.values())
     edges = list(final_edges.values())
 
-    _debug_log_edges(descendant_edges_list, kinship_edges_for_debug)
+    if debug: _debug_log_edges(descendant_edges_list, kinship_edges_for_debug)
     
     init_db(); db = SessionLocal()
     try:
@@ -242,25 +469,33 @@ def snapshot_clone():
                 db.add(membership)
             is_admin = membership.role == "admin"
 
-        existing = db.query(Snapshot).filter_by(slug=slug).first()
-        if existing: 
-            db.query(SnapshotNode).filter_by(snapshot_id=existing.id).delete()
-            db.query(SnapshotEdge).filter_by(snapshot_id=existing.id).delete()
-            db.delete(existing)
-            db.flush()
-        
-        snap = Snapshot(family_id=family.id, slug=slug, root_husband_id=husband, root_wife_id=wife, desc_depth=desc_d, asc_depth=0)
-        db.add(snap); db.flush()
-        
-        for p_data in nodes:
-            _upsert_person(db, p_data)
-            db.add(SnapshotNode(snapshot_id=snap.id, person_id=p_data["id"]))
-        
-        # A lista de 'edges' agora é garantidamente única, então não precisamos de 'normalized_edges'
-        for e_data in edges:
-            _ensure_edge(db, e_data)
-            etype = e_data["type"]; src = e_data.get("from") or e_data.get("a"); dst = e_data.get("to") or e_data.get("b")
-            _insert_snapshot_edge_idempotent(db, snap.id, etype, src, dst)
+        # Pessoas, relações e nós/arestas do snapshot em lote (services/snapshot_persist).
+        # Slug existente: refresh (mesmo id, só a diferença é gravada); senão cria o snapshot.
+        snap = db.query(Snapshot).filter_by(slug=slug).first()
+        touched = set()  # pessoas alteradas e pontas de relações novas: os outros snapshots que as mostram mudam
+        added = {}  # refresh: nós e arestas que entraram (fecho incremental)
+        if snap:
+            snap.root_husband_id, snap.root_wife_id, snap.desc_depth = husband, wife, desc_d
+            persist_stats = {"mode": "refresh", **refresh_snapshot_graph(db, snap.id, nodes, edges, touched, added)}
+        else:
+            snap = Snapshot(family_id=family.id, slug=slug, root_husband_id=husband, root_wife_id=wife, desc_depth=desc_d, asc_depth=0)
+            db.add(snap); db.flush()
+            persist_stats = {"mode": "create", **save_snapshot_graph(db, snap.id, nodes, edges, touched)}
+        persist_stats["fetches_recorded"] = record_fetches(db, known)
+        print(f"--- [snapshot_clone] gravação em lote: {persist_stats}")
+        # Fecho de ancestrais: refresh sem remoções só acrescenta (como o expand); snapshot
+        # novo ou com nós/arestas removidos reconstrói a família inteira.
+        db.flush()
+        if persist_stats["mode"] == "create" or persist_stats["nodes_removed"] or persist_stats["edges_removed"]:
+            rebuild_family_closure(db, family.id); persist_stats["closure"] = "rebuild"
+        elif ensure_family_closure(db, family.id):
+            persist_stats["closure"] = "rebuild"
+        else:
+            add_persons(db, family.id, added["nodes"])
+            for typ, parent_id, child_id in added["edges"]:
+                if typ == "parentChild": add_parent_edge(db, family.id, parent_id, child_id)
+            persist_stats["closure"] = "incremental"
+        _materialize_snapshot(db, snap, touched)
 
         if kinship_path:
             path_record = db.query(UserPath).filter_by(user_fs_id=user_fs_id, family_id=family.id).first()
@@ -269,19 +504,77 @@ def snapshot_clone():
             path_record.path_json = json.dumps(kinship_path)
             
         db.commit()
+        if kinship_path and kinship_stats.get("cache") == "miss": remember_path(user_person_id, ancestor_pid, kinship_path, token=token)
     except Exception as e: 
         db.rollback(); traceback.print_exc()
-        return jsonify({"ok": False, "error": "Erro no banco de dados durante a clonagem.", "detail": str(e)}), 500
+        return {"ok": False, "error": "Erro no banco de dados durante a clonagem.", "detail": str(e)}, 500
     finally: 
         db.close()
     
     snapshot_json = { 
         "ok": True, "slug": slug, "roots": roots, 
         "elements": {"nodes": [{"data": n} for n in nodes], "edges": [{"data": e} for e in edges]}, 
-        "isAdmin": is_admin, "kinship_path": kinship_path 
+        "isAdmin": is_admin, "kinship_path": kinship_path, "kinship_stats": kinship_stats, "crawl_stats": crawl_stats, "persist_stats": persist_stats
     }
-    return jsonify(snapshot_json), 200
-
+    return snapshot_json, 200
+
+
+def _viewer_relationships(snap_id: int, viewer_id: str, payload: snapshot_payload.Payload) -> Dict[str, Dict]:
+    """Rótulos de parentesco de todos os nós para um viewer; cacheado por (snapshot, viewer, versão do payload)."""
+    key = f"{snap_id}:{viewer_id}:{payload.version}"
+    labels = _relationship_cache.get(key)
+    if labels is None:
+        parent_edges = [(e["data"]["from"], e["data"]["to"]) for e in payload.elements()["edges"] if e["data"]["type"] == "parentChild"]
+        labels = label_relatives(viewer_id, parent_edges); _relationship_cache.set(key, labels)
+    return labels
+
+def _person_nodes(db, person_ids, token: str | None) -> Tuple[List[Dict], bool]:
+    """Nós das pessoas pedidas; as que faltam no banco (órfãs) vêm do FamilySearch se houver token. (nós, completo)"""
+    all_persons_db = db.query(Person).filter(Person.id.in_(person_ids)).all() if person_ids else []
+    nodes = [{"id": p.id, "name": p.name, "gender": p.gender, "birth": {"date": p.birth, "place": p.birth_place}, "death": {"date": p.death, "place": p.death_place}} for p in all_persons_db]
+    missing_ids = {pid for pid in person_ids if pid} - {p.id for p in all_persons_db}
+    if missing_ids and token:
+        print(f"--- [snapshot_get] Corrigindo {len(missing_ids)} IDs órfãos (ex: {next(iter(missing_ids))}) ---")
+        for pid in list(missing_ids):
+            details, _, _, _ = _fetch_person_with_relatives(token, pid)
+            if details:
+                p = _format_node(details); _upsert_person(db, p)  # Salva no DB para a próxima vez
+                nodes.append({"id": p["id"], "name": p["name"], "gender": p["gender"], "birth": p["birth"], "death": p["death"]})
+                missing_ids.discard(pid)
+        db.commit()
+    return nodes, not missing_ids
+
+def _snapshot_elements(db, snap: Snapshot, token: str | None = None) -> Tuple[List[Dict], List[Dict], bool]:
+    """Nós e arestas do snapshot (mais as relações globais que tocam seus nós), sem nada do viewer. (nós, arestas, completo)"""
+    snapshot_person_ids = {n.person_id for n in db.query(SnapshotNode.person_id).filter_by(snapshot_id=snap.id)}
+    global_relations = db.query(Relation).filter(
+        or_(Relation.src_id.in_(snapshot_person_ids), Relation.dst_id.in_(snapshot_person_ids))
+    ).all()
+    snapshot_edges_db = db.query(SnapshotEdge).filter_by(snapshot_id=snap.id).all()
+    all_person_ids = snapshot_person_ids.union({r.src_id for r in global_relations}, {r.dst_id for r in global_relations},
+                                               {e.src_id for e in snapshot_edges_db}, {e.dst_id for e in snapshot_edges_db})
+    nodes, complete = _person_nodes(db, all_person_ids, token)
+
+    edges_map = {}
+    for e in snapshot_edges_db:
+        key = (e.type, e.src_id, e.dst_id); edges_map[key] = {"type": e.type, "from": e.src_id, "to": e.dst_id, "a": e.src_id, "b": e.dst_id}
+    for r in global_relations:
+         key = (r.rel_type, r.src_id, r.dst_id)
+         if key not in edges_map: edges_map[key] = {"type": r.rel_type, "from": r.src_id, "to": r.dst_id, "a": r.src_id, "b": r.dst_id}
+    return nodes, list(edges_map.values()), complete
+
+def _materialize_snapshot(db, snap: Snapshot, touched) -> snapshot_payload.Payload | None:
+    """
+    Regrava o payload do GET /snapshot/<slug> na transação de um clone/expand (antes do commit)
+    e sobe a versão da família. touched: pessoas alteradas e pontas de relações novas; os outros
+    snapshots que as mostram perdem o payload e suas famílias sobem de versão.
+    """
+    db.flush()
+    bump_family_version(db, snap.family_id)
+    bump_family_versions(db, snapshot_payload.invalidate_touching(db, touched, except_snapshot_id=snap.id) - {snap.family_id})
+    nodes, edges, complete = _snapshot_elements(db, snap)
+    if not complete: return None  # pessoas órfãs: o próximo GET busca no FamilySearch e grava
+    return snapshot_payload.store(db, snapshot_payload.build(snap.id, nodes, edges))
 
 @snapshot_bp.get("/snapshot/<slug>")
 @login_required
@@ -307,67 +600,46 @@ def snapshot_get(slug: str):
         
         snap = db.query(Snapshot).filter_by(slug=slug).first()
         is_admin = membership.role == "admin"
+
+        viewer_id = session.get("user_person_id")
+        with_relationships = request.args.get("relationships") in ("1", "true") and bool(viewer_id)
+        gzip = request.accept_encodings["gzip"] > 0
+        etag = family_etag("snapshot", snap.family_id, family_version(db, snap.family_id),
+                           snap.id, user_fs_id, with_relationships and viewer_id, gzip)
+        cached = not_modified(etag)
+        if cached: return cached
         
         kinship_path = []
         path_record = db.query(UserPath).filter_by(user_fs_id=user_fs_id, family_id=snap.family_id).first()
         if path_record and path_record.path_json: kinship_path = json.loads(path_record.path_json)
         
-        # --- LÓGICA DE COLETA DE ID (EXISTENTE) ---
-        snapshot_person_ids = {n.person_id for n in db.query(SnapshotNode.person_id).filter_by(snapshot_id=snap.id)}
-        global_relations = db.query(Relation).filter(
-            or_(Relation.src_id.in_(snapshot_person_ids), Relation.dst_id.in_(snapshot_person_ids))
-        ).all()
-        extra_relation_ids = {r.src_id for r in global_relations}.union({r.dst_id for r in global_relations})
-        snapshot_edges_db = db.query(SnapshotEdge).filter_by(snapshot_id=snap.id).all()
-        extra_edge_ids = {e.src_id for e in snapshot_edges_db}.union({e.dst_id for e in snapshot_edges_db})
-        path_person_ids = set(kinship_path)
-        all_person_ids = snapshot_person_ids.union(path_person_ids).union(extra_relation_ids).union(extra_edge_ids)
-        
-        # --- BUSCA NO BANCO DE DADOS (EXISTENTE) ---
-        all_persons_db = db.query(Person).filter(Person.id.in_(all_person_ids)).all()
-        
-        # <<< INÍCIO DA CORREÇÃO (HOTFIX) >>>
-        # Verifica se algum ID da árvore não foi encontrado no nosso DB (Pessoas órfãs)
-        found_ids = {p.id for p in all_persons_db}
-        missing_ids = all_person_ids - found_ids
-        
-        newly_fetched_persons = []
-        if missing_ids:
-            print(f"--- [snapshot_get] Corrigindo {len(missing_ids)} IDs órfãos (ex: {list(missing_ids)[0]}) ---")
-            for pid in missing_ids:
-                if not pid: continue
-                # Busca o nó faltante no FamilySearch
-                details, _, _, _ = _fetch_person_with_relatives(token, pid)
-                if details:
-                    node_data = _format_node(details)
-                    # Salva no DB para a próxima vez
-                    _upsert_person(db, node_data)
-                    newly_fetched_persons.append(node_data)
-            db.commit()
-        # <<< FIM DA CORREÇÃO (HOTFIX) >>>
-        
-        # Formata os nós para o frontend
-        nodes_db = [{"id": p.id, "name": p.name, "gender": p.gender, "birth": {"date": p.birth, "place": p.birth_place}, "death": {"date": p.death, "place": p.death_place}} for p in all_persons_db]
-        nodes_fetched = [{"id": p["id"], "name": p["name"], "gender": p["gender"], "birth": p["birth"], "death": p["death"]} for p in newly_fetched_persons]
-        nodes = nodes_db + nodes_fetched
-        
-        # Constrói o mapa de arestas (lógica inalterada)
-        edges_map = {}
-        for e in snapshot_edges_db:
-            key = (e.type, e.src_id, e.dst_id); edges_map[key] = {"type": e.type, "from": e.src_id, "to": e.dst_id, "a": e.src_id, "b": e.dst_id}
-        for r in global_relations:
-             key = (r.rel_type, r.src_id, r.dst_id)
-             if key not in edges_map: edges_map[key] = {"type": r.rel_type, "from": r.src_id, "to": r.dst_id, "a": r.src_id, "b": r.dst_id}
-        edges = list(edges_map.values())
-
-        snapshot_json = { 
-            "ok": True, "slug": snap.slug, 
-            "roots": [pid for pid in [snap.root_husband_id, snap.root_wife_id] if pid], 
-            "elements": {"nodes": [{"data": n} for n in nodes], "edges": [{"data": e} for e in edges]}, 
+        # Elements materializados (services/snapshot_payload); monta e grava só se ainda não existem.
+        payload = snapshot_payload.load(db, snap.id)
+        if payload is None:
+            t0 = time.perf_counter()
+            nodes, edges, complete = _snapshot_elements(db, snap, token)
+            payload = snapshot_payload.build(snap.id, nodes, edges)
+            if complete: snapshot_payload.store(db, payload); db.commit()
+            print(f"--- [snapshot_get] payload de {slug} montado em {time.perf_counter() - t0:.3f}s ({len(nodes)} nós, {len(edges)} arestas)")
+
+        # Pessoas do caminho de parentesco que não estão no snapshot entram no fim da lista de nós.
+        path_extra = [pid for pid in dict.fromkeys(kinship_path) if pid and pid not in payload.node_ids]
+        extra_nodes, _ = _person_nodes(db, path_extra, token)
+
+        head = {
+            "ok": True, "slug": snap.slug,
+            "roots": [pid for pid in [snap.root_husband_id, snap.root_wife_id] if pid],
             "kinship_path": kinship_path,
             "isAdmin": is_admin
         }
-        return jsonify(snapshot_json)
+        # ?relationships=1 -> grau de parentesco de cada nó em relação a quem está vendo ({pid: rótulo})
+        if with_relationships:
+            head["relationships"] = _viewer_relationships(snap.id, viewer_id, payload)
+
+        resp = Response(snapshot_payload.render(payload, head, extra_nodes, gzip=gzip), mimetype="application/json")
+        if gzip: resp.headers["Content-Encoding"] = "gzip"
+        resp.headers["Vary"] = "Accept-Encoding"
+        return with_etag(resp, etag)
     except Exception as e:
         db.rollback()
         print(f"!!! ERRO em snapshot_get: {e} !!!")
@@ -426,6 +698,7 @@ def delete_snapshot(slug: str):
             return jsonify({"ok": False, "error": f"Não é possível excluir. Existem {media_count} fotos associadas a esta família."}), 409
 
         db.delete(snapshot)
+        db.flush(); rebuild_family_closure(db, snapshot.family_id); bump_family_version(db, snapshot.family_id)
         db.commit()
 
         return jsonify({"ok": True, "message": "Snapshot excluído com sucesso."})
@@ -486,6 +759,7 @@ def snapshot_expand_person(slug: str, pid: str):
 
         new_nodes = []
         new_edges = []
+        touched = set()  # pessoas gravadas e pontas de relações novas (outros snapshots que as mostram mudam)
         
         # 5. Busca os detalhes das pessoas NOVAS
         for rel_id in new_relative_ids:
@@ -493,7 +767,7 @@ def snapshot_expand_person(slug: str, pid: str):
             if rel_details:
                 # Adiciona o novo nó
                 new_node_data = _format_node(rel_details)
-                new_nodes.append(new_node_data)
+                new_nodes.append(new_node_data); touched.add(rel_id)
                 
                 # Salva a nova pessoa e o nó no snapshot (para o futuro)
                 _upsert_person(db, new_node_data)
@@ -503,24 +777,34 @@ def snapshot_expand_person(slug: str, pid: str):
         for parent_id in parent_ids:
             if parent_id in new_relative_ids or parent_id in existing_person_ids:
                 e = {"type": "parentChild", "from": parent_id, "to": pid}
-                new_edges.append(e); _ensure_edge(db, e)
+                new_edges.append(e)
+                if _ensure_edge(db, e): touched.update(edge_key(e)[1:])
                 # <<< CORREÇÃO: Usa a função idempotente >>>
                 _insert_snapshot_edge_idempotent(db, snap.id, e["type"], e["from"], e["to"])
 
         for child_id in child_ids:
              if child_id in new_relative_ids or child_id in existing_person_ids:
                 e = {"type": "parentChild", "from": pid, "to": child_id}
-                new_edges.append(e); _ensure_edge(db, e)
+                new_edges.append(e)
+                if _ensure_edge(db, e): touched.update(edge_key(e)[1:])
                 # <<< CORREÇÃO: Usa a função idempotente >>>
                 _insert_snapshot_edge_idempotent(db, snap.id, e["type"], e["from"], e["to"])
 
         for spouse_id in spouse_ids:
              if spouse_id in new_relative_ids or spouse_id in existing_person_ids:
                 e = {"type": "couple", "a": pid, "b": spouse_id}
-                new_edges.append(e); _ensure_edge(db, e)
+                new_edges.append(e)
+                if _ensure_edge(db, e): touched.update(edge_key(e)[1:])
                 # <<< CORREÇÃO: Usa a função idempotente >>>
                 _insert_snapshot_edge_idempotent(db, snap.id, e["type"], e["a"], e["b"])
 
+        # Fecho de ancestrais: incremental por aresta (ou reconstrução, se a família ainda não tinha)
+        db.flush()
+        if not ensure_family_closure(db, snap.family_id):
+            for e in new_edges:
+                if e["type"] == "parentChild": add_parent_edge(db, snap.family_id, e["from"], e["to"])
+        _materialize_snapshot(db, snap, touched)
+
         db.commit()
 
         # 7. Formata para o frontend (padrão cytoscape)
@@ -12,7 +12,7 @@ def _require_token() -> str:
 @tree_clone_bp.post("/tree/clone")
 def tree_clone():
     """
-    Ex.: POST /tree/clone?husband=KW7T-Z2P&wife=XXXX-YYY&desc=3&asc=1&family=azevedo
+    Ex.: POST /tree/clone?husband=KW7T-Z2P&wife=XXXX-YYY&desc=3&asc=1&family=azevedo&mode=bulk
     """
     token = _require_token()
     husband = request.args.get("husband") or request.json.get("husband") if request.is_json else None
@@ -20,6 +20,7 @@ def tree_clone():
     depth_desc = int(request.args.get("desc", request.json.get("desc", 3) if request.is_json else 3))
     depth_asc  = int(request.args.get("asc",  request.json.get("asc", 1) if request.is_json else 1))
     family     = (request.args.get("family") or (request.json.get("family") if request.is_json else None)) or "default"
+    mode       = (request.args.get("mode") or (request.json.get("mode") if request.is_json else None)) or "person"
 
     if not (husband or wife):
         return jsonify({"ok": False, "error": "missing_params", "detail": "informe pelo menos husband ou wife"}), 400
@@ -30,6 +31,7 @@ def tree_clone():
         wife=wife,
         depth_desc=depth_desc,
         depth_asc=depth_asc,
-        family_slug=family
+        family_slug=family,
+        bulk=(mode == "bulk"),
     )
     return jsonify(result), 200
@@ -0,0 +1,277 @@
+# apps/api/src/infra/cache/person_cache.py
+"""
+Cache de pessoas do FamilySearch com backends plugáveis.
+
+- memory: OrderedDict por processo (o comportamento antigo do TTLCache).
+- sqlite: arquivo local compartilhado por todos os workers do gunicorn e que
+  sobrevive a restarts.
+- redis: qualquer servidor que fale o protocolo Redis (ou um cliente
+  compatível injetado, p.ex. fakeredis, como substituto local).
+
+Todos têm TTL, limite de tamanho e contadores de hit/miss por processo.
+Escolha com PERSON_CACHE_BACKEND=memory|sqlite|redis. O padrão é sqlite: com vários
+workers, o cache em memória é um por processo e some a cada deploy.
+"""
+from __future__ import annotations
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+PERSON_CACHE_BACKEND = os.getenv("PERSON_CACHE_BACKEND", "sqlite").lower()
+PERSON_CACHE_TTL = int(os.getenv("PERSON_CACHE_TTL", "900"))
+PERSON_CACHE_MAX = int(os.getenv("PERSON_CACHE_MAX", "5000"))
+PERSON_CACHE_PATH = os.getenv("PERSON_CACHE_PATH", os.path.abspath("./person_cache.db"))
+PERSON_CACHE_URL = os.getenv("PERSON_CACHE_URL", "redis://localhost:6379/0")
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def incr(self, field: str, n: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def as_dict(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "sets": self.sets, "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
+
+
+class MemoryBackend:
+    """LRU com TTL em memória (um por processo)."""
+    name = "memory"
+
+    def __init__(self, max_items: int):
+        self.max = max_items
+        self.data: "OrderedDict[str, tuple[float, str]]" = OrderedDict()  # key -> (expires_at, raw)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            expires_at, raw = item
+            if expires_at < time.time():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return raw
+
+    def set(self, key: str, raw: str, ttl: int) -> int:
+        with self._lock:
+            self.data[key] = (time.time() + ttl, raw)
+            self.data.move_to_end(key)
+            evicted = 0
+            while len(self.data) > self.max:
+                self.data.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key: str):
+        with self._lock:
+            self.data.pop(key, None)
+
+    def size(self) -> int:
+        return len(self.data)
+
+
+class SQLiteBackend:
+    """
+    Tabela única em um arquivo SQLite (WAL), compartilhada entre processos.
+    A expulsão é por ordem de expiração e roda a cada `evict_every` escritas.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: str, max_items: int, evict_every: int = 200):
+        self.path = path
+        self.max = max_items
+        self.evict_every = evict_every
+        self._writes = 0
+        self._local = threading.local()
+        with self._conn() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS person_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )""")
+            con.execute("CREATE INDEX IF NOT EXISTS ix_person_cache_expires ON person_cache (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # Uma conexão por thread e por processo (conexões não atravessam fork).
+        con = getattr(self._local, "con", None)
+        if con is None or getattr(self._local, "pid", None) != os.getpid():
+            con = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con, self._local.pid = con, os.getpid()
+        return con
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT value, expires_at FROM person_cache WHERE key=?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < time.time():
+            self.delete(key)
+            return None
+        return row[0]
+
+    def set(self, key: str, raw: str, ttl: int) -> int:
+        con = self._conn()
+        con.execute("INSERT OR REPLACE INTO person_cache (key, value, expires_at) VALUES (?, ?, ?)", (key, raw, time.time() + ttl))
+        self._writes += 1
+        if self._writes % self.evict_every:
+            return 0
+        evicted = con.execute("DELETE FROM person_cache WHERE expires_at < ?", (time.time(),)).rowcount
+        excess = self.size() - self.max
+        if excess > 0:
+            evicted += con.execute(
+                "DELETE FROM person_cache WHERE key IN (SELECT key FROM person_cache ORDER BY expires_at LIMIT ?)", (excess,)
+            ).rowcount
+        return evicted
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM person_cache WHERE key=?", (key,))
+
+    def size(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM person_cache").fetchone()[0]
+
+
+class RedisBackend:
+    """
+    Backend para servidores do protocolo Redis. O limite de tamanho usa um
+    sorted set com a expiração de cada chave: a cada escrita saem do índice as
+    que o Redis já expirou e, acima do limite, as que expiram primeiro (como no SQLite).
+    scripts/check_person_cache.py exercita este backend sem servidor.
+    """
+    name = "redis"
+
+    def __init__(self, client: Any, max_items: int, index_key: str = "wf:person_cache:index"):
+        self.client = client
+        self.max = max_items
+        self.index_key = index_key
+
+    @classmethod
+    def from_url(cls, url: str, max_items: int) -> "RedisBackend":
+        import redis  # dependência opcional: só exigida com PERSON_CACHE_BACKEND=redis
+        return cls(redis.Redis.from_url(url, decode_responses=True), max_items)
+
+    def get(self, key: str) -> Optional[str]:
+        raw = self.client.get(key)
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return raw
+
+    def set(self, key: str, raw: str, ttl: int) -> int:
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.set(key, raw, ex=ttl)
+        pipe.zadd(self.index_key, {key: now + ttl})
+        pipe.zremrangebyscore(self.index_key, "-inf", now)
+        pipe.zcard(self.index_key)
+        expired, size = pipe.execute()[-2:]
+        excess = size - self.max
+        if excess <= 0:
+            return expired
+        oldest = [k.decode("utf-8") if isinstance(k, bytes) else k for k, _ in self.client.zpopmin(self.index_key, excess)]
+        if oldest:
+            self.client.delete(*oldest)
+        return expired + len(oldest)
+
+    def delete(self, key: str):
+        self.client.delete(key)
+        self.client.zrem(self.index_key, key)
+
+    def size(self) -> int:
+        return int(self.client.zcard(self.index_key))
+
+
+class PersonCache:
+    """Fachada usada pelos fetchers: namespace + TTL + serialização JSON + contadores."""
+
+    def __init__(self, namespace: str, backend: Any, ttl: int = PERSON_CACHE_TTL):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str, *fallback_keys: str) -> Any:
+        """
+        Valor da primeira chave presente. As chaves extras são variantes da mesma
+        consulta (p.ex. "pid" e "pid@escopo do token"): conta um único hit ou miss.
+        """
+        for k in (key, *fallback_keys):
+            try:
+                raw = self.backend.get(self._key(k))
+            except Exception as e:  # cache nunca derruba a busca: trata como miss
+                log.warning("falha ao ler o cache de pessoas (%s): %s", self.backend.name, e)
+                raw = None
+            if raw is not None:
+                self.stats.incr("hits")
+                return json.loads(raw)
+        self.stats.incr("misses")
+        return None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        try:
+            evicted = self.backend.set(self._key(key), json.dumps(value, ensure_ascii=False), ttl or self.ttl)
+        except Exception as e:
+            log.warning("falha ao gravar no cache de pessoas (%s): %s", self.backend.name, e)
+            return
+        self.stats.incr("sets")
+        if evicted:
+            self.stats.incr("evictions", evicted)
+
+    def delete(self, key: str):
+        try:
+            self.backend.delete(self._key(key))
+        except Exception:
+            pass
+
+    def describe(self) -> Dict[str, Any]:
+        return {"namespace": self.namespace, "backend": self.backend.name, "ttl": self.ttl, **self.stats.as_dict()}
+
+
+_backend: Any = None
+_caches: Dict[str, PersonCache] = {}
+_lock = threading.Lock()
+
+def _default_backend() -> Any:
+    global _backend
+    if _backend is None:
+        if PERSON_CACHE_BACKEND == "memory":
+            _backend = MemoryBackend(PERSON_CACHE_MAX)
+        elif PERSON_CACHE_BACKEND == "redis":
+            _backend = RedisBackend.from_url(PERSON_CACHE_URL, PERSON_CACHE_MAX)
+        else:
+            _backend = SQLiteBackend(PERSON_CACHE_PATH, PERSON_CACHE_MAX)
+    return _backend
+
+def get_person_cache(namespace: str, ttl: Optional[int] = None) -> PersonCache:
+    """Cache do namespace pedido, sobre o backend configurado (um por processo)."""
+    with _lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = _caches[namespace] = PersonCache(namespace, _default_backend(), ttl or PERSON_CACHE_TTL)
+        return cache
+
+def all_cache_stats() -> list:
+    return [c.describe() for c in _caches.values()]
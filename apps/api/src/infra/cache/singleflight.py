@@ -0,0 +1,81 @@
+# apps/api/src/infra/cache/singleflight.py
+"""
+Coalescência de requisições idênticas em andamento ("single-flight").
+
+Se várias threads pedem a mesma chave ao mesmo tempo, só a primeira (líder)
+executa a função; as demais esperam e recebem o mesmo resultado (ou a mesma
+exceção). Complementa o cache de pessoas, que só ajuda depois da 1ª resposta.
+"""
+from __future__ import annotations
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+        self.calls = 0       # chamadas a do()
+        self.executions = 0  # vezes que a função realmente rodou
+        self.coalesced = 0   # chamadas que pegaram carona numa execução em andamento
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Executa fn() uma vez por chave em voo. Retorna (resultado, foi_o_lider)."""
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            inflight = len(self._calls)
+        return {"name": self.name, "calls": self.calls, "executions": self.executions,
+                "coalesced": self.coalesced, "inflight": inflight}
+
+
+_groups: Dict[str, SingleFlight] = {}
+_lock = threading.Lock()
+
+def get_singleflight(name: str) -> SingleFlight:
+    """Tabela de requisições em voo com esse nome (uma por processo)."""
+    with _lock:
+        group = _groups.get(name)
+        if group is None:
+            group = _groups[name] = SingleFlight(name)
+        return group
+
+def all_singleflight_stats() -> list:
+    return [g.stats() for g in _groups.values()]
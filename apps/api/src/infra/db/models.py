@@ -3,7 +3,7 @@ from __future__ import annotations
 import os
 from datetime import datetime
 from sqlalchemy import (
-    Column, String, Integer, DateTime, ForeignKey, UniqueConstraint, Text, create_engine
+    Column, String, Integer, BigInteger, Boolean, DateTime, ForeignKey, UniqueConstraint, Index, Text, LargeBinary, create_engine
 )
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
 
@@ -53,6 +53,18 @@ class Family(Base):
     user_paths = relationship("UserPath", back_populates="family")
     posts = relationship("Post", back_populates="family", cascade="all, delete-orphan")
     media = relationship("Media", back_populates="family", cascade="all, delete-orphan")
+    version = relationship("FamilyVersion", uselist=False, cascade="all, delete-orphan")
+
+class FamilyVersion(Base):
+    """
+    Versão de tudo o que os endpoints da família devolvem (árvore, mural, galeria,
+    eventos, gestão): sobe a cada escrita, na mesma transação (services/family_version).
+    Alimenta os ETags e os 304 desses endpoints.
+    """
+    __tablename__ = "family_versions"
+    family_id = Column(Integer, ForeignKey("families.id"), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Membership(Base):
     __tablename__ = "memberships"
@@ -60,6 +72,8 @@ class Membership(Base):
     family_id = Column(Integer, ForeignKey("families.id"), primary_key=True)
     role = Column(String(16), nullable=False, default="member")
     created_at = Column(DateTime, default=datetime.utcnow)
+    # A PK (user_fs_id, family_id) já atende "famílias do usuário"; este atende "membros da família".
+    __table_args__ = (Index("ix_memberships_family", "family_id"),)
     user = relationship("User", back_populates="memberships")
     family = relationship("Family", back_populates="memberships")
 
@@ -73,13 +87,30 @@ class Person(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class PersonFetch(Base):
+    """
+    Última leitura de uma pessoa no FamilySearch pelo crawl do /snapshot/clone: quando e com
+    que parentes ({"spouses": [...], "children": [...]}; complete=False se a lista veio parcial,
+    p.ex. cônjuges e filhos no limite da profundidade, lidos só pelos dados). O refresh de um
+    snapshot reaproveita quem foi lido há menos de SNAPSHOT_REFRESH_FRESH_SECONDS.
+    """
+    __tablename__ = "person_fetches"
+    person_id = Column(String(32), primary_key=True)
+    fetched_at = Column(DateTime, nullable=False)
+    living = Column(Boolean, nullable=False, default=False)
+    complete = Column(Boolean, nullable=False, default=False)
+    relatives_json = Column(Text, nullable=False)
+
 class Relation(Base):
     __tablename__ = "relations"
     id = Column(Integer, primary_key=True, autoincrement=True)
     rel_type = Column("type", String(16), nullable=False)
     src_id = Column(String(32), ForeignKey("persons.id"), nullable=False)
     dst_id = Column(String(32), ForeignKey("persons.id"), nullable=False)
-    __table_args__ = (UniqueConstraint("type", "src_id", "dst_id", name="uix_rel_type_src_dst"),)
+    # O único começa por type: não serve para "src_id IN (...) OR dst_id IN (...)" do snapshot_get.
+    __table_args__ = (UniqueConstraint("type", "src_id", "dst_id", name="uix_rel_type_src_dst"),
+                      Index("ix_relations_src", "src_id", "type", "dst_id"),
+                      Index("ix_relations_dst", "dst_id", "type", "src_id"))
     src = relationship("Person", foreign_keys=[src_id])
     dst = relationship("Person", foreign_keys=[dst_id])
 
@@ -92,18 +123,22 @@ class Snapshot(Base):
     desc_depth = Column(Integer, nullable=False, default=3)
     asc_depth = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (Index("ix_snapshots_family_created", "family_id", "created_at"),)
     family = relationship("Family", back_populates="snapshots")
     # <<< INÍCIO DA CORREÇÃO: Adiciona os relacionamentos com cascata >>>
     nodes = relationship("SnapshotNode", back_populates="snapshot", cascade="all, delete-orphan")
     edges = relationship("SnapshotEdge", back_populates="snapshot", cascade="all, delete-orphan")
     # <<< FIM DA CORREÇÃO >>>
+    payload = relationship("SnapshotPayload", uselist=False, cascade="all, delete-orphan")
 
 class SnapshotNode(Base):
     __tablename__ = "snapshot_nodes"
     id = Column(Integer, primary_key=True, autoincrement=True)
     snapshot_id = Column(Integer, ForeignKey("snapshots.id"), nullable=False)
     person_id = Column(String(32), ForeignKey("persons.id"), nullable=False)
-    __table_args__ = (UniqueConstraint("snapshot_id", "person_id", name="uix_snapshot_node"),)
+    # person_id primeiro: snapshots que mostram uma pessoa alterada (snapshot_payload.invalidate_touching).
+    __table_args__ = (UniqueConstraint("snapshot_id", "person_id", name="uix_snapshot_node"),
+                      Index("ix_snapshot_nodes_person", "person_id", "snapshot_id"))
     # <<< INÍCIO DA CORREÇÃO: Adiciona o relacionamento de volta (back_populates) >>>
     snapshot = relationship("Snapshot", back_populates="nodes")
     # <<< FIM DA CORREÇÃO >>>
@@ -115,11 +150,58 @@ class SnapshotEdge(Base):
     type = Column(String(16), nullable=False)
     src_id = Column(String(32), ForeignKey("persons.id"), nullable=False)
     dst_id = Column(String(32), ForeignKey("persons.id"), nullable=False)
-    __table_args__ = (UniqueConstraint("snapshot_id", "type", "src_id", "dst_id"),)
+    # Filtros por snapshot_id usam o único; src/dst atendem pathfinder e fingerprints de caminho.
+    __table_args__ = (UniqueConstraint("snapshot_id", "type", "src_id", "dst_id"),
+                      Index("ix_snapshot_edges_src", "src_id", "type", "dst_id"),
+                      Index("ix_snapshot_edges_dst", "dst_id", "type", "src_id"))
     # <<< INÍCIO DA CORREÇÃO: Adiciona o relacionamento de volta (back_populates) >>>
     snapshot = relationship("Snapshot", back_populates="edges")
     # <<< FIM DA CORREÇÃO >>>
 
+class SnapshotPayload(Base):
+    """
+    `elements` do GET /snapshot/<slug> já serializados e comprimidos (deflate cru,
+    terminado em sync flush para ser emendado numa resposta gzip; ver
+    services/snapshot_payload). Regravado quando um clone/expand do snapshot faz commit.
+    version é o hash do conteúdo; node_ids (separados por vírgula) evita reabrir o JSON.
+    """
+    __tablename__ = "snapshot_payloads"
+    snapshot_id = Column(Integer, ForeignKey("snapshots.id"), primary_key=True)
+    version = Column(String(32), nullable=False)
+    elements_deflate = Column(LargeBinary, nullable=False)
+    elements_crc32 = Column(BigInteger, nullable=False)
+    elements_size = Column(BigInteger, nullable=False)
+    node_ids = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class AncestorClosure(Base):
+    """
+    Fecho transitivo das arestas parentChild dos snapshots de uma família:
+    uma linha por (ancestral, descendente) com a menor distância em gerações.
+    Inclui a linha reflexiva (pessoa, pessoa, 0) de cada pessoa do grafo.
+    """
+    __tablename__ = "ancestor_closure"
+    family_id = Column(Integer, ForeignKey("families.id"), primary_key=True)
+    ancestor_id = Column(String(32), primary_key=True)
+    descendant_id = Column(String(32), primary_key=True)
+    generations = Column(Integer, nullable=False)
+    __table_args__ = (Index("ix_ancestor_closure_descendant", "family_id", "descendant_id"),)
+
+class KinshipPathCache(Base):
+    """
+    Caminho já calculado entre duas pessoas. `fingerprint` resume as relações que
+    tocavam os nós do caminho quando ele foi gravado; se mudar, a entrada é descartada.
+    kind: "kinship" (só pais, pathfinder_logic) ou "path" (pais/filhos/cônjuges, /path).
+    start_id é "pid@escopo do token" quando o caminho foi achado com login (só vale para ele).
+    """
+    __tablename__ = "kinship_path_cache"
+    kind = Column(String(16), primary_key=True)
+    start_id = Column(String(32), primary_key=True)
+    end_id = Column(String(32), primary_key=True)
+    path_json = Column(Text, nullable=False)
+    fingerprint = Column(String(64), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Invite(Base):
     __tablename__ = "invites"
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -128,6 +210,7 @@ class Invite(Base):
     token = Column(String(64), nullable=False, unique=True, index=True)
     expires_at = Column(DateTime, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (Index("ix_invites_family_created", "family_id", "created_at"),)
     family = relationship("Family", back_populates="invites")
 
 class UserPath(Base):
@@ -137,6 +220,7 @@ class UserPath(Base):
     family_id = Column(Integer, ForeignKey("families.id"), nullable=False)
     path_json = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (Index("ix_user_paths_user_family", "user_fs_id", "family_id"),)
     user = relationship("User", back_populates="paths")
     family = relationship("Family", back_populates="user_paths")
 
@@ -149,6 +233,7 @@ class Post(Base):
     title = Column(String(255), nullable=False)
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (Index("ix_posts_family_created", "family_id", "created_at"),)
 
     family = relationship("Family", back_populates="posts")
     author = relationship("User", back_populates="posts")
@@ -163,6 +248,7 @@ class Comment(Base):
     user_fs_id = Column(String(32), ForeignKey("users.fs_id"), nullable=False)
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (Index("ix_comments_post", "post_id"),)
 
     post = relationship("Post", back_populates="comments")
     author = relationship("User", back_populates="comments")
@@ -179,11 +265,17 @@ class Media(Base):
     caption = Column(String(512), nullable=True)
     media_type = Column(String(32), default="image")
     created_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (Index("ix_media_family_created", "family_id", "created_at"),
+                      Index("ix_media_post", "post_id"))
 
     family = relationship("Family", back_populates="media")
     uploader = relationship("User", back_populates="media_uploads")
     post = relationship("Post", back_populates="media")
 
 def init_db() -> None:
-    """Cria todas as tabelas no banco de dados se elas não existirem."""
+    """
+    Cria todas as tabelas no banco de dados se elas não existirem.
+    Não altera tabelas existentes (nem cria índices novos nelas): para isso,
+    `alembic -c apps/api/alembic.ini upgrade head`.
+    """
     Base.metadata.create_all(bind=engine)
\ No newline at end of file
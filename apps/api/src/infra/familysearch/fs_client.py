@@ -60,7 +60,7 @@ def build_auth_url(store_code_verifier: callable, state: str | None = None) -> s
     return f"{AUTH_URL}?{urlencode(params)}"
 
 def exchange_code_for_token(code: str, code_verifier: str | None) -> dict | None:
-    import requests
+    from .fs_http import fs_post
     data = {
         "grant_type": "authorization_code",
         "code": code,
@@ -69,7 +69,7 @@ def exchange_code_for_token(code: str, code_verifier: str | None) -> dict | None
         "code_verifier": code_verifier or "",
     }
     headers = {"Accept": "application/json"}
-    r = requests.post(TOKEN_URL, data=data, headers=headers, timeout=30)
+    r = fs_post(TOKEN_URL, data=data, headers=headers, timeout=30)
     if r.status_code != 200:
         # LOG para diagnóstico
         try:
@@ -0,0 +1,91 @@
+# apps/api/src/infra/familysearch/fs_http.py
+"""
+Cliente HTTP único para o FamilySearch.
+
+Todos os módulos que falam com a API (rotas, pathfinders, crawler de snapshot,
+busca, clone) passam por aqui, para que exista um só pool keep-alive por
+processo, com a mesma política de retry/backoff, timeouts e cabeçalhos padrão.
+"""
+from __future__ import annotations
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Força um conjunto de cifras compatível (resolve ConnectionResetError 10054 no Windows).
+try:
+    requests.packages.urllib3.util.ssl_.DEFAULT_CIPHERS = 'ALL:@SECLEVEL=1'
+except AttributeError:
+    pass
+# Desativa os avisos de segurança sobre certificados não verificados (dev local usa verify=False)
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+FAMILYSEARCH_ENV = os.getenv("FAMILYSEARCH_ENV", "beta").lower()
+FS_BASE = "https://apibeta.familysearch.org" if FAMILYSEARCH_ENV == "beta" else "https://api.familysearch.org"
+
+# Tamanho do pool keep-alive de CADA worker (processo). Deve ser >= à maior
+# concorrência usada por um crawler dentro do processo, senão conexões extras
+# são abertas e descartadas a cada requisição.
+FS_HTTP_POOL_SIZE = int(os.getenv("FS_HTTP_POOL_SIZE", "32"))
+FS_HTTP_RETRIES = int(os.getenv("FS_HTTP_RETRIES", "3"))
+FS_HTTP_BACKOFF = float(os.getenv("FS_HTTP_BACKOFF", "0.3"))
+DEFAULT_TIMEOUT = float(os.getenv("FS_HTTP_TIMEOUT", "15"))
+USER_AGENT = os.getenv("FS_HTTP_USER_AGENT", "weRfamily/1.0")
+
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_lock = threading.Lock()
+
+def _build_session() -> requests.Session:
+    retries = Retry(
+        total=FS_HTTP_RETRIES,
+        backoff_factor=FS_HTTP_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        raise_on_status=False,  # devolve a última resposta; quem chama decide pelo status
+    )
+    adapter = HTTPAdapter(pool_connections=FS_HTTP_POOL_SIZE, pool_maxsize=FS_HTTP_POOL_SIZE, max_retries=retries)
+    s = requests.Session()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers.update({"User-Agent": USER_AGENT, "Accept": "application/json"})
+    return s
+
+def get_session() -> requests.Session:
+    """
+    Sessão compartilhada do processo atual. Recriada após um fork (gunicorn
+    --preload), para que workers nunca dividam sockets com o processo mestre.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                _session, _session_pid = _build_session(), pid
+    return _session
+
+def bearer_headers(token: Optional[str], accept: str = "application/json") -> Dict[str, str]:
+    headers = {"Accept": accept}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return headers
+
+def _url(path_or_url: str) -> str:
+    return path_or_url if path_or_url.startswith("http") else f"{FS_BASE}{path_or_url}"
+
+def fs_get(path_or_url: str, *, token: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+           timeout: Optional[float] = None, **kwargs: Any) -> requests.Response:
+    """GET no FamilySearch. Aceita caminho ('/platform/...') ou URL completa."""
+    h = bearer_headers(token) if token else {}
+    h.update(headers or {})
+    return get_session().get(_url(path_or_url), headers=h, timeout=timeout or DEFAULT_TIMEOUT, **kwargs)
+
+def fs_post(path_or_url: str, *, token: Optional[str] = None, headers: Optional[Dict[str, str]] = None,
+            timeout: Optional[float] = None, **kwargs: Any) -> requests.Response:
+    """POST no FamilySearch (sem retry automático: POST não é idempotente)."""
+    h = bearer_headers(token) if token else {}
+    h.update(headers or {})
+    return get_session().post(_url(path_or_url), headers=h, timeout=timeout or DEFAULT_TIMEOUT, **kwargs)
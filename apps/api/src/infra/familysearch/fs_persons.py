@@ -0,0 +1,70 @@
+# apps/api/src/infra/familysearch/fs_persons.py
+"""
+Busca de pessoa + parentes imediatos (/platform/tree/persons/{id}), lendo e
+gravando no cache de pessoas compartilhado (infra/cache/person_cache).
+
+Pessoas falecidas são gravadas sob o próprio PID e servem a qualquer usuário.
+Pessoas vivas só aparecem para quem tem acesso a elas no FamilySearch, então
+a entrada delas fica restrita ao token que a buscou.
+"""
+from __future__ import annotations
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from ..cache.person_cache import get_person_cache
+from ..cache.singleflight import get_singleflight
+from .fs_http import fs_get
+
+PersonRelatives = Tuple[Optional[Dict], List[str], List[str], List[str]]
+
+_cache = get_person_cache("fs-person-relatives")
+_inflight = get_singleflight("fs-person-relatives")
+
+def token_scope(token: str) -> str:
+    return hashlib.sha256((token or "").encode("utf-8")).hexdigest()[:16]
+
+def cached_person_with_relatives(token: str, pid: str) -> Optional[PersonRelatives]:
+    """Consulta só o cache (sem rede). Devolve None em caso de miss."""
+    hit = _cache.get(pid, f"{pid}@{token_scope(token)}")
+    return tuple(hit) if hit else None
+
+def parse_person_with_relatives(data: dict, pid: str) -> PersonRelatives:
+    details = (data.get("persons") or [None])[0]; parents, spouses, children = set(), set(), set()
+    if not details: return None, [], [], []
+    for rel in data.get("childAndParentsRelationships", []):
+        p1 = (rel.get("parent1") or {}).get("resourceId"); p2 = (rel.get("parent2") or {}).get("resourceId"); child = (rel.get("child") or {}).get("resourceId")
+        if child == pid:
+            if p1: parents.add(p1)
+            if p2: parents.add(p2)
+        if (p1 == pid or p2 == pid) and child:
+            children.add(child)
+            if p1 == pid and p2: spouses.add(p2)
+            elif p2 == pid and p1: spouses.add(p1)
+    return details, list(parents), list(spouses), list(children)
+
+def _fetch_and_cache(token: str, pid: str) -> PersonRelatives:
+    url = f"/platform/tree/persons/{pid}?personDetails=true&children=true"
+    try: r = fs_get(url, token=token, timeout=20); r.raise_for_status(); data = r.json()
+    except requests.RequestException: return None, [], [], []
+    result = parse_person_with_relatives(data, pid)
+    if result[0] is not None:
+        key = f"{pid}@{token_scope(token)}" if result[0].get("living") else pid
+        _cache.set(key, list(result))
+    return result
+
+def fetch_person_with_relatives(token: str, pid: str) -> PersonRelatives:
+    """
+    (detalhes, pais, cônjuges, filhos) de uma pessoa. Falhas não são cacheadas.
+    Buscas simultâneas do mesmo PID viram uma só requisição (single-flight).
+    """
+    cached = cached_person_with_relatives(token, pid)
+    if cached is not None:
+        return cached
+    result, leader = _inflight.do(pid, lambda: _fetch_and_cache(token, pid))
+    if not leader and (result[0] is None or result[0].get("living")):
+        # Falha (ex.: 403 de um perfil que só este token vê) ou pessoa viva buscada com o
+        # token de outra pessoa: não reaproveita, busca com o próprio.
+        result = cached_person_with_relatives(token, pid) or _fetch_and_cache(token, pid)
+    return result
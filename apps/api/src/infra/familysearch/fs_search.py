@@ -3,6 +3,8 @@ from __future__ import annotations
 from typing import Any, Dict, Optional, Tuple, List
 import json, re, requests
 
+from .fs_http import fs_get, fs_post
+
 # Tenta usar sua infra; senão, fallback simples
 try:
     from .fs_routes import FS_BASE as API_BASE_URL  # type: ignore
@@ -45,7 +47,7 @@ def _extract_persons_from_search(data: dict) -> List[dict]:
 def _attempt_get(url: str, headers: Dict[str,str], params: Dict[str, Any], timeout: int = 30) -> Tuple[dict, dict]:
     dbg = {"url": url, "params": dict(params)}
     try:
-        r = requests.get(url, headers=headers, params=params, timeout=timeout)
+        r = fs_get(url, headers=headers, params=params, timeout=timeout)
         dbg.update({
             "status_code": r.status_code,
             "ok": r.ok,
@@ -66,7 +68,7 @@ def _attempt_get(url: str, headers: Dict[str,str], params: Dict[str, Any], timeo
 def _attempt_post(url: str, headers: Dict[str,str], params: Dict[str, Any], payload: dict, timeout: int = 30) -> Tuple[dict, dict]:
     dbg = {"url": url, "params": dict(params)}
     try:
-        r = requests.post(url, headers=headers, params=params, data=json.dumps(payload), timeout=timeout)
+        r = fs_post(url, headers=headers, params=params, data=json.dumps(payload), timeout=timeout)
         dbg.update({
             "status_code": r.status_code,
             "ok": r.ok,
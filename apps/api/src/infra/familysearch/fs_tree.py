@@ -1,7 +1,8 @@
 # apps/api/src/infra/familysearch/fs_tree.py
 from __future__ import annotations
-import requests
+from typing import Any, Dict, List, Tuple
 from .fs_client import API_BASE_URL
+from .fs_http import fs_get
 
 def load_ancestry(access_token: str, person_id: str, generations: int = 4, details: bool = True):
     headers = {
@@ -13,7 +14,7 @@ def load_ancestry(access_token: str, person_id: str, generations: int = 4, detai
         params["personDetails"] = "true"
         params["marriageDetails"] = "true"
     url = f"{API_BASE_URL}/platform/tree/ancestry"
-    r = requests.get(url, headers=headers, params=params, timeout=30)
+    r = fs_get(url, headers=headers, params=params, timeout=30)
     r.raise_for_status()
     return r.json()
 
@@ -24,6 +25,106 @@ def load_descendancy(access_token: str, person_id: str, generations: int = 2):
     }
     params = {"person": person_id, "generations": str(generations)}
     url = f"{API_BASE_URL}/platform/tree/descendancy"
-    r = requests.get(url, headers=headers, params=params, timeout=30)
+    r = fs_get(url, headers=headers, params=params, timeout=30)
     r.raise_for_status()
     return r.json()
+
+# ---------------------------------------------------------------------------
+# Interpretação das respostas em lote (várias gerações por chamada)
+# ---------------------------------------------------------------------------
+
+def _blood_key(number: str) -> str:
+    """'1-S1.2.1' -> '1.2.1' (remove os marcadores de cônjuge de cada geração)."""
+    return ".".join(part.split("-S")[0] for part in number.split("."))
+
+def parse_descendancy(data: dict, generations: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Converte /platform/tree/descendancy em {pid: {"details", "spouses", "children", "complete"}},
+    usando display.descendancyNumber ("1", "1-S", "1.2", "1.2-S", "1.2.1", ...).
+
+    `complete` indica que filhos e cônjuges daquela pessoa vieram inteiros na resposta
+    (descendentes até a penúltima geração pedida). Cônjuges e a última geração trazem
+    apenas os detalhes.
+    """
+    persons = [p for p in (data.get("persons") or []) if p.get("id")]
+    numbered: List[Tuple[str, dict]] = []
+    by_blood: Dict[str, str] = {}
+    by_number: Dict[str, str] = {}
+    entries: Dict[str, Dict[str, Any]] = {}
+    for p in persons:
+        number = ((p.get("display") or {}).get("descendancyNumber") or "").strip()
+        if not number:
+            continue
+        is_spouse = "-S" in number.split(".")[-1]
+        entries[p["id"]] = {
+            "details": p, "spouses": [], "children": [],
+            "complete": (not is_spouse) and number.count(".") < generations,
+        }
+        numbered.append((number, p))
+        by_number[number] = p["id"]
+        if not is_spouse:
+            by_blood[_blood_key(number)] = p["id"]
+
+    for number, p in numbered:
+        pid = p["id"]
+        parts = number.split(".")
+        if "-S" in parts[-1]:
+            owner = by_blood.get(_blood_key(number))
+            if owner and owner != pid:
+                entries[owner]["spouses"].append(pid)
+                entries[pid]["spouses"].append(owner)
+            continue
+        if len(parts) > 1:
+            prefix = ".".join(parts[:-1])
+            parent = by_blood.get(_blood_key(prefix))
+            if parent:
+                entries[parent]["children"].append(pid)
+            co_parent = by_number.get(prefix) if "-S" in parts[-2] else None
+            if co_parent and co_parent != parent:
+                entries[co_parent]["children"].append(pid)
+    return entries
+
+def parse_ancestry(data: dict) -> Tuple[Dict[str, dict], Dict[str, List[str]]]:
+    """
+    Converte /platform/tree/ancestry em ({pid: pessoa}, {filho: [pais]}), usando
+    display.ascendancyNumber (numeração de Ahnentafel: os pais de n são 2n e 2n+1).
+    """
+    by_number: Dict[int, str] = {}
+    persons: Dict[str, dict] = {}
+    for p in data.get("persons") or []:
+        pid = p.get("id")
+        number = str((p.get("display") or {}).get("ascendancyNumber") or "")
+        if not pid or not number.isdigit():
+            continue
+        persons[pid] = p
+        by_number[int(number)] = pid
+    parents: Dict[str, List[str]] = {}
+    for n, pid in by_number.items():
+        found = [by_number[k] for k in (2 * n, 2 * n + 1) if k in by_number]
+        if found:
+            parents[pid] = found
+    return persons, parents
+
+def descendancy_relatives(access_token: str, person_id: str, generations: int = 2) -> Dict[str, Dict[str, Any]]:
+    """Atalho: busca a descendência em lote e já devolve o mapa de parentes por pessoa."""
+    return parse_descendancy(load_descendancy(access_token, person_id, generations=generations), generations)
+
+def ancestry_parents(data: dict, generations: int) -> Tuple[Dict[str, List[str]], List[Tuple[str, str]]]:
+    """
+    Como parse_ancestry, mas só com as pessoas cujos pais vieram COMPLETOS na resposta
+    (Ahnentafel n < 2**generations), inclusive as que não têm pais (lista vazia).
+    Devolve também os casais (2n, 2n+1) presentes, úteis para consolidar cônjuges.
+    """
+    by_number: Dict[int, str] = {}
+    for p in data.get("persons") or []:
+        number = str((p.get("display") or {}).get("ascendancyNumber") or "")
+        if p.get("id") and number.isdigit():
+            by_number[int(number)] = p["id"]
+    parents: Dict[str, List[str]] = {}
+    couples: List[Tuple[str, str]] = []
+    for n, pid in by_number.items():
+        if n < 2 ** generations:
+            parents[pid] = [by_number[k] for k in (2 * n, 2 * n + 1) if k in by_number]
+        if n % 2 == 0 and n + 1 in by_number:
+            couples.append((pid, by_number[n + 1]))
+    return parents, couples
@@ -2,6 +2,9 @@ from __future__ import annotations
 import os, json, time, pathlib, logging, requests
 from typing import Dict, Any, List, Set, Tuple
 
+from .fs_http import fs_get
+from .fs_tree import descendancy_relatives, load_ancestry, parse_ancestry
+
 API_BASE_URL = os.getenv("FS_API_BASE_URL", "https://apibeta.familysearch.org")
 
 def _h(token: str) -> Dict[str, str]:
@@ -9,7 +12,7 @@ def _h(token: str) -> Dict[str, str]:
 
 def fs_get_json(token: str, path: str, params: dict | None = None, timeout: int = 20) -> dict:
     url = f"{API_BASE_URL}{path}"
-    r = requests.get(url, headers=_h(token), params=params or {}, timeout=timeout)
+    r = fs_get(url, headers=_h(token), params=params or {}, timeout=timeout)
     if r.status_code != 200:
         raise requests.HTTPError(f"{r.status_code} for {url}")
     return r.json() if r.content else {}
@@ -76,12 +79,15 @@ def clone_couple_snapshot(
     depth_desc: int = 3,
     depth_asc: int = 1,
     family_slug: str = "default",
+    bulk: bool = False,
 ) -> Dict[str, Any]:
     """
     Regras MVP:
       - Descendentes do casal: coleta completa até depth_desc.
       - Ancestrais de cada cônjuge: apenas metadados mínimos (até depth_asc).
       - Salva em data/snapshots/<family_slug>/{persons.json, relations.json, meta.json}
+    Com bulk=True usa /platform/tree/descendancy e /platform/tree/ancestry (várias
+    gerações por chamada) e só lê pessoa a pessoa quem a resposta em lote não trouxe.
     """
 
     root = pathlib.Path("apps/api/src/data/snapshots") / family_slug
@@ -90,9 +96,27 @@ def clone_couple_snapshot(
     relations: List[Tuple[str, str, str]] = []  # (type, a, b) types: parent, spouse, child
 
     seen: Set[str] = set()
+    # Pessoas (e parentes) que vieram das respostas em lote: pid -> {details, spouses, children, complete}
+    known: Dict[str, Dict[str, Any]] = {}
+    calls = {"bulk": 0, "person": 0}
+
+    def load_descendancy_batch(pid: str, d: int):
+        generations = max(1, min(2, depth_desc - d + 1))
+        calls["bulk"] += 1
+        try:
+            for k, entry in descendancy_relatives(token, pid, generations).items():
+                cur = known.get(k)
+                if cur is None or (entry["complete"] and not cur["complete"]):
+                    known[k] = entry
+        except Exception as e:
+            logging.warning(f"descendancy fail {pid}: {e}")
 
     def add_person(pid: str):
         if pid in persons: return
+        if pid in known:
+            persons[pid] = safe_person_min({"persons": [known[pid]["details"]]})
+            return
+        calls["person"] += 1
         try:
             env = fetch_person(token, pid)
             persons[pid] = safe_person_min(env)
@@ -119,10 +143,24 @@ def clone_couple_snapshot(
         if (pid, d) in seen: 
             continue
         seen.add((pid, d))
+        if bulk and not (known.get(pid) or {}).get("complete"):
+            load_descendancy_batch(pid, d)
         add_person(pid)
+        entry = known.get(pid) if bulk else None
+        if entry and entry["complete"]:
+            if d < depth_desc:
+                for c in entry["children"]:
+                    add_person(c)
+                    add_relation("parent", pid, c)  # pid -> c
+                    queue.append((c, d + 1))
+            for s in entry["spouses"]:
+                add_person(s)
+                add_relation("spouse", pid, s)
+            continue
         # filhos
         if d < depth_desc:
             try:
+                calls["person"] += 1
                 kids = fetch_children(token, pid)
                 for c in kids:
                     add_person(c)
@@ -133,6 +171,7 @@ def clone_couple_snapshot(
 
         # spouse links (não expande spouse em profundidade para evitar explosão)
         try:
+            calls["person"] += 1
             sps = fetch_spouses(token, pid)
             for s in sps:
                 add_person(s)
@@ -149,6 +188,7 @@ def clone_couple_snapshot(
             if d >= limit: 
                 continue
             try:
+                calls["person"] += 1
                 parents = fetch_parents(token, cur)
                 for p in parents:
                     if p not in visited:
@@ -159,7 +199,31 @@ def clone_couple_snapshot(
             except Exception as e:
                 logging.warning(f"parents fail {cur}: {e}")
 
+    def climb_bulk(pid: str, limit: int) -> bool:
+        calls["bulk"] += 1
+        try:
+            found, parents_of = parse_ancestry(load_ancestry(token, pid, generations=limit, details=False))
+        except Exception as e:
+            logging.warning(f"ancestry fail {pid}: {e}")
+            return False
+        for ap, details in found.items():
+            known.setdefault(ap, {"details": details, "spouses": [], "children": [], "complete": False})
+        frontier, visited = [pid], {pid}
+        for _ in range(limit):
+            nxt = []
+            for cur in frontier:
+                for p in parents_of.get(cur, []):
+                    if p not in visited:
+                        add_person(p)  # min
+                        add_relation("parent", p, cur)  # p -> cur
+                        visited.add(p)
+                        nxt.append(p)
+            frontier = nxt
+        return True
+
     for x in filter(None, [husband, wife]):
+        if depth_asc > 0 and bulk and climb_bulk(x, depth_asc):
+            continue
         climb(x, depth_asc)
 
     # 4) Persiste snapshot
@@ -176,13 +240,13 @@ def clone_couple_snapshot(
             "family": family_slug,
             "created_at": int(time.time()),
             "husband": husband, "wife": wife,
-            "depth_desc": depth_desc, "depth_asc": depth_asc,
+            "depth_desc": depth_desc, "depth_asc": depth_asc, "mode": "bulk" if bulk else "person",
             "counts": {"persons": len(persons), "relations": len(relations)}
         }, f, ensure_ascii=False, indent=2)
 
     return {
         "ok": True,
         "family": family_slug,
-        "stats": {"persons": len(persons), "relations": len(relations)},
+        "stats": {"persons": len(persons), "relations": len(relations), "requests": calls},
         "files": {"persons": str(persons_path), "relations": str(relations_path), "meta": str(meta_path)},
     }
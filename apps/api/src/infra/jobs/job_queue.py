@@ -0,0 +1,209 @@
+# apps/api/src/infra/jobs/job_queue.py
+"""
+Fila de jobs local em SQLite (WAL), compartilhada entre os workers web e os
+processos de `python -m apps.api.src.worker`.
+
+Clonagens e buscas de caminho longas deixam de rodar dentro da requisição: a rota
+enfileira o job e devolve o id; o cliente consulta status/resultado depois.
+
+- Deduplicação: mesmo tipo + mesmo dono + mesmos parâmetros reaproveita o job ativo
+  (queued/running) ou um concluído há menos de JOBS_DEDUP_SECONDS.
+- O token do FamilySearch fica numa coluna à parte (fora da chave de deduplicação)
+  e é apagado quando o job termina.
+- Cancelamento: job na fila é cancelado na hora; em execução, o worker mata o
+  processo filho na próxima volta.
+- Workers vivos: cada worker grava um sinal em `workers` a cada volta; com
+  JOBS_RUNNER=auto o app web só deixa o job na fila se algum worker deu sinal há
+  menos de JOBS_STALE_SECONDS (senão roda o job no próprio processo).
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.abspath("./jobs.db"))
+JOBS_DEDUP_SECONDS = int(os.getenv("JOBS_DEDUP_SECONDS", "60"))
+JOBS_KEEP_SECONDS = int(os.getenv("JOBS_KEEP_SECONDS", "86400"))
+JOBS_STALE_SECONDS = int(os.getenv("JOBS_STALE_SECONDS", "120"))
+
+_local = threading.local()
+_ready = set()
+
+def _conn() -> sqlite3.Connection:
+    # Uma conexão por thread e por processo (conexões não atravessam fork).
+    con = getattr(_local, "con", None)
+    if con is None or getattr(_local, "pid", None) != os.getpid() or getattr(_local, "path", None) != JOBS_DB_PATH:
+        con = sqlite3.connect(JOBS_DB_PATH, timeout=10, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        _local.con, _local.pid, _local.path = con, os.getpid(), JOBS_DB_PATH
+        if JOBS_DB_PATH not in _ready:
+            _init(con); _ready.add(JOBS_DB_PATH)
+    return con
+
+def _init(con: sqlite3.Connection):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            owner TEXT,
+            params_json TEXT NOT NULL,
+            dedup_key TEXT NOT NULL,
+            token TEXT,
+            status TEXT NOT NULL,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            result_json TEXT,
+            result_status INTEGER,
+            error TEXT,
+            worker_pid INTEGER,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            heartbeat_at REAL,
+            finished_at REAL
+        )""")
+    con.execute("CREATE INDEX IF NOT EXISTS ix_jobs_status_created ON jobs (status, created_at)")
+    con.execute("CREATE INDEX IF NOT EXISTS ix_jobs_dedup ON jobs (dedup_key, finished_at)")
+    # Garante no máximo um job ativo por chave, mesmo com submits concorrentes.
+    con.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_jobs_active ON jobs (dedup_key) WHERE status IN ('queued', 'running')")
+    con.execute("CREATE TABLE IF NOT EXISTS workers (id TEXT PRIMARY KEY, seen_at REAL NOT NULL)")  # id = host:pid
+
+def dedup_key(kind: str, owner: Optional[str], params: Dict[str, Any]) -> str:
+    raw = json.dumps([kind, owner, params], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def submit(kind: str, params: Dict[str, Any], owner: Optional[str] = None, token: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+    """Enfileira (ou reaproveita) um job. Devolve (job, criado?)."""
+    key = dedup_key(kind, owner, params); now = time.time()
+    con = _conn()
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        row = con.execute(
+            "SELECT * FROM jobs WHERE dedup_key=? AND (status IN ('queued', 'running') OR (status='done' AND finished_at >= ?)) "
+            "ORDER BY created_at DESC LIMIT 1", (key, now - JOBS_DEDUP_SECONDS)).fetchone()
+        if row is not None:
+            con.execute("COMMIT")
+            return job_view(row), False
+        job_id = uuid.uuid4().hex
+        con.execute(
+            "INSERT INTO jobs (id, kind, owner, params_json, dedup_key, token, status, created_at) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)",
+            (job_id, kind, owner, json.dumps(params, ensure_ascii=False), key, token, now))
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK"); raise
+    return job_view(get(job_id, raw=True)), True
+
+def get(job_id: str, raw: bool = False):
+    row = _conn().execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+    if row is None or raw:
+        return row
+    return job_view(row)
+
+def job_view(row: sqlite3.Row) -> Dict[str, Any]:
+    """Visão pública do job (sem token nem resultado)."""
+    return {
+        "id": row["id"], "kind": row["kind"], "status": row["status"], "params": json.loads(row["params_json"]),
+        "cancel_requested": bool(row["cancel_requested"]), "error": row["error"],
+        "created_at": row["created_at"], "started_at": row["started_at"], "finished_at": row["finished_at"],
+    }
+
+def result(job_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+    row = _conn().execute("SELECT result_json, result_status FROM jobs WHERE id=?", (job_id,)).fetchone()
+    if row is None or row["result_json"] is None:
+        return None, None
+    return json.loads(row["result_json"]), row["result_status"]
+
+def owner_of(job_id: str) -> Optional[str]:
+    row = _conn().execute("SELECT owner FROM jobs WHERE id=?", (job_id,)).fetchone()
+    return row["owner"] if row else None
+
+def claim(worker_pid: int, job_id: Optional[str] = None) -> Optional[sqlite3.Row]:
+    """Pega o job mais antigo da fila (ou job_id, se ainda na fila) e o marca como running (atômico entre processos)."""
+    con = _conn(); now = time.time()
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        if job_id:
+            row = con.execute("SELECT id FROM jobs WHERE status='queued' AND id=?", (job_id,)).fetchone()
+        else:
+            row = con.execute("SELECT id FROM jobs WHERE status='queued' ORDER BY created_at LIMIT 1").fetchone()
+        if row is None:
+            con.execute("COMMIT")
+            return None
+        con.execute("UPDATE jobs SET status='running', worker_pid=?, started_at=?, heartbeat_at=? WHERE id=?",
+                    (worker_pid, now, now, row["id"]))
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK"); raise
+    return get(row["id"], raw=True)
+
+def heartbeat(job_id: str):
+    _conn().execute("UPDATE jobs SET heartbeat_at=? WHERE id=? AND status='running'", (time.time(), job_id))
+
+def finish(job_id: str, payload: Dict[str, Any], status: int = 200):
+    """Guarda o resultado; status HTTP >= 400 marca o job como failed."""
+    state = "done" if status < 400 else "failed"
+    error = None if state == "done" else str(payload.get("error") or f"HTTP {status}")
+    _conn().execute(
+        "UPDATE jobs SET status=?, result_json=?, result_status=?, error=?, token=NULL, finished_at=? WHERE id=? AND status='running'",
+        (state, json.dumps(payload, ensure_ascii=False, default=str), status, error, time.time(), job_id))
+
+def fail(job_id: str, error: str):
+    _conn().execute("UPDATE jobs SET status='failed', error=?, token=NULL, finished_at=? WHERE id=? AND status='running'",
+                    (error, time.time(), job_id))
+
+def cancel(job_id: str) -> Optional[Dict[str, Any]]:
+    """Cancela um job na fila; em execução, só pede o cancelamento ao worker."""
+    con = _conn(); now = time.time()
+    con.execute("UPDATE jobs SET status='cancelled', token=NULL, finished_at=? WHERE id=? AND status='queued'", (now, job_id))
+    con.execute("UPDATE jobs SET cancel_requested=1 WHERE id=? AND status='running'", (job_id,))
+    return get(job_id)
+
+def mark_cancelled(job_id: str):
+    _conn().execute("UPDATE jobs SET status='cancelled', token=NULL, finished_at=? WHERE id=? AND status='running'", (time.time(), job_id))
+
+def cancel_requested(job_id: str) -> bool:
+    row = _conn().execute("SELECT cancel_requested FROM jobs WHERE id=?", (job_id,)).fetchone()
+    return bool(row and row["cancel_requested"])
+
+def requeue_stale(stale_seconds: int = JOBS_STALE_SECONDS) -> int:
+    """Devolve à fila jobs running cujo worker parou de dar sinal (processo morto, máquina reiniciada)."""
+    con = _conn(); now = time.time()
+    con.execute("UPDATE jobs SET status='cancelled', token=NULL, finished_at=? WHERE status='running' AND heartbeat_at < ? AND cancel_requested=1",
+                (now, now - stale_seconds))
+    return con.execute(
+        "UPDATE jobs SET status='queued', worker_pid=NULL, started_at=NULL, heartbeat_at=NULL "
+        "WHERE status='running' AND heartbeat_at < ?", (now - stale_seconds,)).rowcount
+
+def release(job_id: str):
+    """Devolve à fila um job running (worker encerrado no meio)."""
+    _conn().execute("UPDATE jobs SET status='queued', worker_pid=NULL, started_at=NULL, heartbeat_at=NULL "
+                    "WHERE id=? AND status='running' AND cancel_requested=0", (job_id,))
+    mark_cancelled(job_id)
+
+def _worker_id(worker_pid: int) -> str:
+    # Containers diferentes podem repetir o pid (o worker costuma ser o pid 1).
+    return f"{socket.gethostname()}:{worker_pid}"
+
+def worker_beat(worker_pid: int):
+    """Sinal de vida do processo worker (uma vez por volta do laço)."""
+    _conn().execute("INSERT INTO workers (id, seen_at) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET seen_at=excluded.seen_at",
+                    (_worker_id(worker_pid), time.time()))
+
+def worker_gone(worker_pid: int):
+    _conn().execute("DELETE FROM workers WHERE id=?", (_worker_id(worker_pid),))
+
+def worker_alive(stale_seconds: int = JOBS_STALE_SECONDS) -> bool:
+    """Algum `python -m apps.api.src.worker` deu sinal há menos de `stale_seconds`?"""
+    return _conn().execute("SELECT 1 FROM workers WHERE seen_at >= ? LIMIT 1", (time.time() - stale_seconds,)).fetchone() is not None
+
+def purge(keep_seconds: int = JOBS_KEEP_SECONDS) -> int:
+    con = _conn()
+    con.execute("DELETE FROM workers WHERE seen_at < ?", (time.time() - keep_seconds,))
+    return con.execute("DELETE FROM jobs WHERE status IN ('done', 'failed', 'cancelled') AND finished_at < ?",
+                       (time.time() - keep_seconds,)).rowcount
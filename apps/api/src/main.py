@@ -21,12 +21,13 @@ def create_app():
     # Blueprints
     from .api.routes_auth import auth_bp, login_required
     from .api.routes_persons_matches import persons_matches_bp
-    from .infra.familysearch.fs_routes import fs_bp
+    from .infra.familysearch.fs_routes import fs_bp, fs_stats
     from .api.routes_snapshot import snapshot_bp
     from .api.routes_invites import invites_bp
     from .api.routes_posts import posts_bp
     from .api.routes_gallery import gallery_bp
     from .api.routes_family import family_bp
+    from .api.routes_jobs import jobs_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(fs_bp)
@@ -36,6 +37,7 @@ def create_app():
     app.register_blueprint(posts_bp)
     app.register_blueprint(gallery_bp)
     app.register_blueprint(family_bp)
+    app.register_blueprint(jobs_bp)
 
 
     HERE = Path(__file__).resolve().parent
@@ -55,6 +57,9 @@ def create_app():
         # Passa o nome do usuário para o template, para ser usado em `{{ user_name }}`
         return render_template("app.html", user_name=user_name)
 
+    # Contadores de cache por worker: expõem volume de uso, só para quem está logado.
+    app.add_url_rule("/fs/stats", view_func=login_required(fs_stats))
+
     # <<< INÍCIO DA NOVA ROTA PARA A PÁGINA "SOBRE" >>>
     @app.route("/about")
     def about_page():
@@ -0,0 +1,113 @@
+# apps/api/src/services/ancestor_closure.py
+"""
+Manutenção da tabela ancestor_closure (fecho transitivo de parentChild por família).
+
+- rebuild_family_closure: recalcula tudo a partir dos snapshots da família (clone novo
+  ou com remoções, exclusão de snapshot, ou famílias antigas que ainda não têm fecho).
+- add_parent_edge: atualização incremental quando uma aresta pai->filho é criada
+  (expand, refresh de clone sem remoções), com um único INSERT ... SELECT sobre o
+  próprio fecho; add_persons grava as linhas de distância 0 de pessoas novas.
+- common_ancestors: os ancestrais comuns mais próximos de duas pessoas, numa
+  consulta só (auto-join indexado), sem caminhar no grafo nem chamar o FamilySearch.
+"""
+from __future__ import annotations
+from collections import defaultdict, deque
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import aliased
+
+from ..infra.db.models import AncestorClosure, Person, Snapshot, SnapshotEdge, SnapshotNode
+from .relationship import relationship_label
+
+_KEY = ["family_id", "ancestor_id", "descendant_id"]
+
+def _insert(db):
+    return sqlite_insert if str(db.bind.dialect.name) == "sqlite" else pg_insert
+
+def _min(db, a, b):
+    # SQLite usa min(a, b) escalar; PostgreSQL usa LEAST.
+    return func.min(a, b) if str(db.bind.dialect.name) == "sqlite" else func.least(a, b)
+
+def compute_closure(person_ids, parent_edges) -> Dict[Tuple[str, str], int]:
+    """{(ancestral, descendente): gerações} por BFS ascendente a partir de cada pessoa."""
+    parents_of: Dict[str, List[str]] = defaultdict(list)
+    for parent_id, child_id in parent_edges:
+        parents_of[child_id].append(parent_id)
+    closure: Dict[Tuple[str, str], int] = {}
+    for pid in set(person_ids) | set(parents_of) | {p for ps in parents_of.values() for p in ps}:
+        dist = {pid: 0}; q = deque([pid])
+        while q:
+            cur = q.popleft()
+            for parent_id in parents_of.get(cur, ()):
+                if parent_id not in dist:
+                    dist[parent_id] = dist[cur] + 1; q.append(parent_id)
+        for anc, g in dist.items():
+            closure[(anc, pid)] = g
+    return closure
+
+def rebuild_family_closure(db, family_id: int) -> int:
+    """Apaga e recalcula o fecho da família. Retorna o número de linhas gravadas."""
+    snap_ids = select(Snapshot.id).where(Snapshot.family_id == family_id)
+    person_ids = [r[0] for r in db.query(SnapshotNode.person_id).filter(SnapshotNode.snapshot_id.in_(snap_ids)).distinct()]
+    edges = db.query(SnapshotEdge.src_id, SnapshotEdge.dst_id).filter(
+        SnapshotEdge.snapshot_id.in_(snap_ids), SnapshotEdge.type == "parentChild"
+    ).distinct().all()
+    closure = compute_closure(person_ids, edges)
+    db.query(AncestorClosure).filter(AncestorClosure.family_id == family_id).delete(synchronize_session=False)
+    if closure:
+        db.execute(AncestorClosure.__table__.insert(), [
+            {"family_id": family_id, "ancestor_id": a, "descendant_id": d, "generations": g} for (a, d), g in closure.items()
+        ])
+    return len(closure)
+
+def ensure_family_closure(db, family_id: int) -> bool:
+    """Constrói o fecho de famílias clonadas antes desta tabela existir. True se reconstruiu."""
+    if db.query(AncestorClosure.family_id).filter(AncestorClosure.family_id == family_id).first():
+        return False
+    rebuild_family_closure(db, family_id)
+    return True
+
+def add_persons(db, family_id: int, person_ids):
+    """Linhas (pessoa, pessoa, 0) de quem entrou na família, como a reconstrução grava."""
+    rows = [{"family_id": family_id, "ancestor_id": pid, "descendant_id": pid, "generations": 0} for pid in set(person_ids)]
+    if rows:
+        db.execute(_insert(db)(AncestorClosure).values(rows).on_conflict_do_nothing(index_elements=_KEY))
+
+def add_parent_edge(db, family_id: int, parent_id: str, child_id: str):
+    """
+    Nova aresta pai->filho: todo ancestral do pai (inclusive ele) passa a ser ancestral
+    de todo descendente do filho (inclusive ele), a g1 + g2 + 1 gerações.
+    """
+    insert = _insert(db)
+    add_persons(db, family_id, (parent_id, child_id))
+
+    up, down = aliased(AncestorClosure), aliased(AncestorClosure)
+    rows = select(
+        literal(family_id), up.ancestor_id, down.descendant_id, up.generations + down.generations + 1
+    ).select_from(up).join(down, down.family_id == up.family_id).where(
+        up.family_id == family_id, up.descendant_id == parent_id, down.ancestor_id == child_id,
+    )
+    stmt = insert(AncestorClosure).from_select(["family_id", "ancestor_id", "descendant_id", "generations"], rows)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=_KEY,
+        set_={"generations": _min(db, AncestorClosure.__table__.c.generations, stmt.excluded.generations)},
+    ))
+
+def common_ancestors(db, family_id: int, p1: str, p2: str) -> Dict[str, Any]:
+    """Ancestrais comuns mais próximos de p1 e p2 e o grau de parentesco entre eles."""
+    a, b = aliased(AncestorClosure), aliased(AncestorClosure)
+    rows = db.query(a.ancestor_id, a.generations, b.generations, Person.name).join(
+        b, (b.family_id == a.family_id) & (b.ancestor_id == a.ancestor_id)
+    ).outerjoin(Person, Person.id == a.ancestor_id).filter(
+        a.family_id == family_id, a.descendant_id == p1, b.descendant_id == p2
+    ).order_by(a.generations + b.generations).all()
+    if not rows:
+        return {"related": False, "common_ancestors": [], "relationship_label": None}
+    best = rows[0][1] + rows[0][2]
+    nearest = [{"id": anc, "name": name, "d1": d1, "d2": d2} for anc, d1, d2, name in rows if d1 + d2 == best]
+    d1, d2 = nearest[0]["d1"], nearest[0]["d2"]
+    return {"related": True, "common_ancestors": nearest, "d1": d1, "d2": d2,
+            "relationship_label": relationship_label(d1, d2) if (d1 or d2) else "Mesma pessoa"}
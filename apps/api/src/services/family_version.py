@@ -0,0 +1,66 @@
+# apps/api/src/services/family_version.py
+"""
+Versão por família e GET condicional nos endpoints da família.
+
+Toda escrita que muda o que /snapshot/<slug>, /family/<slug>/posts, /gallery,
+/events ou /manage devolvem chama bump_family_version na própria transação. Os
+GETs leem a versão logo depois da checagem de acesso e, se o If-None-Match do
+navegador bate com o ETag, respondem 304 sem montar nada.
+
+ETag forte: "<endpoint>-<família>-v<versão>-<hash do que varia por quem vê>"
+(usuário, ?relationships, gzip ou não...). A versão é lida antes de montar a
+resposta: uma escrita concorrente no meio só faz o próximo GET vir com 200.
+Cache-Control "private, no-cache": o navegador guarda, mas revalida sempre; o
+app.html não muda nada (o fetch devolve o corpo do cache em um 304).
+
+Pessoas e relações são globais: um clone/expand/convite que as altera pode mudar
+a árvore e os eventos de outras famílias; sobe a versão só das famílias com
+snapshots que mostram quem mudou (snapshot_payload.invalidate_touching + bump_family_versions).
+"""
+from __future__ import annotations
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Iterable, Optional
+
+from flask import Response, request
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..infra.db.models import FamilyVersion
+
+def _insert(db):
+    return sqlite_insert if str(db.bind.dialect.name) == "sqlite" else pg_insert
+
+def bump_family_version(db, family_id: int) -> None:
+    """Sobe a versão da família (cria com 1) num único comando; vale no commit de `db`."""
+    table, now = FamilyVersion.__table__, datetime.utcnow()
+    stmt = _insert(db)(table).values(family_id=family_id, version=1, updated_at=now)
+    db.execute(stmt.on_conflict_do_update(index_elements=["family_id"], set_={"version": table.c.version + 1, "updated_at": now}))
+
+def bump_family_versions(db, family_ids: Iterable[int]) -> None:
+    """bump_family_version de cada família (sem repetir)."""
+    for family_id in sorted(set(family_ids)):
+        bump_family_version(db, family_id)
+
+def family_version(db, family_id: int) -> int:
+    return db.query(FamilyVersion.version).filter(FamilyVersion.family_id == family_id).scalar() or 0
+
+def family_etag(endpoint: str, family_id: int, version: int, *variant: Any) -> str:
+    digest = hashlib.sha256(json.dumps(variant, default=str).encode("utf-8")).hexdigest()[:16]
+    return f"{endpoint}-{family_id}-v{version}-{digest}"
+
+def _cache_headers(resp: Response, etag: str) -> Response:
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+def not_modified(etag: str) -> Optional[Response]:
+    """304 se o navegador já tem esta versão (If-None-Match), senão None."""
+    if etag in request.if_none_match:
+        return _cache_headers(Response(status=304), etag)
+    return None
+
+def with_etag(resp: Response, etag: str) -> Response:
+    """Marca uma resposta 200 com o ETag (erros não são cacheados)."""
+    return _cache_headers(resp, etag) if resp.status_code == 200 else resp
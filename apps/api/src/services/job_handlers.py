@@ -0,0 +1,54 @@
+# apps/api/src/services/job_handlers.py
+"""
+Handlers dos jobs assíncronos (infra/jobs/job_queue), executados pelo worker
+(apps/api/src/worker.py) num processo filho, fora de qualquer requisição.
+
+Cada handler recebe (params, token) e devolve (json, status HTTP), o mesmo par
+que a rota síncrona equivalente responderia. Os imports são tardios para o
+processo pai do worker não carregar Flask/SQLAlchemy.
+"""
+from __future__ import annotations
+from typing import Any, Dict, Tuple
+
+def _fs_headers(token: str | None) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {token}", "Accept": "application/json"} if token else {"Accept": "application/json"}
+
+def run_snapshot_clone(params: Dict[str, Any], token: str | None) -> Tuple[Dict[str, Any], int]:
+    from ..api.routes_snapshot import clone_snapshot
+    return clone_snapshot(token, params["user_fs_id"], params["user_person_id"], params.get("body") or {})
+
+def run_tree_clone(params: Dict[str, Any], token: str | None) -> Tuple[Dict[str, Any], int]:
+    from ..infra.familysearch.tree_clone_service import clone_couple_snapshot
+    return clone_couple_snapshot(token=token, **params), 200
+
+def run_tree_load(params: Dict[str, Any], token: str | None) -> Tuple[Dict[str, Any], int]:
+    from .load_tree import load_tree
+    stats = load_tree(params["fsid"], depth=int(params.get("depth") or 4), headers=_fs_headers(token))
+    return stats, (200 if stats.get("ok") else 401 if stats.get("error") == "not_authenticated" else 400)
+
+def run_invite_lineage(params: Dict[str, Any], token: str | None) -> Tuple[Dict[str, Any], int]:
+    from ..api.routes_auth import resolve_invite_lineage
+    return resolve_invite_lineage(token, params["user_fs_id"], params["person_id"], params["family_id"])
+
+def run_path_search(params: Dict[str, Any], token: str | None) -> Tuple[Dict[str, Any], int]:
+    import time
+    from . import pathfinder as pf
+    p1, p2 = params["person1_id"], params["person2_id"]
+    headers = pf.get_headers(token)
+    if not headers:
+        return {"ok": False, "error": "Não autenticado"}, 401
+    t0 = time.time(); stats = {}
+    paths = pf.find_paths(p1, p2, headers, max_depth=int(params.get("max_depth") or 8),
+                          prefetch_generations=params.get("prefetch_generations"), stats=stats)
+    elapsed = time.time() - t0
+    print(f"[jobs] path_search {p1}->{p2} em {elapsed:.2f}s: {stats}")
+    vm = [pf.path_view_model(raw_path, ancestor, headers, p1, p2) for raw_path, ancestor in paths]
+    return {"ok": bool(vm), "paths": vm, "stats": stats, "elapsed": round(elapsed, 3)}, 200
+
+JOB_HANDLERS = {
+    "snapshot_clone": run_snapshot_clone,
+    "tree_clone": run_tree_clone,
+    "tree_load": run_tree_load,
+    "path_search": run_path_search,
+    "invite_lineage": run_invite_lineage,
+}
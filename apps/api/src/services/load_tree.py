@@ -51,9 +51,10 @@ def _link(con, a: str, b: str, rel_type: str):
         INSERT OR IGNORE INTO relations (src_fsid, dst_fsid, rel_type) VALUES (?, ?, ?)
     """, (a, b, rel_type))
 
-def load_tree(root_fsid: str, depth: int = 3):
+def load_tree(root_fsid: str, depth: int = 3, headers: dict | None = None):
+    """headers: cabeçalhos do FS já prontos (worker de jobs, fora da requisição); senão, os da sessão."""
     init_db()
-    headers = auth_headers_from_session()
+    headers = headers or auth_headers_from_session()
     if "Authorization" not in headers:
         return {"ok": False, "error": "not_authenticated", "msg": "Faça login em /login"}
 
@@ -0,0 +1,47 @@
+# apps/api/src/services/path_links.py
+"""
+Caminhos da BFS como ponteiros para o passo anterior (uma trie de caminhos).
+
+Estender um caminho cria só um nó novo que aponta para o prefixo, que é
+compartilhado por todos os caminhos que passam por ele. A lista completa só é
+montada (to_list) nos pontos de encontro.
+"""
+from __future__ import annotations
+from typing import List, Optional, Tuple
+
+
+class PathLink:
+    __slots__ = ("pid", "prev", "size")
+
+    def __init__(self, pid: str, prev: Optional["PathLink"] = None):
+        self.pid = pid
+        self.prev = prev
+        self.size = 1 if prev is None else prev.size + 1
+
+    def extend(self, pid: str) -> "PathLink":
+        return PathLink(pid, self)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, pid: str) -> bool:
+        link = self
+        while link is not None:
+            if link.pid == pid:
+                return True
+            link = link.prev
+        return False
+
+    def tail(self, n: int) -> Tuple[str, ...]:
+        """Os últimos n PIDs, na ordem do caminho."""
+        out, link = [], self
+        while link is not None and len(out) < n:
+            out.append(link.pid); link = link.prev
+        return tuple(reversed(out))
+
+    def to_list(self) -> List[str]:
+        out, link = [], self
+        while link is not None:
+            out.append(link.pid); link = link.prev
+        out.reverse()
+        return out
@@ -8,12 +8,20 @@ import requests
 import urllib3
 from flask import (
     Flask, request, redirect, url_for, render_template,
-    session, jsonify, abort
+    session, jsonify, abort, Response, stream_with_context
 )
 from dotenv import load_dotenv
-from collections import deque, OrderedDict
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from collections import defaultdict, deque
+
+from ..infra.cache.person_cache import get_person_cache
+from ..infra.cache.singleflight import get_singleflight
+from ..infra.familysearch.fs_http import get_session
+from ..infra.familysearch.fs_persons import token_scope
+from ..infra.familysearch.fs_tree import ancestry_parents, load_ancestry
+from ..infra.jobs import job_queue
+from ..worker import dispatch
+from .path_links import PathLink
+from .relationship import relationship_label
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -44,17 +52,7 @@ app.config.update(
     SESSION_COOKIE_SAMESITE="Lax",      # segura contra CSRF básico
 )
 
-# HTTP session with retries
-session_http = requests.Session()
-retries = Retry(
-    total=3,
-    backoff_factor=0.3,
-    status_forcelist=(429, 500, 502, 503, 504),
-    allowed_methods=False,
-)
-adapter = HTTPAdapter(pool_connections=64, pool_maxsize=64, max_retries=retries)
-session_http.mount("https://", adapter)
-session_http.mount("http://", adapter)
+# HTTP: sessão keep-alive compartilhada (pool, retries e headers em fs_http)
 DEFAULT_TIMEOUT = 8
 
 # -------------------------------------------------------------
@@ -115,7 +113,7 @@ def exchange_code_for_token(code: str):
         "client_id": CLIENT_ID,
     }
     headers = {"Content-Type": "application/x-www-form-urlencoded", "Accept": "application/json"}
-    r = session_http.post(TOKEN_URL, data=data, headers=headers, timeout=DEFAULT_TIMEOUT)
+    r = get_session().post(TOKEN_URL, data=data, headers=headers, timeout=DEFAULT_TIMEOUT)
     if DEBUG_FS:
         try:
             print("[OAuth] token resp", r.status_code, r.json())
@@ -140,7 +138,7 @@ def get_unauth_token():
     }
     headers = {"Content-Type": "application/x-www-form-urlencoded", "Accept": "application/json"}
     try:
-        r = session_http.post(TOKEN_URL, data=data, headers=headers, timeout=DEFAULT_TIMEOUT)
+        r = get_session().post(TOKEN_URL, data=data, headers=headers, timeout=DEFAULT_TIMEOUT)
         if DEBUG_FS:
             try:
                 print("[OAuth] unauth resp", r.status_code, r.json())
@@ -169,31 +167,16 @@ def get_headers(access_token=None):
 CACHE_TTL = int(os.getenv("CACHE_TTL_SECONDS", "900"))  # 15 min padrão
 CACHE_MAX = int(os.getenv("CACHE_MAX", "2500"))
 
-class TTLCache:
-    def __init__(self, ttl=CACHE_TTL, max_items=CACHE_MAX):
-        self.ttl = ttl
-        self.max = max_items
-        self.data = OrderedDict()  # pid -> (ts, value)
-
-    def get(self, key):
-        if key in self.data:
-            ts, val = self.data[key]
-            if time.time() - ts < self.ttl:
-                # move p/ fim (recente)
-                self.data.move_to_end(key)
-                return val
-            else:
-                del self.data[key]
-        return None
+CACHE_FAILURE_TTL = 60  # falhas expiram rápido (e ficam sob o token que falhou: podem ser perfil privado)
 
-    def set(self, key, value):
-        self.data[key] = (time.time(), value)
-        self.data.move_to_end(key)
-        # evict
-        if len(self.data) > self.max:
-            self.data.popitem(last=False)
+# Backend compartilhado (memória/SQLite/Redis, ver infra/cache/person_cache).
+_person_cache = get_person_cache("pathfinder-relatives", ttl=CACHE_TTL)
+_inflight = get_singleflight("pathfinder-relatives")
 
-_person_cache = TTLCache()
+def _cache_key(person_id, headers):
+    # Pessoas vivas e falhas (403 de perfil privado, rede) valem só para quem as buscou:
+    # a entrada fica presa ao token. Só pessoas falecidas ficam sob o PID.
+    return f"{person_id}@{token_scope(headers.get('Authorization', ''))}"
 
 # -------------------------------------------------------------
 # FamilySearch API helpers (com cache)
@@ -208,18 +191,25 @@ def get_person_with_relatives(person_id, headers):
       - spouses
     Usa cache TTL simples.
     """
-    cached = _person_cache.get(person_id)
+    cached = _person_cache.get(person_id, _cache_key(person_id, headers))
     if cached is not None:
         if DEBUG_FS: print(f"[DEBUG][Cache] Cache HIT para {person_id}") # >>> NOVO DEBUG
-        return cached
+        return tuple(cached)
+    # Pedidos simultâneos do mesmo PID (busca em paralelo, vários usuários) viram um só.
+    result, leader = _inflight.do(person_id, lambda: _fetch_person_with_relatives(person_id, headers))
+    if not leader and (result[0] is None or result[0].get("living")):
+        # Falha ou pessoa viva vistas pelo token de outra pessoa: busca com o próprio.
+        result = _fetch_person_with_relatives(person_id, headers)
+    return result
 
+def _fetch_person_with_relatives(person_id, headers):
     url = f"{API_BASE_URL}/platform/tree/persons/{person_id}"
     
     # >>> NOVO DEBUG: Log antes de fazer a chamada
     if DEBUG_FS: print(f"[DEBUG] Buscando na API para: {person_id} | URL: {url}")
     
     try:
-        r = session_http.get(url, headers=headers, verify=False, timeout=DEFAULT_TIMEOUT)
+        r = get_session().get(url, headers=headers, verify=False, timeout=DEFAULT_TIMEOUT)
         
         # >>> NOVO DEBUG: Log do status da resposta
         if DEBUG_FS: print(f"[DEBUG] Resposta da API para {person_id}. Status: {r.status_code}")
@@ -228,7 +218,7 @@ def get_person_with_relatives(person_id, headers):
         # >>> NOVO DEBUG: Log de erro de conexão
         if DEBUG_FS: print(f"[DEBUG] ERRO DE CONEXÃO para {person_id}: {e}")
         result = (None, [], [], [])
-        _person_cache.set(person_id, result)
+        _person_cache.set(_cache_key(person_id, headers), list(result), ttl=CACHE_FAILURE_TTL)
         return result
 
     parents, children, spouses = set(), set(), set()
@@ -268,7 +258,10 @@ def get_person_with_relatives(person_id, headers):
 
 
     result = (details, list(parents), list(children), list(spouses))
-    _person_cache.set(person_id, result)
+    if details is None:
+        _person_cache.set(_cache_key(person_id, headers), list(result), ttl=CACHE_FAILURE_TTL)
+    else:
+        _person_cache.set(_cache_key(person_id, headers) if details.get("living") else person_id, list(result))
     return result
 
 def get_person_name(pid, headers):
@@ -284,10 +277,11 @@ def get_person_name(pid, headers):
 K_PATHS_PER_NODE = 16
 
 def _edge_sig(path):
-    L = len(path)
-    if L >= 3: return (path[-3], path[-2], path[-1])
-    if L == 2: return (path[-2], path[-1])
-    return (path[-1],)
+    # Últimos (até) 3 PIDs do caminho (PathLink), sem percorrer o resto
+    prev = path.prev
+    if prev is None: return (path.pid,)
+    if prev.prev is None: return (prev.pid, path.pid)
+    return (prev.prev.pid, prev.pid, path.pid)
 
 def _add_path_variant(visited, node, new_path, k=K_PATHS_PER_NODE):
     cur = visited.get(node)
@@ -302,7 +296,27 @@ def _add_path_variant(visited, node, new_path, k=K_PATHS_PER_NODE):
         return True
     return False
 
-def post_process_paths(paths_with_ancestors, headers, keep_within=3, max_paths=8):
+def _couple_checker(couples, headers):
+    """
+    is_couple(a, b) para a consolidação. `couples` é o índice {(pid_menor, pid_maior)}
+    montado pela busca; sem ele, consulta só os cônjuges já em cache (nunca a rede).
+    """
+    if couples is not None:
+        return lambda a, b: ((a, b) if a < b else (b, a)) in couples
+    def is_couple(a, b):
+        hit = _person_cache.get(a, _cache_key(a, headers))
+        return bool(hit) and b in (hit[3] or [])
+    return is_couple
+
+def _index_couple(couples, parents):
+    # Pais do mesmo filho formam um casal (os ancestrais que a consolidação junta).
+    # Tupla ordenada em vez de frozenset: o índice cresce com cada pessoa expandida.
+    for i in range(len(parents)):
+        for j in range(i + 1, len(parents)):
+            a, b = parents[i], parents[j]
+            couples.add((a, b) if a < b else (b, a))
+
+def post_process_paths(paths_with_ancestors, headers, keep_within=3, max_paths=8, couples=None):
     if not paths_with_ancestors:
         return []
     # 1) remove loops e duplica por conjunto de nós
@@ -317,29 +331,33 @@ def post_process_paths(paths_with_ancestors, headers, keep_within=3, max_paths=8
     if not valid:
         return []
 
-    # 2) consolida casais
+    # 2) consolida casais: dois caminhos iguais exceto numa posição, ocupada por cônjuges.
+    # Em vez de comparar todos os pares, agrupa por assinatura "caminho com um curinga"
+    # (hash); os cônjuges vêm do índice montado na busca, sem rede aqui.
+    is_couple = _couple_checker(couples, headers)
+    buckets = defaultdict(list)
+    keyed = []
+    for i, (p, _) in enumerate(valid):
+        t = tuple(p); keyed.append(t)
+        for k in range(len(t)):
+            buckets[t[:k] + (None,) + t[k + 1:]].append(i)
+
     consolidated, used = [], set()
-    for i in range(len(valid)):
+    for i, (p1, a1) in enumerate(valid):
         if i in used: continue
-        p1, a1 = valid[i]; match = False
-        for j in range(i + 1, len(valid)):
-            if j in used: continue
-            p2, a2 = valid[j]
-            if len(p1) != len(p2): continue
-            diff_idx, diff_count = -1, 0
-            for k in range(len(p1)):
-                if p1[k] != p2[k]:
-                    diff_idx = k; diff_count += 1
-            if diff_count == 1:
-                n1, n2 = p1[diff_idx], p2[diff_idx]
-                _, _, _, sp1 = get_person_with_relatives(n1, headers)
-                if n2 in sp1:
-                    merged_anc = tuple(sorted((n1, n2)))
-                    merged_path = p1[:diff_idx] + [merged_anc] + p1[diff_idx + 1:]
-                    consolidated.append((merged_path, merged_anc))
-                    used.add(i); used.add(j); match = True; break
-        if not match:
-            consolidated.append((p1, a1))
+        t = keyed[i]; best = None  # (j, posição) com o menor j, como na comparação par a par
+        for k in range(len(t)):
+            for j in buckets[t[:k] + (None,) + t[k + 1:]]:
+                if best is not None and j >= best[0]: break
+                if j <= i or j in used: continue
+                if is_couple(t[k], keyed[j][k]):
+                    best = (j, k); break
+        if best is None:
+            consolidated.append((p1, a1)); continue
+        j, k = best
+        merged_anc = tuple(sorted((t[k], keyed[j][k])))
+        consolidated.append((p1[:k] + [merged_anc] + p1[k + 1:], merged_anc))
+        used.add(i); used.add(j)
     if not consolidated:
         return []
 
@@ -382,92 +400,178 @@ def post_process_paths(paths_with_ancestors, headers, keep_within=3, max_paths=8
 # -------------------------------------------------------------
 # (Substitua a sua função find_paths por esta)
 # (Substitua a sua função find_paths por esta versão corrigida)
-def find_paths(person1_id, person2_id, headers, max_depth=8):
-    max_nodes = 10000
-    expanded = 0
-
-    q1, q2 = deque(), deque()
-    visited1, visited2 = {}, {}
-
-    q1.append((person1_id, [person1_id]))
-    visited1[person1_id] = [[person1_id]]
-
-    q2.append((person2_id, [person2_id]))
-    visited2[person2_id] = [[person2_id]]
-
-    paths_with_ancestors = []
-    depth = 0
-    best_len = None
-
-    # O loop principal continua enquanto houver nós para expandir e os limites não forem atingidos
-    while depth < max_depth and (q1 or q2) and len(paths_with_ancestors) < 50 and expanded < max_nodes:
-        
-        if DEBUG_FS: print(f"\n[DEBUG] Profundidade: {depth}, Fila1: {len(q1)}, Fila2: {len(q2)}, Nós Expandidos: {expanded}")
-        
-        # >>> INÍCIO DA CORREÇÃO <<<
-        # Processa a fronteira 1 apenas se a fila não estiver vazia
-        if q1:
-            q1_size = len(q1)
-            for _ in range(q1_size):
-                curr_id, path = q1.popleft()
-                if DEBUG_FS: print(f"[DEBUG][Lado 1] Processando: {curr_id}")
-
-                if curr_id in visited2:
-                    if DEBUG_FS: print(f"[DEBUG][ENCONTRO!] ID {curr_id} achado em ambas as buscas.")
-                    for p2 in visited2[curr_id]:
-                        full_path = path + p2[::-1][1:]
-                        paths_with_ancestors.append((full_path, curr_id))
-                        L = len(full_path)
-                        best_len = L if best_len is None else min(best_len, L)
+# Orçamento padrão da busca "anytime" (/search/stream, /view): tempo de parede,
+# chamadas ao FamilySearch e nós enfileirados. O cliente pode pedir menos, não mais.
+STREAM_BUDGET = {
+    "seconds": float(os.getenv("PATHFINDER_STREAM_MAX_SECONDS", "20")),
+    "fs_calls": int(os.getenv("PATHFINDER_STREAM_MAX_FS_CALLS", "400")),
+    "nodes": int(os.getenv("PATHFINDER_STREAM_MAX_NODES", "10000")),
+}
+PROGRESS_EVERY = 0.5  # s entre eventos de progresso dentro de um nível
+BUDGET_CHECK_EVERY = 64  # nós já em cache entre checagens de orçamento/progresso na BFS
+
+def iter_paths(person1_id, person2_id, headers, max_depth=8, prefetch_generations=None, budget=None, stats=None, couples=None):
+    """
+    BFS bidirecional subindo pelos pais, como gerador de eventos:
+      ("path", (caminho, ancestral))  cada caminho novo assim que é achado (sem laços,
+                                      sem repetir conjunto de nós; casais ainda não consolidados)
+      ("progress", stats)             contadores, a cada nível e no máximo a cada PROGRESS_EVERY s
+      ("done", stats)                 fim; stats["reason"] diz o motivo
+    budget: {"seconds", "fs_calls", "nodes"}; chave ausente/0 = sem limite (nodes: 10000).
+    couples, se passado, recebe o índice de casais para post_process_paths.
+    """
+    if prefetch_generations is None:
+        prefetch_generations = PREFETCH_GENERATIONS
+    prefetch_generations = max(0, min(prefetch_generations, 8))  # /ancestry aceita até 8 gerações
+    if stats is None:
+        stats = {}
+    budget = budget or {}
+    max_nodes = budget.get("nodes") or 10000
+    stats.update({"mode": "ancestry" if prefetch_generations > 0 else "person", "lookups": 0, "prefetch_hits": 0,
+                  "ancestry_calls": 0, "person_calls": 0, "http_calls": 0, "calls_saved": 0,
+                  "expanded": 0, "depth": 0, "paths_found": 0, "elapsed": 0.0, "reason": None})
+    t0 = time.monotonic(); last_progress = t0
+
+    def progress():
+        stats["http_calls"] = stats["ancestry_calls"] + stats["person_calls"]
+        stats["calls_saved"] = stats["lookups"] - stats["http_calls"]
+        stats["elapsed"] = round(time.monotonic() - t0, 3)
+        return dict(stats)
+
+    def over_budget():
+        if budget.get("seconds") and time.monotonic() - t0 >= budget["seconds"]: return "budget_seconds"
+        if budget.get("fs_calls") and stats["ancestry_calls"] + stats["person_calls"] >= budget["fs_calls"]: return "budget_fs_calls"
+        if stats["expanded"] >= max_nodes: return "budget_nodes"
+        return None
 
-                _, parents, _, _ = get_person_with_relatives(curr_id, headers)
-                for p_id in parents:
-                    if p_id in path: continue
-                    new_path = path + [p_id]
-                    if _add_path_variant(visited1, p_id, new_path):
-                        q1.append((p_id, new_path))
-                        expanded += 1
-                        if expanded >= max_nodes: break
-                if expanded >= max_nodes: break
-            if expanded >= max_nodes: break
-
-        # Processa a fronteira 2 apenas se a fila não estiver vazia
-        if q2:
-            q2_size = len(q2)
-            for _ in range(q2_size):
-                curr_id, path = q2.popleft()
-                if DEBUG_FS: print(f"[DEBUG][Lado 2] Processando: {curr_id}")
-
-                if curr_id in visited1:
+    # Caminhos como PathLink (ponteiro para o prefixo, compartilhado): nada de copiar
+    # listas a cada nó enfileirado; a lista completa só é montada nos encontros.
+    start1, start2 = PathLink(person1_id), PathLink(person2_id)
+    q1, q2 = deque([(person1_id, start1)]), deque([(person2_id, start2)])
+    visited1, visited2 = {person1_id: [start1]}, {person2_id: [start2]}
+    sides = ((q1, visited1, visited2, True), (q2, visited2, visited1, False))
+
+    raw_found = 0          # encontros, inclusive repetidos (limite de 50 como antes)
+    seen_sets = set()      # conjuntos de nós já emitidos
+    depth, best_len, reason = 0, None, None
+    check_in = 0           # nós até a próxima checagem de orçamento/progresso
+
+    while depth < max_depth and (q1 or q2) and raw_found < 50:
+        if DEBUG_FS: print(f"\n[DEBUG] Profundidade: {depth}, Fila1: {len(q1)}, Fila2: {len(q2)}, Nós Expandidos: {stats['expanded']}")
+        for q, visited, other, forward in sides:
+            for _ in range(len(q)):
+                if check_in <= 0:
+                    reason = over_budget()
+                    if reason: break
+                    check_in = BUDGET_CHECK_EVERY
+                    now = time.monotonic()
+                    if now - last_progress >= PROGRESS_EVERY:
+                        last_progress = now
+                        yield "progress", progress()
+                check_in -= 1
+                curr_id, path = q.popleft()
+                if DEBUG_FS: print(f"[DEBUG][Lado {1 if forward else 2}] Processando: {curr_id}")
+
+                if curr_id in other:
                     if DEBUG_FS: print(f"[DEBUG][ENCONTRO!] ID {curr_id} achado em ambas as buscas.")
-                    for p1 in visited1[curr_id]:
-                        full_path = p1 + path[::-1][1:]
-                        paths_with_ancestors.append((full_path, curr_id))
+                    for op in other[curr_id]:
+                        if forward: full_path = path.to_list() + op.to_list()[::-1][1:]
+                        else:       full_path = op.to_list() + path.to_list()[::-1][1:]
+                        raw_found += 1
                         L = len(full_path)
                         best_len = L if best_len is None else min(best_len, L)
-
-                _, parents, _, _ = get_person_with_relatives(curr_id, headers)
+                        sig = frozenset(full_path)
+                        if len(sig) == L and sig not in seen_sets:
+                            seen_sets.add(sig); stats["paths_found"] += 1
+                            yield "path", (full_path, curr_id)
+
+                calls = stats["ancestry_calls"] + stats["person_calls"]
+                parents = _parents_for_search(curr_id, headers, prefetch_generations, stats)
+                if couples is not None:
+                    _index_couple(couples, parents)
                 for p_id in parents:
                     if p_id in path: continue
-                    new_path = path + [p_id]
-                    if _add_path_variant(visited2, p_id, new_path):
-                        q2.append((p_id, new_path))
-                        expanded += 1
-                        if expanded >= max_nodes: break
-                if expanded >= max_nodes: break
-            if expanded >= max_nodes: break
-        # >>> FIM DA CORREÇÃO <<<
+                    new_path = path.extend(p_id)
+                    if _add_path_variant(visited, p_id, new_path):
+                        q.append((p_id, new_path))
+                        stats["expanded"] += 1
+                        if stats["expanded"] >= max_nodes: break
+                # Nó que foi à rede (ou bateu o limite de nós) checa logo: o lote só vale para nós em cache.
+                if stats["expanded"] >= max_nodes or stats["ancestry_calls"] + stats["person_calls"] != calls:
+                    check_in = 0
+            if reason: break
+        if reason: break
 
         depth += 1
+        stats["depth"] = depth
+        yield "progress", progress()
         if best_len is not None and depth > best_len + 2:
-            break
+            reason = "converged"; break
+
+    if reason is None:
+        reason = "enough_paths" if raw_found >= 50 else ("max_depth" if depth >= max_depth else "exhausted")
+    stats["reason"] = reason
+    yield "done", progress()
 
-    final_paths = post_process_paths(paths_with_ancestors, headers)
+def find_paths(person1_id, person2_id, headers, max_depth=8, prefetch_generations=None, stats=None, budget=None):
+    """
+    Caminhos consolidados entre duas pessoas (ver iter_paths). Com prefetch_generations > 0
+    usa o modo ancestry (ver _parents_for_search). `stats`, se passado, recebe as contagens
+    de chamadas: lookups (pessoas expandidas = chamadas que o modo clássico faria),
+    ancestry_calls, person_calls, http_calls e calls_saved (sem contar hits de cache).
+    """
+    if stats is None:
+        stats = {}
+    couples = set()  # índice de casais para o pós-processamento (ver _index_couple)
+    paths_with_ancestors = [found for kind, found in iter_paths(
+        person1_id, person2_id, headers, max_depth=max_depth, prefetch_generations=prefetch_generations,
+        budget=budget, stats=stats, couples=couples,
+    ) if kind == "path"]
+    final_paths = post_process_paths(paths_with_ancestors, headers, couples=couples)
     if DEBUG_FS:
-        print(f"[PathFinder] depth={depth} expanded={expanded} best_len={best_len} "
+        print(f"[PathFinder] chamadas: {stats}")
+        print(f"[PathFinder] depth={stats['depth']} expanded={stats['expanded']} reason={stats['reason']} "
               f"paths_raw={len(paths_with_ancestors)} paths_final={len(final_paths)}")
     return final_paths
 
+# -------------------------------------------------------------
+# Modo ancestry (prefetch de várias gerações)
+# -------------------------------------------------------------
+# Cada pessoa da fronteira ainda sem pais conhecidos dispara UM /platform/tree/ancestry
+# de N gerações; todos os elos pai->filho que voltam são semeados num cache de pais
+# compartilhado, e os níveis seguintes da BFS viram hits. 0 = desligado.
+PREFETCH_GENERATIONS = int(os.getenv("PATHFINDER_PREFETCH_GENERATIONS", "0"))
+_parents_cache = get_person_cache("pathfinder-parents", ttl=CACHE_TTL)
+
+def _token_from_headers(headers):
+    auth = headers.get("Authorization", "")
+    return auth.split(" ", 1)[1] if " " in auth else auth
+
+def _parents_for_search(person_id, headers, prefetch_generations, stats):
+    """Pais de uma pessoa durante a BFS, contabilizando as chamadas em `stats`."""
+    stats["lookups"] += 1
+    if prefetch_generations > 0:
+        cached = _parents_cache.get(person_id, _cache_key(person_id, headers))
+        if cached is not None:
+            stats["prefetch_hits"] += 1
+            return cached
+        stats["ancestry_calls"] += 1
+        try:
+            data = load_ancestry(_token_from_headers(headers), person_id, generations=prefetch_generations, details=False)
+            parents_of, _ = ancestry_parents(data, prefetch_generations)
+            # Pessoas vivas na resposta só são visíveis para este token.
+            living = {p["id"] for p in data.get("persons") or [] if p.get("id") and p.get("living")}
+        except (requests.RequestException, ValueError) as e:
+            if DEBUG_FS: print(f"[DEBUG] ancestry falhou para {person_id}: {e}")
+            parents_of, living = {}, set()
+        for pid, parents in parents_of.items():
+            _parents_cache.set(_cache_key(pid, headers) if pid in living else pid, parents)
+        if person_id in parents_of:
+            return parents_of[person_id]
+    stats["person_calls"] += 1
+    _, parents, _, _ = get_person_with_relatives(person_id, headers)
+    return parents
+
 # -------------------------------------------------------------
 # Mermaid (IDs saneados + labels escapados) — caixa única p/ casal AC
 # -------------------------------------------------------------
@@ -547,27 +651,7 @@ def generate_mermaid_graph(path_details):
 
     return "\n".join(lines)
 
-# ---------- Grau de parentesco (PT-BR) ----------
-_ORD_PT = {1: "1º", 2: "2º", 3: "3º", 4: "4º", 5: "5º", 6: "6º", 7: "7º", 8: "8º", 9: "9º", 10: "10º"}
-def _ord_pt(n: int) -> str:
-    return _ORD_PT.get(n, f"{n}º")
-
-def relationship_label(d1: int, d2: int) -> str:
-    if d1 == 0 and d2 > 0:
-        return f"Ascendência direta ({d2} geração{'s' if d2 > 1 else ''})"
-    if d2 == 0 and d1 > 0:
-        return f"Descendência direta ({d1} geração{'s' if d1 > 1 else ''})"
-    if d1 == 1 and d2 == 1:
-        return "Irmãos(ãs)"
-    c = min(d1, d2) - 1
-    r = abs(d1 - d2)
-    if c >= 1:
-        base = f"{_ord_pt(c)} primo"
-        return f"{base}, {r}x removido" if r > 0 else base
-    if r == 1:
-        return "Tio/Tia ↔ Sobrinho(a)"
-    return f"Parentes colaterais ({r}x removido)"
-
+# Grau de parentesco (PT-BR): services/relationship.py
 def ensure_degree_labels_in_paths(paths: list):
     """Garante que cada caminho tenha p['degree_label'] mesmo em snapshots antigos."""
     for p in paths or []:
@@ -608,7 +692,7 @@ def rf_path_unauth(p1: str, p2: str):
     }
     url = f"{API_BASE_URL}/platform/tree/persons/{p1}/relationships/{p2}?personDetails=true"
     try:
-        r = session_http.get(url, headers=headers, verify=False, timeout=DEFAULT_TIMEOUT)
+        r = get_session().get(url, headers=headers, verify=False, timeout=DEFAULT_TIMEOUT)
         if r.status_code != 200:
             return {"ok": False, "reason": "http", "status": r.status_code, "detail": r.text[:200]}
         j = r.json()
@@ -643,6 +727,47 @@ def build_path_details_from_ids(ids, common_id, headers):
         })
     return details
 
+def path_details_from_raw(raw_path, ancestor, headers):
+    """Nós de exibição de um caminho de find_paths/iter_paths (casais viram um nó só)."""
+    path_details = []
+    for raw in raw_path:
+        if isinstance(raw, tuple):
+            a, b = raw
+            an = get_person_name(a, headers) or a
+            bn = get_person_name(b, headers) or b
+            node = {
+                "id": f"{a}+{b}",
+                "name": f"{an} & {bn}",
+                "is_couple": True,
+                "is_common_ancestor": (isinstance(ancestor, tuple) and set(raw) == set(ancestor)),
+            }
+        else:
+            nm = get_person_name(raw, headers) or raw
+            node = {
+                "id": raw,
+                "name": nm,
+                "is_couple": False,
+                "is_common_ancestor": (not isinstance(ancestor, tuple) and raw == ancestor),
+            }
+        path_details.append(node)
+    return path_details
+
+def path_view_model(raw_path, ancestor, headers, person1_id, person2_id):
+    path_details = path_details_from_raw(raw_path, ancestor, headers)
+    ac_idx = next((i for i, n in enumerate(path_details) if n.get("is_common_ancestor")), None)
+    deg_label = None
+    if ac_idx is not None:
+        d1 = ac_idx
+        d2 = (len(path_details) - 1) - ac_idx
+        deg_label = relationship_label(d1, d2)
+    return {
+        "nodes": path_details,
+        "p1_name": path_details[0]["name"] if path_details else person1_id,
+        "p2_name": path_details[-1]["name"] if path_details else person2_id,
+        "mermaid_data": generate_mermaid_graph(path_details),
+        "degree_label": deg_label,
+    }
+
 # -------------------------------------------------------------
 # Flask routes
 # -------------------------------------------------------------
@@ -686,56 +811,18 @@ def search():
         person1_id = (request.form.get("person1_id") or "").strip().upper()
         person2_id = (request.form.get("person2_id") or "").strip().upper()
         max_depth  = int(request.form.get("max_depth") or 8)
+        prefetch   = int(request.form.get("prefetch_generations") or PREFETCH_GENERATIONS)
 
         if not person1_id or not person2_id:
             return render_template("search.html", error="Informe os dois IDs.", max_depth=max_depth)
 
         t0 = time.time()
-        paths = find_paths(person1_id, person2_id, headers, max_depth=max_depth)
+        search_stats = {}
+        paths = find_paths(person1_id, person2_id, headers, max_depth=max_depth, prefetch_generations=prefetch, stats=search_stats)
         elapsed = time.time() - t0
+        print(f"[PathFinder] /search {person1_id}->{person2_id} em {elapsed:.2f}s: {search_stats}")
 
-        paths_vm = []
-        for raw_path, ancestor in paths:
-            path_details = []
-            for raw in raw_path:
-                if isinstance(raw, tuple):
-                    a, b = raw
-                    an = get_person_name(a, headers) or a
-                    bn = get_person_name(b, headers) or b
-                    node = {
-                        "id": f"{a}+{b}",
-                        "name": f"{an} & {bn}",
-                        "is_couple": True,
-                        "is_common_ancestor": (isinstance(ancestor, tuple) and set(raw) == set(ancestor)),
-                    }
-                else:
-                    nm = get_person_name(raw, headers) or raw
-                    node = {
-                        "id": raw,
-                        "name": nm,
-                        "is_couple": False,
-                        "is_common_ancestor": (not isinstance(ancestor, tuple) and raw == ancestor),
-                    }
-                path_details.append(node)
-
-            p1_name = path_details[0]["name"] if path_details else person1_id
-            p2_name = path_details[-1]["name"] if path_details else person2_id
-            mermaid_data = generate_mermaid_graph(path_details)
-
-            ac_idx = next((i for i, n in enumerate(path_details) if n.get("is_common_ancestor")), None)
-            deg_label = None
-            if ac_idx is not None:
-                d1 = ac_idx
-                d2 = (len(path_details) - 1) - ac_idx
-                deg_label = relationship_label(d1, d2)
-
-            paths_vm.append({
-                "nodes": path_details,
-                "p1_name": p1_name,
-                "p2_name": p2_name,
-                "mermaid_data": mermaid_data,
-                "degree_label": deg_label,
-            })
+        paths_vm = [path_view_model(raw_path, ancestor, headers, person1_id, person2_id) for raw_path, ancestor in paths]
 
         if not paths_vm:
             return render_template(
@@ -759,6 +846,87 @@ def search():
     # GET
     return render_template("search.html", max_depth=8)
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.get("/search/stream")
+def search_stream():
+    """
+    Busca "anytime" via Server-Sent Events, para o cliente mostrar caminhos enquanto
+    a busca continua. Ex: /search/stream?p1=K123-ABC&p2=L987-XYZ&d=8&seconds=10
+    Parâmetros opcionais de orçamento (limitados por STREAM_BUDGET): seconds, fs_calls, nodes.
+    Eventos:
+      path      {"path": <view-model>, "stats": {...}}  cada caminho novo (casais ainda separados)
+      progress  {...}                                    contadores da busca
+      done      {"paths": [<view-model>], "stats": {...}}  resultado final consolidado;
+                stats.reason = exhausted|max_depth|enough_paths|converged|budget_*
+    """
+    if "access_token" not in session:
+        return jsonify({"ok": False, "error": "Não autenticado"}), 401
+    headers = get_headers()
+    person1_id = (request.args.get("p1") or "").strip().upper()
+    person2_id = (request.args.get("p2") or "").strip().upper()
+    if not person1_id or not person2_id:
+        return jsonify({"ok": False, "error": "Informe os dois IDs."}), 400
+    max_depth = int(request.args.get("d") or 8)
+    prefetch = int(request.args.get("prefetch_generations") or PREFETCH_GENERATIONS)
+    budget = dict(STREAM_BUDGET)
+    for key, cast in (("seconds", float), ("fs_calls", int), ("nodes", int)):
+        if request.args.get(key):
+            budget[key] = min(cast(request.args[key]), STREAM_BUDGET[key])
+
+    def generate():
+        stats, couples, found = {}, set(), []
+        for kind, data in iter_paths(person1_id, person2_id, headers, max_depth=max_depth,
+                                     prefetch_generations=prefetch, budget=budget, stats=stats, couples=couples):
+            if kind == "path":
+                found.append(data)
+                yield _sse("path", {"path": path_view_model(*data, headers, person1_id, person2_id), "stats": dict(stats)})
+            elif kind == "progress":
+                yield _sse("progress", data)
+            else:
+                final = post_process_paths(found, headers, couples=couples)
+                print(f"[PathFinder] /search/stream {person1_id}->{person2_id}: {data}")
+                yield _sse("done", {"paths": [path_view_model(p, a, headers, person1_id, person2_id) for p, a in final], "stats": data})
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _job_owner():
+    return f"pf:{token_scope(session.get('access_token'))}"
+
+@app.post("/search/jobs")
+def search_job_submit():
+    """
+    Busca em segundo plano (fila de jobs + `python -m apps.api.src.worker`): devolve 202
+    com o job; acompanhe em GET /search/jobs/<id>. Mesmos campos do /search (form ou JSON).
+    Pedidos iguais da mesma sessão reaproveitam o job em andamento.
+    """
+    if "access_token" not in session:
+        return jsonify({"ok": False, "error": "Não autenticado"}), 401
+    form = request.get_json(silent=True) or request.form
+    person1_id = (form.get("person1_id") or "").strip().upper()
+    person2_id = (form.get("person2_id") or "").strip().upper()
+    if not person1_id or not person2_id:
+        return jsonify({"ok": False, "error": "Informe os dois IDs."}), 400
+    params = {"person1_id": person1_id, "person2_id": person2_id, "max_depth": int(form.get("max_depth") or 8),
+              "prefetch_generations": int(form.get("prefetch_generations") or PREFETCH_GENERATIONS)}
+    job, created = job_queue.submit("path_search", params, owner=_job_owner(), token=session["access_token"]); dispatch(job)
+    return jsonify({"ok": True, "job": job, "deduplicated": not created}), 202
+
+@app.route("/search/jobs/<job_id>", methods=["GET", "DELETE"])
+def search_job(job_id):
+    """GET: status e, quando terminar, o resultado ({"paths": [<view-model>], "stats": ...}). DELETE: cancela."""
+    if "access_token" not in session:
+        return jsonify({"ok": False, "error": "Não autenticado"}), 401
+    if job_queue.owner_of(job_id) != _job_owner():
+        return jsonify({"ok": False, "error": "Job não encontrado."}), 404
+    if request.method == "DELETE":
+        return jsonify({"ok": True, "job": job_queue.cancel(job_id)})
+    job = job_queue.get(job_id)
+    payload, _ = job_queue.result(job_id)
+    return jsonify({"ok": job["status"] == "done", "job": job, "result": payload}), (202 if job["status"] in ("queued", "running") else 200)
+
 # ----- Link público leve (sem login) -----
 @app.get("/view")
 def view_public():
@@ -805,32 +973,11 @@ def view_public():
             "User-Agent": "PathFinder/2.0",
         }
         try:
-            paths = find_paths(p1, p2, headers, max_depth=d)
+            # Com orçamento: a página pública não fica presa numa busca profunda.
+            paths = find_paths(p1, p2, headers, max_depth=d, budget=STREAM_BUDGET)
             if paths:
                 raw_path, ancestor = paths[0]
-                # monta details como no /search
-                path_details = []
-                for raw in raw_path:
-                    if isinstance(raw, tuple):
-                        a, b = raw
-                        an = get_person_name(a, headers) or a
-                        bn = get_person_name(b, headers) or b
-                        node = {
-                            "id": f"{a}+{b}",
-                            "name": f"{an} & {bn}",
-                            "is_couple": True,
-                            "is_common_ancestor": (isinstance(ancestor, tuple) and set(raw) == set(ancestor)),
-                        }
-                    else:
-                        nm = get_person_name(raw, headers) or raw
-                        node = {
-                            "id": raw,
-                            "name": nm,
-                            "is_couple": False,
-                            "is_common_ancestor": (not isinstance(ancestor, tuple) and raw == ancestor),
-                        }
-                    path_details.append(node)
-
+                path_details = path_details_from_raw(raw_path, ancestor, headers)
                 mermaid_data = generate_mermaid_graph(path_details)
                 data = {
                     "person1_id": p1,
@@ -0,0 +1,65 @@
+# apps/api/src/services/relationship.py
+"""Grau de parentesco (PT-BR) a partir das distâncias de cada pessoa até o ancestral comum."""
+from __future__ import annotations
+from collections import defaultdict, deque
+from typing import Any, Dict, Iterable, List, Tuple
+
+# ---------- Grau de parentesco (PT-BR) ----------
+_ORD_PT = {1: "1º", 2: "2º", 3: "3º", 4: "4º", 5: "5º", 6: "6º", 7: "7º", 8: "8º", 9: "9º", 10: "10º"}
+def _ord_pt(n: int) -> str:
+    return _ORD_PT.get(n, f"{n}º")
+
+def relationship_label(d1: int, d2: int) -> str:
+    if d1 == 0 and d2 > 0:
+        return f"Ascendência direta ({d2} geração{'s' if d2 > 1 else ''})"
+    if d2 == 0 and d1 > 0:
+        return f"Descendência direta ({d1} geração{'s' if d1 > 1 else ''})"
+    if d1 == 1 and d2 == 1:
+        return "Irmãos(ãs)"
+    c = min(d1, d2) - 1
+    r = abs(d1 - d2)
+    if c >= 1:
+        base = f"{_ord_pt(c)} primo"
+        return f"{base}, {r}x removido" if r > 0 else base
+    if r == 1:
+        return "Tio/Tia ↔ Sobrinho(a)"
+    return f"Parentes colaterais ({r}x removido)"
+
+def label_relatives(viewer_id: str, parent_edges: Iterable[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Grau de parentesco de cada pessoa alcançável em relação a `viewer_id`, em O(nós + arestas).
+
+    1. Sobe do viewer pelos pais: cada ancestral `a` recebe d1 = gerações até o viewer.
+    2. Desce a partir de TODOS os ancestrais de uma vez (multi-fonte). Cada fonte parte
+       com custo d1, cada aresta pai->filho custa 1, e uma fila por baldes de distância
+       fixa cada pessoa no menor d1 + d2 (o ancestral comum mais próximo).
+
+    `parent_edges` são pares (pai, filho). Retorna {pid: {"label", "d1", "d2", "ancestor"}}.
+    """
+    parents_of: Dict[str, List[str]] = defaultdict(list); children_of: Dict[str, List[str]] = defaultdict(list)
+    for parent_id, child_id in parent_edges:
+        parents_of[child_id].append(parent_id); children_of[parent_id].append(child_id)
+
+    up = {viewer_id: 0}; q = deque([viewer_id])
+    while q:
+        cur = q.popleft()
+        for parent_id in parents_of.get(cur, ()):
+            if parent_id not in up:
+                up[parent_id] = up[cur] + 1; q.append(parent_id)
+
+    buckets: Dict[int, List[Tuple[str, str, int]]] = defaultdict(list)  # total -> [(pessoa, ancestral, d1)]
+    for anc, d1 in up.items():
+        buckets[d1].append((anc, anc, d1))
+    settled: Dict[str, Dict[str, Any]] = {}
+    total, last = 0, max(buckets) if buckets else -1
+    while total <= last:
+        for pid, anc, d1 in buckets.pop(total, ()):
+            if pid in settled:
+                continue
+            d2 = total - d1
+            settled[pid] = {"label": relationship_label(d1, d2) if (d1 or d2) else "Você", "d1": d1, "d2": d2, "ancestor": anc}
+            for child_id in children_of.get(pid, ()):
+                if child_id not in settled:
+                    buckets[total + 1].append((child_id, anc, d1)); last = max(last, total + 1)
+        total += 1
+    return settled
@@ -0,0 +1,168 @@
+# apps/api/src/services/snapshot_payload.py
+"""
+Payload materializado do GET /snapshot/<slug>.
+
+Os `elements` do Cytoscape (nós e arestas) só mudam quando um clone ou expand do
+snapshot faz commit; até lá, remontá-los a cada GET (quatro consultas, uniões de
+conjuntos e jsonify de milhares de nós) é trabalho repetido. Aqui eles são
+serializados e comprimidos uma vez (deflate cru) e gravados em snapshot_payloads,
+com um hash do conteúdo como versão. Cada processo guarda os últimos em memória;
+uma leitura quente é uma consulta da versão.
+
+O que depende de quem vê (kinship_path, isAdmin, rótulos de parentesco) vai na
+frente dos elements, comprimido na hora. O deflate guardado termina em sync flush
+(bloco não final, alinhado em byte), então a resposta gzip é:
+    cabeçalho + deflate(cabeça) + deflate guardado + deflate(cauda, final) + crc32 + tamanho
+sem descomprimir nada; o crc32 do todo sai de crc32_combine.
+
+Layout do JSON guardado: '{"edges":[...],"nodes":[...' sem fechar a lista de nós,
+para a cauda poder acrescentar nós do caminho de parentesco que não estão no snapshot.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import or_
+
+from ..infra.db.models import Relation, Snapshot, SnapshotNode, SnapshotPayload
+
+SNAPSHOT_PAYLOAD_LEVEL = int(os.getenv("SNAPSHOT_PAYLOAD_LEVEL", "6"))
+SNAPSHOT_PAYLOAD_MEMORY_ITEMS = int(os.getenv("SNAPSHOT_PAYLOAD_MEMORY_ITEMS", "16"))
+INVALIDATE_CHUNK = 500  # ids por IN em invalidate_touching (como BULK_CHUNK do snapshot_persist)
+
+_GZIP_HEADER = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff"  # deflate, sem mtime, SO desconhecido
+
+class Payload(NamedTuple):
+    snapshot_id: int
+    version: str
+    deflated: bytes
+    crc32: int
+    size: int
+    node_ids: FrozenSet[str]
+
+    def elements(self) -> Dict[str, List]:
+        """Só para quem precisa dos dados (rótulos de parentesco sem cache); a leitura normal não descomprime."""
+        return json.loads(zlib.decompressobj(-15).decompress(self.deflated) + b"]}")
+
+_memory: "OrderedDict[int, Payload]" = OrderedDict()
+_memory_lock = threading.Lock()
+
+def _remember(payload: Payload) -> Payload:
+    with _memory_lock:
+        _memory[payload.snapshot_id] = payload; _memory.move_to_end(payload.snapshot_id)
+        while len(_memory) > SNAPSHOT_PAYLOAD_MEMORY_ITEMS: _memory.popitem(last=False)
+    return payload
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _deflate(data: bytes, final: bool) -> bytes:
+    co = zlib.compressobj(SNAPSHOT_PAYLOAD_LEVEL, zlib.DEFLATED, -15)
+    return co.compress(data) + co.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+def build(snapshot_id: int, nodes: List[Dict], edges: List[Dict]) -> Payload:
+    """Serializa e comprime os elements (sem gravar)."""
+    raw = (b'{"edges":[' + b",".join(_dumps({"data": e}) for e in edges) + b'],"nodes":['
+           + b",".join(_dumps({"data": n}) for n in nodes))
+    return Payload(snapshot_id, hashlib.sha256(raw).hexdigest()[:32], _deflate(raw, final=False),
+                   zlib.crc32(raw), len(raw), frozenset(n["id"] for n in nodes))
+
+def store(db, payload: Payload) -> Payload:
+    """Grava (ou troca) o payload do snapshot na transação de `db`; vale para os outros processos após o commit."""
+    row = db.get(SnapshotPayload, payload.snapshot_id) or SnapshotPayload(snapshot_id=payload.snapshot_id)
+    row.version, row.elements_deflate, row.elements_crc32, row.elements_size = payload.version, payload.deflated, payload.crc32, payload.size
+    row.node_ids = ",".join(sorted(payload.node_ids))
+    db.add(row)
+    return _remember(payload)
+
+def load(db, snapshot_id: int) -> Optional[Payload]:
+    """Payload atual do snapshot: confere a versão no banco e só lê os bytes se a memória estiver velha."""
+    version = db.query(SnapshotPayload.version).filter(SnapshotPayload.snapshot_id == snapshot_id).scalar()
+    if version is None: return None
+    with _memory_lock:
+        cached = _memory.get(snapshot_id)
+        if cached is not None and cached.version == version:
+            _memory.move_to_end(snapshot_id); return cached
+    row = db.get(SnapshotPayload, snapshot_id)
+    if row is None: return None
+    return _remember(Payload(snapshot_id, row.version, bytes(row.elements_deflate), row.elements_crc32, row.elements_size,
+                             frozenset(row.node_ids.split(",")) if row.node_ids else frozenset()))
+
+def invalidate_touching(db, person_ids: Iterable[str], except_snapshot_id: Optional[int] = None) -> Set[int]:
+    """
+    Apaga os payloads dos snapshots que mostram alguma das pessoas e devolve as famílias
+    deles. Pessoas e relações são globais: um clone, expand ou convite que altera pessoas
+    ou grava relações novas (passe as pontas) pode mudar o grafo de outros snapshots.
+    Um snapshot mostra seus nós e as pontas das relações globais que os tocam, então
+    procura pelos nós e pelos vizinhos diretos das pessoas: um IN em relations e um em
+    snapshot_nodes.person_id (ix_snapshot_nodes_person) por lote.
+    """
+    ids = sorted(set(person_ids))
+    if not ids: return set()
+    shown = set(ids)
+    for i in range(0, len(ids), INVALIDATE_CHUNK):
+        chunk = ids[i:i + INVALIDATE_CHUNK]
+        for src, dst in db.query(Relation.src_id, Relation.dst_id).filter(or_(Relation.src_id.in_(chunk), Relation.dst_id.in_(chunk))):
+            shown.add(src); shown.add(dst)
+    shown, affected = sorted(shown), {}
+    for i in range(0, len(shown), INVALIDATE_CHUNK):
+        chunk = shown[i:i + INVALIDATE_CHUNK]
+        affected.update(db.query(SnapshotNode.snapshot_id, Snapshot.family_id).join(Snapshot, Snapshot.id == SnapshotNode.snapshot_id)
+                        .filter(SnapshotNode.person_id.in_(chunk)).distinct().all())
+    affected.pop(except_snapshot_id, None)
+    if affected:
+        db.query(SnapshotPayload).filter(SnapshotPayload.snapshot_id.in_(list(affected))).delete(synchronize_session=False)
+    return set(affected.values())
+
+# crc32_combine do zlib (não exposto pelo módulo zlib do Python): crc32(a + b) a partir
+# de crc32(a), crc32(b) e len(b), em O(log len(b)), sem os bytes de b.
+def _gf2_times(mat: List[int], vec: int) -> int:
+    total, i = 0, 0
+    while vec:
+        if vec & 1: total ^= mat[i]
+        vec >>= 1; i += 1
+    return total
+
+def _gf2_square(mat: List[int]) -> List[int]:
+    return [_gf2_times(mat, mat[n]) for n in range(32)]
+
+def crc32_combine(crc1: int, crc2: int, len2: int) -> int:
+    if len2 <= 0: return crc1
+    odd = [0xEDB88320] + [1 << n for n in range(31)]  # operador de um bit zero
+    even = _gf2_square(odd); odd = _gf2_square(even)
+    while True:
+        even = _gf2_square(odd)
+        if len2 & 1: crc1 = _gf2_times(even, crc1)
+        len2 >>= 1
+        if not len2: break
+        odd = _gf2_square(even)
+        if len2 & 1: crc1 = _gf2_times(odd, crc1)
+        len2 >>= 1
+        if not len2: break
+    return crc1 ^ crc2
+
+def _parts(payload: Payload, head: Dict[str, Any], extra_nodes: List[Dict]) -> Tuple[bytes, bytes]:
+    prefix = _dumps(head)[:-1] + b',"elements":'
+    extra = b",".join(_dumps({"data": n}) for n in extra_nodes)
+    suffix = (b"," if extra and payload.node_ids else b"") + extra + b"]}}"
+    return prefix, suffix
+
+def render(payload: Payload, head: Dict[str, Any], extra_nodes: List[Dict] | None = None, gzip: bool = True) -> bytes:
+    """
+    Corpo JSON {**head, "elements": {...}} com os nós extra no fim da lista de nós.
+    gzip=True devolve o corpo já comprimido (Content-Encoding: gzip).
+    """
+    prefix, suffix = _parts(payload, head, extra_nodes or [])
+    if not gzip:
+        return prefix + zlib.decompressobj(-15).decompress(payload.deflated) + suffix
+    crc = crc32_combine(zlib.crc32(prefix), payload.crc32, payload.size)
+    crc = zlib.crc32(suffix, crc)
+    size = len(prefix) + payload.size + len(suffix)
+    return (_GZIP_HEADER + _deflate(prefix, final=False) + payload.deflated + _deflate(suffix, final=True)
+            + struct.pack("<II", crc & 0xFFFFFFFF, size & 0xFFFFFFFF))
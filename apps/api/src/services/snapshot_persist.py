@@ -0,0 +1,181 @@
+# apps/api/src/services/snapshot_persist.py
+"""
+Gravação em lote do grafo de um snapshot (pessoas, relações, nós e arestas do snapshot).
+
+O caminho antigo fazia, por pessoa, um db.get + UPDATE/INSERT e, por aresta, um SELECT
++ flush em relations e um INSERT em snapshot_edges: mais de 15 mil comandos para uma
+árvore de 5 mil pessoas. Aqui:
+  - pessoas e relações já gravadas são lidas com poucos `IN` (lotes de BULK_CHUNK);
+  - só pessoas novas ou alteradas são escritas, com INSERT ... ON CONFLICT DO UPDATE
+    (created_at e extra das existentes ficam intactos);
+  - relações novas, nós e arestas do snapshot vão em INSERT ... ON CONFLICT DO NOTHING.
+Cada escrita é um único comando com a lista de linhas (executemany): o SQL é compilado
+uma vez e fica em cache (montar um VALUES de 500 linhas custava mais que gravá-lo); no
+PostgreSQL o SQLAlchemy 2 agrupa as linhas em INSERTs de várias linhas (insertmanyvalues).
+Funciona em SQLite e PostgreSQL (os dois aceitam ON CONFLICT). COPY no PostgreSQL não
+é usado: não trata conflitos sem tabela temporária.
+
+refresh_snapshot_graph é o re-clone de um slug existente: compara o crawl novo com os
+nós/arestas gravados e só apaga/insere a diferença, mantendo o id do snapshot.
+record_fetches/load_fresh_fetches guardam quando cada pessoa foi lida no FamilySearch,
+para o refresh não buscar de novo quem ainda está fresco.
+"""
+from __future__ import annotations
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from ..infra.db.models import Person, PersonFetch, Relation, SnapshotEdge, SnapshotNode
+
+# Ids por consulta IN: bem abaixo dos limites de parâmetros do SQLite (32766 desde 3.32) e do PostgreSQL.
+BULK_CHUNK = int(os.getenv("SNAPSHOT_BULK_CHUNK", "500"))
+
+_PERSON_FIELDS = ("name", "gender", "birth", "birth_place", "death", "death_place")
+
+EdgeKey = Tuple[str, str, str]  # (tipo, src, dst); couple com (src, dst) ordenados
+
+def _insert(db):
+    return sqlite_insert if str(db.bind.dialect.name) == "sqlite" else pg_insert
+
+def _chunks(items: List, size: int = BULK_CHUNK) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def person_row(p_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Nó no formato de _format_node -> colunas de persons."""
+    birth, death = p_data.get("birth") or {}, p_data.get("death") or {}
+    return {"id": p_data["id"], "name": p_data.get("name"), "gender": p_data.get("gender"),
+            "birth": birth.get("date"), "birth_place": birth.get("place"),
+            "death": death.get("date"), "death_place": death.get("place")}
+
+def edge_key(e_data: Dict[str, Any]) -> Optional[EdgeKey]:
+    typ = e_data.get("type"); src = e_data.get("from") or e_data.get("a"); dst = e_data.get("to") or e_data.get("b")
+    if not all([typ, src, dst]): return None
+    if typ == "couple": src, dst = tuple(sorted((src, dst)))
+    return typ, src, dst
+
+def upsert_persons(db, nodes: List[Dict[str, Any]], touched: Optional[Set[str]] = None) -> Tuple[int, int]:
+    """Grava só as pessoas novas ou alteradas. Devolve (novas, atualizadas); `touched` recebe as atualizadas."""
+    rows = {row["id"]: row for row in map(person_row, nodes)}
+    existing: Dict[str, Tuple] = {}
+    for chunk in _chunks(list(rows)):
+        for r in db.query(Person.id, *(getattr(Person, f) for f in _PERSON_FIELDS)).filter(Person.id.in_(chunk)):
+            existing[r[0]] = tuple(r[1:])
+    changed = [row for pid, row in rows.items() if existing.get(pid) != tuple(row[f] for f in _PERSON_FIELDS)]
+    if changed:
+        now = datetime.utcnow(); stmt = _insert(db)(Person.__table__)
+        stmt = stmt.on_conflict_do_update(index_elements=["id"], set_={f: stmt.excluded[f] for f in (*_PERSON_FIELDS, "updated_at")})
+        db.execute(stmt, [{**row, "created_at": now, "updated_at": now} for row in changed])
+    inserted = sum(1 for row in changed if row["id"] not in existing)
+    if touched is not None: touched.update(row["id"] for row in changed if row["id"] in existing)
+    return inserted, len(changed) - inserted
+
+def ensure_relations(db, keys: Iterable[EdgeKey], touched: Optional[Set[str]] = None) -> int:
+    """Cria em relations as arestas que faltam. Devolve quantas eram novas; `touched` recebe as pontas delas."""
+    keys = set(keys)
+    existing = set()
+    # Um IN por tipo e lote de origens: usa o índice único (type, src_id, dst_id).
+    for typ in {k[0] for k in keys}:
+        srcs = sorted({k[1] for k in keys if k[0] == typ})
+        for chunk in _chunks(srcs):
+            existing.update(db.query(Relation.rel_type, Relation.src_id, Relation.dst_id)
+                            .filter(Relation.rel_type == typ, Relation.src_id.in_(chunk)).all())
+    missing = sorted(keys - existing)
+    if missing:
+        db.execute(_insert(db)(Relation.__table__).on_conflict_do_nothing(index_elements=["type", "src_id", "dst_id"]),
+                   [{"type": t, "src_id": s, "dst_id": d} for t, s, d in missing])
+    if touched is not None: touched.update(pid for _, src, dst in missing for pid in (src, dst))
+    return len(missing)
+
+def insert_snapshot_graph(db, snap_id: int, person_ids: Iterable[str], keys: Iterable[EdgeKey]):
+    insert = _insert(db)
+    node_rows = [{"snapshot_id": snap_id, "person_id": pid} for pid in dict.fromkeys(person_ids)]
+    edge_rows = [{"snapshot_id": snap_id, "type": t, "src_id": s, "dst_id": d} for t, s, d in dict.fromkeys(keys)]
+    if node_rows:
+        db.execute(insert(SnapshotNode.__table__).on_conflict_do_nothing(index_elements=["snapshot_id", "person_id"]), node_rows)
+    if edge_rows:
+        db.execute(insert(SnapshotEdge.__table__).on_conflict_do_nothing(index_elements=["snapshot_id", "type", "src_id", "dst_id"]), edge_rows)
+
+def save_snapshot_graph(db, snap_id: int, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]],
+                        touched: Optional[Set[str]] = None) -> Dict[str, Any]:
+    """
+    Pessoas + relações + nós/arestas do snapshot `snap_id`, na transação de `db` (sem commit).
+    touched, se passado, recebe os ids das pessoas alteradas e das pontas de relações novas
+    (o que pode mudar outros snapshots; ver snapshot_payload.invalidate_touching).
+    """
+    t0 = time.perf_counter()
+    keys = [k for k in map(edge_key, edges) if k]
+    inserted, updated = upsert_persons(db, nodes, touched)
+    new_relations = ensure_relations(db, keys, touched)
+    insert_snapshot_graph(db, snap_id, (n["id"] for n in nodes), keys)
+    return {"persons": len(nodes), "persons_inserted": inserted, "persons_updated": updated,
+            "edges": len(keys), "relations_inserted": new_relations, "seconds": round(time.perf_counter() - t0, 3)}
+
+def refresh_snapshot_graph(db, snap_id: int, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]],
+                           touched: Optional[Set[str]] = None, added: Optional[Dict[str, list]] = None) -> Dict[str, Any]:
+    """
+    Como save_snapshot_graph, para um snapshot que já tem nós e arestas: grava só o que
+    entrou, apaga o que saiu e atualiza as pessoas alteradas. Devolve também o tamanho da diferença.
+    added, se passado, recebe {"nodes": [pid], "edges": [(tipo, src, dst)]} do que entrou
+    (atualização incremental do fecho de ancestrais).
+    """
+    t0 = time.perf_counter()
+    keys = list(dict.fromkeys(k for k in map(edge_key, edges) if k))
+    person_ids = list(dict.fromkeys(n["id"] for n in nodes))
+    inserted, updated = upsert_persons(db, nodes, touched)
+    new_relations = ensure_relations(db, keys, touched)
+
+    stored_nodes = {pid for (pid,) in db.query(SnapshotNode.person_id).filter(SnapshotNode.snapshot_id == snap_id)}
+    stored_edges = {(t, src, dst): eid for eid, t, src, dst in db.query(
+        SnapshotEdge.id, SnapshotEdge.type, SnapshotEdge.src_id, SnapshotEdge.dst_id).filter(SnapshotEdge.snapshot_id == snap_id)}
+    wanted_nodes, wanted_edges = set(person_ids), set(keys)
+    removed_nodes = sorted(stored_nodes - wanted_nodes)
+    removed_edges = sorted(eid for key, eid in stored_edges.items() if key not in wanted_edges)
+    for chunk in _chunks(removed_nodes):
+        db.query(SnapshotNode).filter(SnapshotNode.snapshot_id == snap_id, SnapshotNode.person_id.in_(chunk)).delete(synchronize_session=False)
+    for chunk in _chunks(removed_edges):
+        db.query(SnapshotEdge).filter(SnapshotEdge.id.in_(chunk)).delete(synchronize_session=False)
+    added_nodes = [pid for pid in person_ids if pid not in stored_nodes]
+    added_edges = [k for k in keys if k not in stored_edges]
+    insert_snapshot_graph(db, snap_id, added_nodes, added_edges)
+    if added is not None:
+        added.update(nodes=added_nodes, edges=added_edges)
+    return {"persons": len(nodes), "persons_inserted": inserted, "persons_updated": updated,
+            "edges": len(keys), "relations_inserted": new_relations,
+            "nodes_added": len(added_nodes), "nodes_removed": len(removed_nodes),
+            "edges_added": len(added_edges), "edges_removed": len(removed_edges),
+            "seconds": round(time.perf_counter() - t0, 3)}
+
+def record_fetches(db, known: Dict[str, Dict[str, Any]]) -> int:
+    """Grava em person_fetches as pessoas lidas agora no FamilySearch (entradas do `known` do crawl que não vieram de load_fresh_fetches)."""
+    now = datetime.utcnow()
+    rows = [{"person_id": pid, "fetched_at": now, "living": bool(entry["details"].get("living")), "complete": bool(entry["complete"]),
+             "relatives_json": json.dumps({"spouses": entry["spouses"], "children": entry["children"]})}
+            for pid, entry in known.items() if entry.get("details") and not entry.get("fresh")]
+    if rows:
+        stmt = _insert(db)(PersonFetch.__table__)
+        stmt = stmt.on_conflict_do_update(index_elements=["person_id"], set_={f: stmt.excluded[f] for f in ("fetched_at", "living", "complete", "relatives_json")})
+        db.execute(stmt, rows)
+    return len(rows)
+
+def load_fresh_fetches(db, person_ids: Iterable[str], max_age_seconds: float) -> Dict[str, Dict[str, Any]]:
+    """
+    Entradas no formato do `known` do crawl (details no formato do FamilySearch, spouses,
+    children, complete) para as pessoas lidas há menos de `max_age_seconds`, marcadas "fresh".
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+    known: Dict[str, Dict[str, Any]] = {}
+    for chunk in _chunks(sorted(set(person_ids))):
+        for f, p in (db.query(PersonFetch, Person).join(Person, Person.id == PersonFetch.person_id)
+                     .filter(PersonFetch.person_id.in_(chunk), PersonFetch.fetched_at >= cutoff)):
+            relatives = json.loads(f.relatives_json)
+            details = {"id": p.id, "living": f.living, "gender": {"type": p.gender or ""},
+                       "display": {"name": p.name, "birthDate": p.birth, "birthPlace": p.birth_place, "deathDate": p.death, "deathPlace": p.death_place}}
+            known[p.id] = {"details": details, "spouses": relatives["spouses"], "children": relatives["children"],
+                           "complete": f.complete, "fresh": True}
+    return known
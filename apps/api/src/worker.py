@@ -0,0 +1,130 @@
+# apps/api/src/worker.py
+"""
+Worker dos jobs assíncronos (infra/jobs/job_queue).
+
+Uso (na raiz do repositório, com o mesmo ambiente do app web):
+    python -m apps.api.src.worker [--processes 2] [--once]
+
+Cada job roda num processo filho: um crawl travado ou que estoure memória não
+derruba o worker, e cancelar é só terminar o filho. O pai só mexe no SQLite da
+fila: pega jobs, dá heartbeat, atende cancelamentos e devolve à fila jobs de
+workers que morreram (sem heartbeat há JOBS_STALE_SECONDS).
+
+JOBS_RUNNER decide quem roda o job enfileirado pelo app web:
+  - auto (padrão): deixa na fila se algum worker deu sinal há menos de
+    JOBS_STALE_SECONDS; senão roda no próprio processo web, numa thread. Um deploy
+    só com `flask run` continua funcionando (login por convite, clones async).
+  - worker: sempre deixa na fila (exige o serviço worker; ver deploy/docker-compose.yml).
+  - thread: sempre roda no processo web.
+Na thread não há cancelamento de job em execução; o heartbeat continua (um worker
+iniciado depois não devolve à fila um job que a thread ainda está rodando).
+"""
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+
+from .infra.jobs import job_queue
+
+JOBS_WORKER_PROCESSES = int(os.getenv("JOBS_WORKER_PROCESSES", "2"))
+JOBS_POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "1.0"))
+JOBS_RUNNER = os.getenv("JOBS_RUNNER", "auto").lower()  # auto | worker | thread
+HOUSEKEEPING_EVERY = 60  # s entre requeue_stale/purge
+THREAD_HEARTBEAT_SECONDS = max(1.0, job_queue.JOBS_STALE_SECONDS / 4)  # heartbeat dos jobs rodando em thread
+
+def _run_job(job_id: str):
+    """Processo filho: executa o handler e grava o resultado na fila."""
+    from .services.job_handlers import JOB_HANDLERS
+    job = job_queue.get(job_id, raw=True)
+    handler = JOB_HANDLERS.get(job["kind"])
+    if handler is None:
+        job_queue.fail(job_id, f"tipo de job desconhecido: {job['kind']}"); return
+    try:
+        payload, status = handler(json.loads(job["params_json"]), job["token"])
+        job_queue.finish(job_id, payload, status)
+    except Exception as e:
+        traceback.print_exc()
+        job_queue.fail(job_id, f"{type(e).__name__}: {e}")
+
+def _run_job_in_thread(job_id: str):
+    """_run_job com heartbeat, como o worker faz para os processos filhos."""
+    done = threading.Event()
+    def beat():
+        while not done.wait(THREAD_HEARTBEAT_SECONDS): job_queue.heartbeat(job_id)
+    threading.Thread(target=beat, name=f"job-beat-{job_id[:8]}", daemon=True).start()
+    try:
+        _run_job(job_id)
+    finally:
+        done.set()
+
+def dispatch(job: dict):
+    """Chamado por quem enfileira: sem worker vivo (auto) ou com JOBS_RUNNER=thread, roda o job aqui mesmo numa thread."""
+    if job["status"] != "queued" or JOBS_RUNNER == "worker":
+        return
+    if JOBS_RUNNER == "auto" and job_queue.worker_alive():
+        return
+    if job_queue.claim(os.getpid(), job_id=job["id"]) is not None:
+        threading.Thread(target=_run_job_in_thread, args=(job["id"],), name=f"job-{job['kind']}-{job['id'][:8]}", daemon=True).start()
+
+def run(processes: int = JOBS_WORKER_PROCESSES, once: bool = False):
+    running: dict[str, multiprocessing.Process] = {}
+    print(f"[jobs] worker {os.getpid()} com {processes} processos, fila em {job_queue.JOBS_DB_PATH}")
+    try:
+        _loop(running, processes, once)
+    finally:
+        # Ctrl+C/SIGTERM: os filhos morrem junto (daemon); os jobs voltam para a fila.
+        for job_id, proc in running.items():
+            proc.terminate(); job_queue.release(job_id)
+        job_queue.worker_gone(os.getpid())
+
+def _loop(running: dict, processes: int, once: bool):
+    last_housekeeping = 0.0
+    while True:
+        job_queue.worker_beat(os.getpid())
+        if time.time() - last_housekeeping >= HOUSEKEEPING_EVERY:
+            requeued, purged = job_queue.requeue_stale(), job_queue.purge(); last_housekeeping = time.time()
+            if requeued or purged: print(f"[jobs] devolvidos à fila: {requeued}, removidos: {purged}")
+
+        # Acompanha os filhos: heartbeat, cancelamento e término.
+        for job_id, proc in list(running.items()):
+            if not proc.is_alive():
+                proc.join()
+                # O filho grava o resultado; se saiu sem gravar (crash, OOM), o job falha aqui.
+                job_queue.fail(job_id, f"processo do job terminou sem resultado (exit {proc.exitcode})")
+                del running[job_id]
+                print(f"[jobs] {job_id} terminou (exit {proc.exitcode})")
+            elif job_queue.cancel_requested(job_id):
+                proc.terminate(); proc.join(5)
+                job_queue.mark_cancelled(job_id)
+                del running[job_id]
+                print(f"[jobs] {job_id} cancelado")
+            else:
+                job_queue.heartbeat(job_id)
+
+        while len(running) < processes:
+            job = job_queue.claim(os.getpid())
+            if job is None: break
+            proc = multiprocessing.Process(target=_run_job, args=(job["id"],), name=f"job-{job['kind']}-{job['id'][:8]}", daemon=True)
+            proc.start(); running[job["id"]] = proc
+            print(f"[jobs] {job['id']} ({job['kind']}) iniciado no pid {proc.pid}")
+
+        if once and not running:
+            return
+        time.sleep(JOBS_POLL_SECONDS)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--processes", type=int, default=JOBS_WORKER_PROCESSES, help="jobs simultâneos")
+    ap.add_argument("--once", action="store_true", help="sai quando a fila esvaziar")
+    args = ap.parse_args()
+    try:
+        run(args.processes, args.once)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Chamadas ao FamilySearch no crawl de descendentes do /snapshot/clone, sem rede.
+
+Compara o modo por pessoa (uma leitura de pessoa + parentes para cada nó) com o modo
+bulk (/platform/tree/descendancy, 2 gerações por chamada) em _build_tree_iteratively,
+numa árvore sintética: casal raiz, cada pessoa casada e com `--children` filhos, até
+muito além de `--depth` (os filhos da última geração são nós de borda, só com detalhes).
+A resposta da descendência é montada com os descendancyNumber do FamilySearch
+("1", "1-S1", "1-S1.2", ...) e interpretada pelo parse_descendancy de verdade.
+Também confere que os dois modos devolvem os mesmos nós e arestas, e conta as
+chamadas de um refresh bulk com tudo ainda fresco (`known` do crawl anterior: deve ser 0).
+
+Uso (na raiz do repositório):
+    python scripts/bench_clone_bulk.py [--depth 4] [--children 2 3 4]
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_clone_bulk.db')}")
+
+from apps.api.src.api import routes_snapshot as rs  # noqa: E402
+from apps.api.src.infra.familysearch.fs_tree import parse_descendancy  # noqa: E402
+
+
+class SyntheticFamily:
+    """
+    Descendência infinita e determinística: "P<caminho>" é a pessoa de sangue, "W<caminho>"
+    o cônjuge, e os filhos do casal são "P<caminho>.<k>". Conta as chamadas de cada tipo.
+    """
+    def __init__(self, children: int):
+        self.children = children
+        self.calls = {"person": 0, "descendancy": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, kind: str):
+        with self._lock: self.calls[kind] += 1
+
+    def relatives(self, pid: str):
+        path = pid[1:]
+        spouse = ("W" if pid[0] == "P" else "P") + path
+        return spouse, [f"P{path}.{k}" for k in range(self.children)]
+
+    @staticmethod
+    def details(pid: str, number: str | None = None):
+        display = {"name": f"Pessoa {pid}", "gender": "Male" if pid[0] == "P" else "Female", "birthDate": "1900"}
+        if number: display["descendancyNumber"] = number
+        return {"id": pid, "living": False, "display": display}
+
+    def person_with_relatives(self, token: str, pid: str):
+        self._count("person")
+        spouse, children = self.relatives(pid)
+        parents = [] if pid[1:] in ("0", "") or "." not in pid else ["P" + pid[1:].rsplit(".", 1)[0]]
+        return self.details(pid), parents, [spouse], children
+
+    def descendancy(self, token: str, pid: str, generations: int = 2):
+        self._count("descendancy")
+        persons = []
+        def walk(p: str, number: str, level: int):
+            spouse, children = self.relatives(p)
+            persons.append(self.details(p, number))
+            persons.append(self.details(spouse, f"{number}-S1"))
+            if level < generations:
+                for k, child in enumerate(children, start=1):
+                    walk(child, f"{number}-S1.{k}", level + 1)
+        walk(pid, "1", 0)
+        return parse_descendancy({"persons": persons}, generations)
+
+
+def crawl(family: SyntheticFamily, depth: int, bulk: bool, known=None):
+    levels = []
+    nodes, edges = rs._build_tree_iteratively("t", ["P0", "W0"], depth, max_workers=4, level_stats=levels, bulk=bulk, known=known)
+    return nodes, edges, levels
+
+
+def edge_set(edges):
+    return {rs._normalize_edge(e)[0] for e in edges}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--depth", type=int, default=4, help="desc_depth do clone (gerações abaixo do casal raiz)")
+    ap.add_argument("--children", type=int, nargs="+", default=[2, 3, 4], help="filhos por casal")
+    args = ap.parse_args()
+
+    print(f"_build_tree_iteratively, desc_depth={args.depth}: chamadas ao FamilySearch por modo")
+    print(f"  {'filhos':>6} {'pessoas':>8} {'por pessoa':>11} {'bulk':>6} {'redução':>8} {'refresh':>8}   bulk por nível")
+    ok = True
+    for children in args.children:
+        family = SyntheticFamily(children)
+        rs._fetch_person_with_relatives = family.person_with_relatives
+        rs.descendancy_relatives = family.descendancy
+        p_nodes, p_edges, p_levels = crawl(family, args.depth, bulk=False)
+        person_calls = sum(family.calls.values())
+        family.calls = {"person": 0, "descendancy": 0}
+        known = {}
+        b_nodes, b_edges, b_levels = crawl(family, args.depth, bulk=True, known=known)
+        bulk_calls = sum(family.calls.values())
+        family.calls = {"person": 0, "descendancy": 0}
+        crawl(family, args.depth, bulk=True, known=known)
+        refresh_calls = sum(family.calls.values())
+        same = {n["id"] for n in p_nodes} == {n["id"] for n in b_nodes} and edge_set(p_edges) == edge_set(b_edges)
+        ok &= same and refresh_calls == 0
+        per_level = " ".join(str(l["requests"]) for l in b_levels)
+        print(f"  {children:>6} {len(p_nodes):>8} {person_calls:>11} {bulk_calls:>6} {person_calls / bulk_calls:>7.1f}x {refresh_calls:>8}   {per_level}"
+              + ("" if same else "   DIFERENTE"))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
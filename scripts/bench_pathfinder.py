@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""
+Benchmark de memória/tempo da BFS de services/pathfinder, sem rede.
+
+Duas pessoas da geração 0 de um pedigree sintético com colapso (cada pessoa tem
+dois pais sorteados na geração de cima): os dois lados se encontram em ancestrais
+comuns algumas gerações acima, e cada encontro remonta o caminho completo. Roda o
+próprio iter_paths duas vezes, mudando só a representação do caminho:
+  - antes: cópia de listas (cada nó enfileirado copia o caminho inteiro);
+  - depois: PathLink (ponteiro para o prefixo compartilhado, lista só no encontro).
+Sem índice de casais (couples=None) nem pós-processamento: só esta mudança conta.
+
+Uso (na raiz do repositório):
+    python scripts/bench_pathfinder.py [--width 50000] [--generations 12]
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from apps.api.src.services import pathfinder as pf  # noqa: E402
+
+
+def build_pedigree(width: int, generations: int, seed: int = 7):
+    """{filho: [pai, mãe]} em camadas; as pessoas sem camada de cima não têm pais."""
+    rnd = random.Random(seed)
+    parents = {}
+    for g in range(generations):
+        for i in range(width):
+            parents[f"G{g}-{i}"] = [f"G{g + 1}-{j}" for j in rnd.sample(range(width), 2)]
+    return parents
+
+
+class CopiedPath:
+    """Referência (versão antiga): o caminho é uma lista copiada inteira a cada extensão."""
+    __slots__ = ("pids",)
+
+    def __init__(self, pid, pids=None):
+        self.pids = pids if pids is not None else [pid]
+
+    def extend(self, pid):
+        return CopiedPath(pid, self.pids + [pid])
+
+    def __len__(self):
+        return len(self.pids)
+
+    def __contains__(self, pid):
+        return pid in self.pids
+
+    def to_list(self):
+        return self.pids[:]
+
+
+def run_search(a, b, max_depth, path_type):
+    """iter_paths com o tipo de caminho dado; devolve (caminhos, stats)."""
+    saved = pf.PathLink, pf._edge_sig
+    if path_type is CopiedPath:
+        pf.PathLink, pf._edge_sig = CopiedPath, lambda path: tuple(path.pids[-3:])
+    try:
+        stats = {}
+        paths = [found for kind, found in pf.iter_paths(a, b, {}, max_depth=max_depth, prefetch_generations=0, stats=stats)
+                 if kind == "path"]
+        return paths, stats
+    finally:
+        pf.PathLink, pf._edge_sig = saved
+
+
+def measure(label, fn, repeat=7):
+    """Pico de memória numa execução com tracemalloc; tempo (melhor de `repeat`) sem ele,
+    que encarece cada alocação e distorcia a comparação de tempo."""
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    elapsed = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(); elapsed = min(elapsed, time.perf_counter() - t0)
+    print(f"  {label:<34} pico {peak / 1024 / 1024:8.2f} MiB   {elapsed * 1000:6.0f} ms")
+    return result
+
+
+def bench_memory(args) -> int:
+    pedigree = build_pedigree(args.width, args.generations)
+    a, b = "G0-0", "G0-1"
+    # Sem rede nem cache: a BFS lê o pedigree diretamente.
+    pf._parents_for_search = lambda pid, headers, prefetch, stats: pedigree.get(pid, [])
+
+    print(f"services/pathfinder.iter_paths {a} -> {b} (largura {args.width}, K={pf.K_PATHS_PER_NODE} caminhos/nó)")
+    old, old_stats = measure("antes: cópia de listas", lambda: run_search(a, b, args.generations, CopiedPath))
+    new, new_stats = measure("depois: PathLink", lambda: run_search(a, b, args.generations, pf.PathLink))
+    print(f"  nós expandidos: {old_stats['expanded']} / {new_stats['expanded']}, profundidade: {new_stats['depth']}, "
+          f"motivo: {new_stats['reason']}, caminhos remontados: {len(old)} / {len(new)}")
+    same = old == new and old_stats["expanded"] == new_stats["expanded"]
+    if not new:
+        print("  AVISO: nenhum encontro; aumente --generations ou reduza --width")
+    elif not same:
+        print("  DIFERENTE: as duas representações deram resultados distintos")
+    return 0 if new and same else 1
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--width", type=int, default=50000, help="pessoas por geração")
+    ap.add_argument("--generations", type=int, default=12)
+    return bench_memory(ap.parse_args())
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+Benchmark da gravação de um snapshot no banco, sem rede.
+
+Compara o caminho antigo do /snapshot/clone (por pessoa: db.get + escrita; por aresta:
+SELECT + flush em relations e um INSERT em snapshot_edges) com o lote de
+services/snapshot_persist, contando os comandos SQL enviados ao banco e o tempo, em
+três situações: banco vazio, re-clone da mesma árvore e re-clone com 10% das pessoas
+alteradas. "Comandos" = chamadas ao driver (before_cursor_execute): um executemany
+conta uma vez; no SQLite não há ida e volta de rede e, no PostgreSQL, o SQLAlchemy 2
+o envia como INSERTs de várias linhas.
+
+Uso (na raiz do repositório):
+    python scripts/bench_snapshot_persist.py [--persons 5000] [--url sqlite:////tmp/bench_persist.db]
+Com --url postgresql://... mede no PostgreSQL (o banco é recriado: use um banco descartável).
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+def parse_args():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--persons", type=int, default=5000, help="pessoas na árvore sintética")
+    ap.add_argument("--url", default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_snapshot_persist.db')}",
+                    help="DATABASE_URL do banco descartável")
+    return ap.parse_args()
+
+args = parse_args()
+os.environ["DATABASE_URL"] = args.url
+
+from sqlalchemy import event  # noqa: E402
+
+from apps.api.src.infra.db.models import Base, Family, SessionLocal, Snapshot, SnapshotEdge, SnapshotNode, engine  # noqa: E402
+from apps.api.src.api import routes_snapshot as rs  # noqa: E402
+from apps.api.src.services.snapshot_persist import save_snapshot_graph  # noqa: E402
+
+
+def synthetic_tree(n: int, changed_every: int = 0):
+    """Descendência de um casal: cada casal tem ~2 filhos casados; formato de _format_node."""
+    nodes, edges = [], []
+    def person(i):
+        name = f"Pessoa {i}" + (" (editada)" if changed_every and i % changed_every == 0 else "")
+        return {"id": f"P{i:05d}", "name": name, "gender": "Male" if i % 2 else "Female",
+                "birth": {"date": f"{1800 + i // 50}", "place": "Lisboa"}, "death": {"date": None, "place": None}, "living": False}
+    nodes = [person(i) for i in range(n)]
+    for i in range(0, n - 1, 2):
+        edges.append({"type": "couple", "a": nodes[i]["id"], "b": nodes[i + 1]["id"]})
+    for i in range(2, n):
+        couple = (i // 2 - 1) // 2 * 2  # casal dos pais
+        edges.append({"type": "parentChild", "from": nodes[couple]["id"], "to": nodes[i]["id"]})
+        edges.append({"type": "parentChild", "from": nodes[couple + 1]["id"], "to": nodes[i]["id"]})
+    return nodes, edges
+
+
+def persist_rowwise(db, snap_id, nodes, edges):
+    """O laço antigo do snapshot_clone."""
+    for p_data in nodes:
+        rs._upsert_person(db, p_data)
+        db.add(SnapshotNode(snapshot_id=snap_id, person_id=p_data["id"]))
+    for e_data in edges:
+        rs._ensure_edge(db, e_data)
+        etype = e_data["type"]; src = e_data.get("from") or e_data.get("a"); dst = e_data.get("to") or e_data.get("b")
+        rs._insert_snapshot_edge_idempotent(db, snap_id, etype, src, dst)
+    db.flush()
+
+
+def persist_bulk(db, snap_id, nodes, edges):
+    save_snapshot_graph(db, snap_id, nodes, edges)
+    db.flush()
+
+
+statements = [0]
+@event.listens_for(engine, "before_cursor_execute")
+def _count(conn, cursor, statement, parameters, context, executemany):
+    statements[0] += 1
+
+
+def clone(persist, nodes, edges):
+    """Troca o snapshot 'bench' como o /snapshot/clone faz e mede só a gravação do grafo."""
+    db = SessionLocal()
+    try:
+        family = db.query(Family).filter_by(slug="bench").first()
+        if not family:
+            family = Family(slug="bench", name="bench"); db.add(family); db.flush()
+        old = db.query(Snapshot).filter_by(slug="bench").first()
+        if old:
+            db.query(SnapshotNode).filter_by(snapshot_id=old.id).delete()
+            db.query(SnapshotEdge).filter_by(snapshot_id=old.id).delete()
+            db.delete(old); db.flush()
+        snap = Snapshot(family_id=family.id, slug="bench", desc_depth=0, asc_depth=0); db.add(snap); db.flush()
+        statements[0] = 0; t0 = time.perf_counter()
+        persist(db, snap.id, nodes, edges)
+        db.commit()
+        return statements[0], time.perf_counter() - t0
+    finally:
+        db.close()
+
+
+def main():
+    nodes, edges = synthetic_tree(args.persons)
+    edited, _ = synthetic_tree(args.persons, changed_every=10)
+    print(f"{engine.dialect.name}: {len(nodes)} pessoas, {len(edges)} arestas")
+    print(f"  {'situação':<26} {'comandos antes':>15} {'depois':>8}   {'tempo antes':>11} {'depois':>8}")
+    results = {}
+    for label, persist in (("antes", persist_rowwise), ("depois", persist_bulk)):
+        Base.metadata.drop_all(engine); Base.metadata.create_all(engine)
+        results[label] = [clone(persist, nodes, edges), clone(persist, nodes, edges), clone(persist, edited, edges)]
+    for i, situation in enumerate(("banco vazio", "re-clone igual", "re-clone, 10% alteradas")):
+        (c0, t0), (c1, t1) = results["antes"][i], results["depois"][i]
+        print(f"  {situation:<26} {c0:>15} {c1:>8}   {t0:>10.2f}s {t1:>7.2f}s")
+
+if __name__ == "__main__":
+    main()
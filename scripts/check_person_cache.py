@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""
+Regressão do RedisBackend do cache de pessoas (infra/cache/person_cache.py), sem servidor.
+
+Roda as mesmas checagens (get/set em JSON, miss, chaves alternativas, TTL, limpeza
+do índice, limite de tamanho por ordem de expiração, delete, falha do cliente virando
+miss) contra:
+  - um substituto em processo com o subconjunto de comandos que o backend usa
+    (GET, SET EX, DEL, ZADD, ZCARD, ZREM, ZREMRANGEBYSCORE, ZPOPMIN, pipeline);
+  - fakeredis, se estiver instalado;
+  - um servidor de verdade, com --url (usa chaves com prefixo único e as apaga no fim).
+Cada alvo espera ~1 s pela expiração de uma chave com TTL de 1 s.
+
+Uso (na raiz do repositório):
+    python scripts/check_person_cache.py [--url redis://localhost:6379/0]
+Sai com código 1 se alguma checagem falhar.
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from apps.api.src.infra.cache.person_cache import PersonCache, RedisBackend  # noqa: E402
+
+
+class StandInRedis:
+    """Strings com expiração e sorted sets em memória; respostas como o redis-py com decode_responses=True."""
+    def __init__(self):
+        self.strings: Dict[str, Tuple[str, Optional[float]]] = {}
+        self.zsets: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self.strings.get(key)
+            if item is None: return None
+            if item[1] is not None and item[1] <= time.time():
+                del self.strings[key]; return None
+            return item[0]
+
+    def set(self, key: str, value: str, ex: Optional[int] = None) -> bool:
+        with self._lock:
+            self.strings[key] = (value, time.time() + ex if ex else None)
+            return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self.strings.pop(k, None) is not None or self.zsets.pop(k, None) is not None for k in keys)
+
+    def zadd(self, name: str, mapping: Dict[str, float]) -> int:
+        with self._lock:
+            zset = self.zsets.setdefault(name, {})
+            added = sum(member not in zset for member in mapping)
+            zset.update(mapping)
+            return added
+
+    def zcard(self, name: str) -> int:
+        return len(self.zsets.get(name, {}))
+
+    def zrem(self, name: str, *members: str) -> int:
+        with self._lock:
+            zset = self.zsets.get(name, {})
+            return sum(zset.pop(m, None) is not None for m in members)
+
+    def zremrangebyscore(self, name: str, low: Any, high: Any) -> int:
+        with self._lock:
+            zset, low, high = self.zsets.get(name, {}), float(low), float(high)
+            gone = [m for m, score in zset.items() if low <= score <= high]
+            for m in gone: del zset[m]
+            return len(gone)
+
+    def zpopmin(self, name: str, count: int = 1) -> List[Tuple[str, float]]:
+        with self._lock:
+            zset = self.zsets.get(name, {})
+            items = sorted(zset.items(), key=lambda kv: (kv[1], kv[0]))[:count]
+            for m, _ in items: del zset[m]
+            return items
+
+    def pipeline(self) -> "_Pipeline":
+        return _Pipeline(self)
+
+
+class _Pipeline:
+    """Enfileira os comandos e devolve a lista de respostas no execute(), como o pipeline do redis-py."""
+    def __init__(self, client: StandInRedis):
+        self.client, self.commands = client, []
+
+    def __getattr__(self, name: str):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs)); return self
+        return queue
+
+    def execute(self) -> list:
+        results = [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+        self.commands = []
+        return results
+
+
+class BrokenClient:
+    """Cliente cujo servidor caiu: todo comando levanta ConnectionError."""
+    def __getattr__(self, name: str):
+        def fail(*args, **kwargs): raise ConnectionError("conexão recusada")
+        return fail
+
+
+def run_checks(client: Any) -> List[Tuple[str, bool]]:
+    prefix = f"wf-check-{uuid.uuid4().hex[:8]}"
+    backend = RedisBackend(client, max_items=5, index_key=f"{prefix}:index")
+    cache = PersonCache(f"{prefix}:persons", backend, ttl=60)
+    results: List[Tuple[str, bool]] = []
+    check = lambda name, ok: results.append((name, bool(ok)))
+    person = lambda pid: {"id": pid, "name": f"Pessoa {pid}", "living": False}
+    try:
+        cache.set("P1", person("P1"))
+        check("get devolve o que foi gravado (JSON)", cache.get("P1") == person("P1"))
+        check("chave ausente é miss", cache.get("NADA") is None)
+        check("contadores de hit/miss", (cache.stats.hits, cache.stats.misses) == (1, 1))
+        found, missing = cache.get("NADA", "P1"), cache.get("NADA", "NADA@escopo")
+        check("chaves alternativas contam uma consulta só", found == person("P1") and missing is None
+              and (cache.stats.hits, cache.stats.misses) == (2, 2))
+
+        cache.set("TMP", person("TMP"), ttl=1)
+        check("chave com TTL curto lida antes de expirar", cache.get("TMP") == person("TMP"))
+        time.sleep(1.1)
+        check("chave expira no TTL", cache.get("TMP") is None)
+        cache.set("LONGA", person("LONGA"), ttl=3600)
+        check("escrita seguinte tira a expirada do índice", backend.size() == 2 and cache.stats.evictions == 1)
+
+        for i in range(2, 8):
+            cache.set(f"P{i}", person(f"P{i}"))
+        kept = [k for k in ("LONGA", *(f"P{i}" for i in range(1, 8))) if cache.get(k) is not None]
+        check("limite de tamanho respeitado", backend.size() == 5 and len(kept) == 5)
+        check("expulsa as que expiram primeiro", kept == ["LONGA", "P4", "P5", "P6", "P7"])
+
+        cache.delete("P7")
+        check("delete tira a chave e a entrada do índice", cache.get("P7") is None and backend.size() == 4)
+
+        broken = PersonCache(f"{prefix}:broken", RedisBackend(BrokenClient(), max_items=5))
+        broken.set("P1", person("P1"))
+        check("falha do cliente vira miss, sem exceção", broken.get("P1") is None and broken.stats.misses == 1)
+    finally:
+        for key in ("P1", "TMP", "LONGA", *(f"P{i}" for i in range(2, 8))):
+            cache.delete(key)
+        client.delete(f"{prefix}:index")
+    return results
+
+
+def targets(url: Optional[str]) -> List[Tuple[str, Any]]:
+    found: List[Tuple[str, Any]] = [("substituto em processo", StandInRedis())]
+    try:
+        import fakeredis
+        found.append(("fakeredis", fakeredis.FakeRedis(decode_responses=True)))
+    except ImportError:
+        print("fakeredis não instalado: pulado")
+    if url:
+        found.append((url, RedisBackend.from_url(url, max_items=5).client))
+    return found
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="servidor Redis de verdade (opcional)")
+    args = ap.parse_args()
+    failures = 0
+    for label, client in targets(args.url):
+        results = run_checks(client)
+        for name, ok in results:
+            failures += not ok
+            print(f"  {'ok  ' if ok else 'FALHA'} {name}")
+        print(f"{label}: {sum(ok for _, ok in results)}/{len(results)} checagens")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
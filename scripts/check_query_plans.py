@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+Regressão dos planos de consulta: roda EXPLAIN nas consultas quentes (mesmo formato
+das rotas) e falha se alguma varrer a tabela inteira em vez de usar o índice esperado.
+
+Cria as tabelas que faltam (init_db) e aplica as migrações do Alembic antes de
+checar, então também serve para conferir um banco já migrado. No PostgreSQL usa
+`SET enable_seqscan = off`: com tabelas pequenas o planejador prefere seq scan
+mesmo com índice; o que se verifica aqui é que o índice existe e serve à consulta.
+
+Uso (na raiz do repositório):
+    python scripts/check_query_plans.py [--url postgresql://...]
+Sem --url usa um SQLite temporário. Sai com código 1 se alguma consulta regredir.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+def parse_args():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'check_query_plans.db')}",
+                    help="DATABASE_URL do banco a checar (padrão: SQLite temporário)")
+    ap.add_argument("-v", "--verbose", action="store_true", help="imprime o plano de cada consulta")
+    return ap.parse_args()
+
+args = parse_args()
+os.environ["DATABASE_URL"] = args.url
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+from sqlalchemy import or_, select, text  # noqa: E402
+
+from apps.api.src.infra.db.models import (  # noqa: E402
+    Comment, Invite, Media, Membership, Post, Relation, Snapshot, SnapshotEdge, SnapshotNode, UserPath, engine, init_db,
+)
+
+IDS = ["KWQX-001", "KWQX-002", "KWQX-003"]
+
+# (nome, tabela, consulta, índices aceitos; None = qualquer índice, desde que sem varredura da tabela)
+CHECKS = [
+    ("snapshot_get: nós do snapshot", "snapshot_nodes",
+     select(SnapshotNode.person_id).where(SnapshotNode.snapshot_id == 1), None),
+    ("snapshot_get: relações globais", "relations",
+     select(Relation).where(or_(Relation.src_id.in_(IDS), Relation.dst_id.in_(IDS))), {"ix_relations_src", "ix_relations_dst"}),
+    ("snapshots que mostram pessoas alteradas", "snapshot_nodes",
+     select(SnapshotNode.snapshot_id).where(SnapshotNode.person_id.in_(IDS)).distinct(), {"ix_snapshot_nodes_person"}),
+    ("snapshot_get: arestas do snapshot", "snapshot_edges",
+     select(SnapshotEdge).where(SnapshotEdge.snapshot_id == 1), None),
+    ("pathfinder_logic: pais (relations)", "relations",
+     select(Relation.src_id, Relation.dst_id).where(Relation.rel_type == "parentChild", Relation.dst_id.in_(IDS)), {"ix_relations_dst"}),
+    ("pathfinder_logic: pais (snapshot_edges)", "snapshot_edges",
+     select(SnapshotEdge.src_id, SnapshotEdge.dst_id).where(SnapshotEdge.type == "parentChild", SnapshotEdge.dst_id.in_(IDS)).distinct(),
+     {"ix_snapshot_edges_dst"}),
+    ("fingerprint de caminho (snapshot_edges)", "snapshot_edges",
+     select(SnapshotEdge.type, SnapshotEdge.src_id, SnapshotEdge.dst_id).where(
+         or_(SnapshotEdge.src_id.in_(IDS), SnapshotEdge.dst_id.in_(IDS))), {"ix_snapshot_edges_src", "ix_snapshot_edges_dst"}),
+    ("raiz da família", "snapshots",
+     select(Snapshot).where(Snapshot.family_id == 1).order_by(Snapshot.created_at.asc()).limit(1), {"ix_snapshots_family_created"}),
+    ("mural", "posts",
+     select(Post).where(Post.family_id == 1).order_by(Post.created_at.desc()), {"ix_posts_family_created"}),
+    ("comentários do post", "comments",
+     select(Comment).where(Comment.post_id == 1), {"ix_comments_post"}),
+    ("galeria", "media",
+     select(Media).where(Media.family_id == 1).order_by(Media.created_at.desc()), {"ix_media_family_created"}),
+    ("fotos do post", "media",
+     select(Media).where(Media.post_id == 1), {"ix_media_post"}),
+    ("famílias do usuário", "memberships",
+     select(Membership).where(Membership.user_fs_id == "U1"), None),
+    ("membros da família", "memberships",
+     select(Membership).where(Membership.family_id == 1), {"ix_memberships_family"}),
+    ("caminho do usuário", "user_paths",
+     select(UserPath).where(UserPath.user_fs_id == "U1", UserPath.family_id == 1), {"ix_user_paths_user_family"}),
+    ("convites da família", "invites",
+     select(Invite).where(Invite.family_id == 1).order_by(Invite.created_at.desc()), {"ix_invites_family_created"}),
+]
+
+def _sql(stmt) -> str:
+    return str(stmt.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+
+def sqlite_plan(conn, stmt):
+    """(linhas do plano, índices usados, tabelas varridas sem índice)."""
+    rows = [r[-1] for r in conn.execute(text("EXPLAIN QUERY PLAN " + _sql(stmt)))]
+    used = {m.group(1) for r in rows for m in [re.search(r"USING (?:COVERING )?INDEX (\w+)", r)] if m}
+    used |= {"<pk>" for r in rows if "USING INTEGER PRIMARY KEY" in r or "USING PRIMARY KEY" in r}
+    # SEARCH = busca pelo índice; SCAN = tabela inteira (ou o índice inteiro, em "SCAN t USING COVERING INDEX").
+    scans = {m.group(1) for r in rows for m in [re.match(r"SCAN (?:TABLE )?(\w+)", r)] if m}
+    return rows, used, scans
+
+def postgres_plan(conn, stmt):
+    conn.execute(text("SET enable_seqscan = off"))
+    plan = conn.execute(text("EXPLAIN (FORMAT JSON) " + _sql(stmt))).scalar()
+    plan = plan if isinstance(plan, list) else json.loads(plan)
+    used, scans, lines = set(), set(), []
+    def walk(node, depth=0):
+        lines.append("  " * depth + f"{node['Node Type']} {node.get('Relation Name', '')} {node.get('Index Name', '')}".rstrip())
+        if node.get("Index Name"): used.add(node["Index Name"])
+        if node["Node Type"] == "Seq Scan": scans.add(node["Relation Name"])
+        for child in node.get("Plans", []): walk(child, depth + 1)
+    walk(plan[0]["Plan"])
+    return lines, used, scans
+
+def migrate():
+    init_db()
+    cfg = Config(os.path.join(os.path.dirname(__file__), "..", "apps", "api", "alembic.ini"))
+    command.upgrade(cfg, "head")
+
+def main() -> int:
+    migrate()
+    explain = sqlite_plan if engine.dialect.name == "sqlite" else postgres_plan
+    failures = 0
+    with engine.connect() as conn:
+        for name, table, stmt, expected in CHECKS:
+            lines, used, scans = explain(conn, stmt)
+            ok = table not in scans and bool(used) and (expected is None or bool(used & expected))
+            failures += not ok
+            print(f"  {'ok  ' if ok else 'FALHA'} {name:<42} {', '.join(sorted(used)) or '(sem índice)'}")
+            if args.verbose or not ok:
+                for line in lines: print(f"         {line}")
+    print(f"{engine.dialect.name}: {len(CHECKS) - failures}/{len(CHECKS)} consultas usando índice")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())